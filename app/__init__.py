@@ -22,9 +22,32 @@ def create_app(config_name=None):
         app.config['TWILIO_AUTH_TOKEN'] = config_loader.get('TWILIO_AUTH_TOKEN', '')
         app.config['TWILIO_WHATSAPP_FROM'] = config_loader.get('TWILIO_WHATSAPP_FROM', '')
         app.config['TWILIO_VALIDATE_WEBHOOKS'] = config_loader.get('TWILIO_VALIDATE_WEBHOOKS', False)
+        app.config['MESSAGING_PROVIDER'] = config_loader.get('MESSAGING_PROVIDER', 'twilio')
+        app.config['FAKE_PROVIDER'] = config_loader.get('FAKE_PROVIDER', {})
+        app.config['STATUS_CALLBACK_URL'] = config_loader.get('STATUS_CALLBACK_URL', '')
         app.config['DEFAULT_RATE_LIMIT'] = config_loader.get('DEFAULT_RATE_LIMIT', 1)
+        app.config['SEND_CONCURRENCY'] = config_loader.get('SEND_CONCURRENCY', 8)
+        app.config['OUTBOX_BATCH_SIZE'] = config_loader.get('OUTBOX_BATCH_SIZE', 100)
+        app.config['OUTBOX_LEASE_SECONDS'] = config_loader.get('OUTBOX_LEASE_SECONDS', 60)
+        app.config['RECIPIENT_PAGE_SIZE'] = config_loader.get('RECIPIENT_PAGE_SIZE', 1000)
+        app.config['SEND_MAX_ATTEMPTS'] = config_loader.get('SEND_MAX_ATTEMPTS', 5)
+        app.config['RETRY_BASE_DELAY'] = config_loader.get('RETRY_BASE_DELAY', 2)
+        app.config['RETRY_MAX_DELAY'] = config_loader.get('RETRY_MAX_DELAY', 600)
+        app.config['TEMPLATE_CACHE_SIZE'] = config_loader.get('TEMPLATE_CACHE_SIZE', 256)
+        app.config['TEMPLATE_BYTECODE_CACHE_DIR'] = config_loader.get('TEMPLATE_BYTECODE_CACHE_DIR', '')
         app.config['DEFAULT_QUIET_START'] = config_loader.get('DEFAULT_QUIET_START', '22:00')
         app.config['DEFAULT_QUIET_END'] = config_loader.get('DEFAULT_QUIET_END', '08:00')
+        app.config['USER_IMPORT_BATCH_SIZE'] = config_loader.get('USER_IMPORT_BATCH_SIZE', 5000)
+        app.config['IMPORT_CONCURRENCY'] = config_loader.get('IMPORT_CONCURRENCY', 2)
+        app.config['IMPORT_SPOOL_DIR'] = config_loader.get('IMPORT_SPOOL_DIR', 'db/imports')
+        app.config['ATTRIBUTE_INDEX_ENABLED'] = config_loader.get('ATTRIBUTE_INDEX_ENABLED', False)
+        app.config['ATTRIBUTE_INDEX_MAX_MB'] = config_loader.get('ATTRIBUTE_INDEX_MAX_MB', 256)
+        app.config['ATTRIBUTE_INDEX_MAX_VALUES'] = config_loader.get('ATTRIBUTE_INDEX_MAX_VALUES', 1000)
+        app.config['SEGMENT_ESTIMATE_SAMPLE_SIZE'] = config_loader.get('SEGMENT_ESTIMATE_SAMPLE_SIZE', 10000)
+        app.config['AUDIENCE_SNAPSHOT_ENABLED'] = config_loader.get('AUDIENCE_SNAPSHOT_ENABLED', False)
+        app.config['AUDIENCE_SNAPSHOT_REFRESH_SECONDS'] = config_loader.get('AUDIENCE_SNAPSHOT_REFRESH_SECONDS', 300)
+        app.config['CAMPAIGN_LIST_CACHE_SECONDS'] = config_loader.get('CAMPAIGN_LIST_CACHE_SECONDS', 5)
+        app.config['SCHEDULE_RETRY_SECONDS'] = config_loader.get('SCHEDULE_RETRY_SECONDS', 300)
         app.config['VERIFIED_NUMBERS'] = config_loader.get('VERIFIED_NUMBERS', [])
         app.config['DEFAULT_CREATED_BY'] = config_loader.get('DEFAULT_CREATED_BY', 'system')
         
@@ -42,15 +65,42 @@ def create_app(config_name=None):
         app.config['TWILIO_AUTH_TOKEN'] = ''
         app.config['TWILIO_WHATSAPP_FROM'] = ''
         app.config['TWILIO_VALIDATE_WEBHOOKS'] = False
+        app.config['MESSAGING_PROVIDER'] = 'twilio'
+        app.config['FAKE_PROVIDER'] = {}
+        app.config['STATUS_CALLBACK_URL'] = ''
         app.config['DEFAULT_RATE_LIMIT'] = 1
+        app.config['SEND_CONCURRENCY'] = 8
+        app.config['OUTBOX_BATCH_SIZE'] = 100
+        app.config['OUTBOX_LEASE_SECONDS'] = 60
+        app.config['RECIPIENT_PAGE_SIZE'] = 1000
+        app.config['SEND_MAX_ATTEMPTS'] = 5
+        app.config['RETRY_BASE_DELAY'] = 2
+        app.config['RETRY_MAX_DELAY'] = 600
+        app.config['TEMPLATE_CACHE_SIZE'] = 256
+        app.config['TEMPLATE_BYTECODE_CACHE_DIR'] = ''
         app.config['DEFAULT_QUIET_START'] = '22:00'
         app.config['DEFAULT_QUIET_END'] = '08:00'
+        app.config['USER_IMPORT_BATCH_SIZE'] = 5000
+        app.config['IMPORT_CONCURRENCY'] = 2
+        app.config['IMPORT_SPOOL_DIR'] = 'db/imports'
+        app.config['ATTRIBUTE_INDEX_ENABLED'] = False
+        app.config['ATTRIBUTE_INDEX_MAX_MB'] = 256
+        app.config['ATTRIBUTE_INDEX_MAX_VALUES'] = 1000
+        app.config['SEGMENT_ESTIMATE_SAMPLE_SIZE'] = 10000
+        app.config['AUDIENCE_SNAPSHOT_ENABLED'] = False
+        app.config['AUDIENCE_SNAPSHOT_REFRESH_SECONDS'] = 300
+        app.config['CAMPAIGN_LIST_CACHE_SECONDS'] = 5
+        app.config['SCHEDULE_RETRY_SECONDS'] = 300
         app.config['VERIFIED_NUMBERS'] = []
         app.config['DEFAULT_CREATED_BY'] = 'system'
     
     # Enable CORS for React frontend
     CORS(app, origins=["http://localhost:3000", "http://localhost:5173", "http://127.0.0.1:3000", "http://127.0.0.1:5173"])
     
+    # Compiled Jinja templates are cached process-wide (optionally with bytecode on disk)
+    from app.utils.template_utils import configure_template_cache
+    configure_template_cache(app.config.get('TEMPLATE_CACHE_SIZE'), app.config.get('TEMPLATE_BYTECODE_CACHE_DIR'))
+    
     # Initialize database (import here to avoid circular imports)
     from app.database.connection import init_app as init_db
     init_db(app)
@@ -60,6 +110,14 @@ def create_app(config_name=None):
         from app.database.connection import get_db
         db = get_db()  # This will trigger table creation if needed
         print("Database connection established and tables verified")
+        
+        # Background imports of a process that has died will never finish
+        from app.services.user_import_service import UserImportService
+        UserImportService.fail_interrupted_jobs()
+    
+    # Optional in-memory attribute index for live segment counts (built in the background)
+    from app.utils.attribute_index import configure_attribute_index
+    configure_attribute_index(app)
     
     # Register API blueprints
     from app.api.routes import register_blueprints
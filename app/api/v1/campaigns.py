@@ -1,5 +1,6 @@
 from flask import Blueprint, request, jsonify, current_app
 from app.models.campaign import Campaign
+from app.services.audience_service import AudienceService
 from app.services.campaign_service import CampaignService
 
 campaigns_bp = Blueprint('campaigns', __name__)
@@ -21,7 +22,9 @@ def create_campaign():
             quiet_start=data.get('quiet_start'),
             quiet_end=data.get('quiet_end'),
             timezone=data.get('timezone', 'UTC'),
-            created_by=data.get('created_by')
+            created_by=data.get('created_by'),
+            schedule_cron=data.get('schedule_cron'),
+            freeze_audience=data.get('freeze_audience')
         )
         return jsonify(campaign.to_dict()), 201
     except Exception as e:
@@ -29,15 +32,65 @@ def create_campaign():
 
 @campaigns_bp.route("/campaigns/<int:cid>/launch", methods=["POST"])
 def launch_campaign(cid):
-    """Launch a campaign"""
+    """Launch a campaign; sends run in the background"""
     try:
-        result = CampaignService.launch_campaign(cid)
-        return jsonify(result)
+        job = CampaignService.launch_campaign(cid)
+        return jsonify({
+            "job_id": job.job_id,
+            "campaign_id": cid,
+            "status": job.status,
+            "status_url": f"/api/v1/campaigns/{cid}/status"
+        }), 202
     except ValueError as e:
         return jsonify({"error": str(e)}), 404
     except Exception as e:
         return jsonify({"error": str(e)}), 400
 
+@campaigns_bp.route("/campaigns/<int:cid>/pause", methods=["POST"])
+def pause_campaign(cid):
+    """Pause a running campaign; unsent messages stay queued until it is resumed"""
+    if not Campaign.get_by_id(cid):
+        return jsonify({"error": "Campaign not found"}), 404
+    
+    try:
+        campaign = CampaignService.pause_campaign(cid)
+        return jsonify(campaign.to_dict())
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 409
+
+@campaigns_bp.route("/campaigns/<int:cid>/resume", methods=["POST"])
+def resume_campaign(cid):
+    """Resume a paused campaign from its launch checkpoint"""
+    if not Campaign.get_by_id(cid):
+        return jsonify({"error": "Campaign not found"}), 404
+    
+    try:
+        job = CampaignService.resume_campaign(cid)
+        return jsonify({
+            "job_id": job.job_id,
+            "campaign_id": cid,
+            "status": job.status,
+            "status_url": f"/api/v1/campaigns/{cid}/status"
+        }), 202
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 409
+
+@campaigns_bp.route("/campaigns/<int:cid>/audience", methods=["GET"])
+def campaign_audience(cid):
+    """How many users the campaign would send to if launched now (its frozen audience, if it has one)"""
+    campaign = Campaign.get_by_id(cid)
+    if not campaign:
+        return jsonify({"error": "Campaign not found"}), 404
+    
+    try:
+        return jsonify({
+            "campaign_id": cid,
+            "count": AudienceService.count(campaign),
+            "frozen_at": campaign.to_dict()['audience_frozen_at']
+        })
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+
 @campaigns_bp.route("/campaigns/<int:cid>/status", methods=["GET"])
 def campaign_status(cid):
     """Get campaign status"""
@@ -47,12 +100,29 @@ def campaign_status(cid):
     except ValueError as e:
         return jsonify({"error": str(e)}), 404
 
+@campaigns_bp.route("/campaigns/<int:cid>/status/rebuild", methods=["POST"])
+def rebuild_campaign_status(cid):
+    """Recount a campaign's message counters from its messages (repair)"""
+    if not Campaign.get_by_id(cid):
+        return jsonify({"error": "Campaign not found"}), 404
+    
+    Campaign.rebuild_stats(cid)
+    return jsonify(CampaignService.get_campaign_status(cid))
+
 @campaigns_bp.route("/campaigns", methods=["GET"])
 def get_campaigns():
     """Get all campaigns"""
     campaigns = Campaign.get_all()
     return jsonify([campaign.to_dict() for campaign in campaigns])
 
+@campaigns_bp.route("/campaigns/stats", methods=["GET"])
+def get_campaigns_with_stats():
+    """Campaigns with message statistics, newest first, a page at a time (?limit=50&before=<campaign_id>)"""
+    limit = min(max(request.args.get('limit', default=50, type=int), 1), 500)
+    before = request.args.get('before', type=int)
+    campaigns, next_before = CampaignService.get_campaigns_with_stats(limit, before)
+    return jsonify({"campaigns": campaigns, "next_before": next_before})
+
 @campaigns_bp.route("/campaigns/<int:camp_id>", methods=["GET"])
 def get_campaign(camp_id):
     """Get specific campaign"""
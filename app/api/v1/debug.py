@@ -1,5 +1,8 @@
 from flask import Blueprint, jsonify, current_app
 from app.services.messaging_service import MessagingService
+from app.utils.attribute_index import get_attribute_index
+from app.utils.rate_controller import rate_controller_snapshots
+from app.utils.template_utils import template_cache_stats
 
 debug_bp = Blueprint('debug', __name__)
 
@@ -27,4 +30,25 @@ def verify_twilio():
             "account_sid": current_app.config.get('TWILIO_ACCOUNT_SID'),
             "auth_token_set": bool(current_app.config.get('TWILIO_AUTH_TOKEN')),
             "whatsapp_from": current_app.config.get('TWILIO_WHATSAPP_FROM')
-        }), 400
\ No newline at end of file
+        }), 400
+
+@debug_bp.route("/debug/rate-limits", methods=["GET"])
+def rate_limits():
+    """Effective adaptive send rate per sender number (this process)"""
+    return jsonify({
+        "max_rate": current_app.config.get('DEFAULT_RATE_LIMIT', 1),
+        "senders": rate_controller_snapshots()
+    })
+
+@debug_bp.route("/debug/template-cache", methods=["GET"])
+def template_cache():
+    """Compiled-template cache size and hit rate (this process)"""
+    return jsonify(template_cache_stats())
+
+@debug_bp.route("/debug/attribute-index", methods=["GET"])
+def attribute_index():
+    """Attribute bitmap index size and coverage (this process)"""
+    index = get_attribute_index()
+    if index is None:
+        return jsonify({"enabled": False})
+    return jsonify({"enabled": True, **index.stats()})
@@ -1,7 +1,10 @@
 from flask import Blueprint, request, jsonify, current_app
 from app.models.message import Message
+from app.models.dead_letter import DeadLetter
+from app.services.campaign_service import CampaignService
 from app.services.messaging_service import MessagingService
 from app.utils.phone_utils import normalize_phone, validate_e164
+from app.utils.verified_numbers import get_verified_numbers
 
 messages_bp = Blueprint('messages', __name__)
 
@@ -17,6 +20,30 @@ def list_messages():
     
     return jsonify([message.to_dict() for message in messages])
 
+@messages_bp.route("/messages/dead-letter", methods=["GET"])
+def list_dead_letters():
+    """Messages that failed on every retry, optionally for one campaign"""
+    campaign_id = request.args.get('campaign_id', type=int)
+    limit = request.args.get('limit', default=100, type=int)
+    dead_letters = DeadLetter.get_all(campaign_id=campaign_id, limit=limit)
+    return jsonify([dead_letter.to_dict() for dead_letter in dead_letters])
+
+@messages_bp.route("/messages/dead-letter/redrive", methods=["POST"])
+def redrive_dead_letters():
+    """Re-queue dead-lettered messages (by campaign_id and/or message_ids)"""
+    data = request.json or {}
+    campaign_id = data.get('campaign_id')
+    message_ids = data.get('message_ids')
+    limit = data.get('limit', 1000)
+    
+    if campaign_id is None and not message_ids:
+        return jsonify({"error": "campaign_id or message_ids is required"}), 400
+    if message_ids is not None and not isinstance(message_ids, list):
+        return jsonify({"error": "message_ids must be a list"}), 400
+    
+    requeued = CampaignService.redrive_dead_letters(campaign_id=campaign_id, message_ids=message_ids, limit=limit)
+    return jsonify({"requeued": len(requeued), "message_ids": requeued})
+
 @messages_bp.route("/test/send", methods=["POST"])
 def test_send_message():
     """Test endpoint to send a WhatsApp message directly"""
@@ -48,15 +75,15 @@ def test_send_verified():
         return jsonify({"error": "phone and message are required"}), 400
     
     try:
-        verified_numbers = current_app.config.get('VERIFIED_NUMBERS', [])
+        verified_numbers = get_verified_numbers(current_app.config)
         
         phone_normalized = normalize_phone(phone)
         
         # Check if number is verified (for trial accounts)
-        if verified_numbers and not any(phone_normalized.endswith(num.replace('+', '')) for num in verified_numbers):
+        if verified_numbers and phone_normalized not in verified_numbers:
             return jsonify({
                 "error": "Number not verified. Trial accounts can only send to verified numbers.",
-                "verified_numbers": verified_numbers
+                "verified_numbers": verified_numbers.numbers
             }), 400
         
         message_sid = MessagingService.send_whatsapp_message(phone_normalized, message_text)
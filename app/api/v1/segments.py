@@ -1,4 +1,6 @@
-from flask import Blueprint, request, jsonify
+import json
+import time
+from flask import Blueprint, Response, request, jsonify, stream_with_context
 from app.models.segment import Segment
 from app.services.segment_service import SegmentService
 
@@ -17,17 +19,86 @@ def create_segment():
     except Exception as e:
         return jsonify({"error": str(e)}), 400
 
+@segments_bp.route("/segments/preview-count", methods=["POST"])
+def preview_segment_count():
+    """Count the members of an unsaved definition, for live counts while editing filters"""
+    definition = (request.json or {}).get('definition', {})
+    started = time.perf_counter()
+    
+    try:
+        count, source = SegmentService.preview_count(definition)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    
+    return jsonify({
+        "count": count,
+        "source": source,
+        "elapsed_ms": round((time.perf_counter() - started) * 1000, 2)
+    })
+
+@segments_bp.route("/segments/<int:seg_id>", methods=["PUT"])
+def update_segment(seg_id):
+    """Update a segment's name, definition or is_active"""
+    if not Segment.get_by_id(seg_id):
+        return jsonify({"error": "Segment not found"}), 404
+    data = request.json or {}
+    
+    try:
+        segment = SegmentService.update_segment(seg_id, data.get('name'), data.get('definition'), data.get('is_active'))
+        return jsonify(segment.to_dict())
+    except Exception as e:
+        return jsonify({"error": str(e)}), 400
+
+@segments_bp.route("/segments/<int:seg_id>/count", methods=["GET"])
+def segment_count(seg_id):
+    """Number of segment members (?estimate=true for a sampled estimate with a confidence interval)"""
+    if not Segment.get_by_id(seg_id):
+        return jsonify({"error": "Segment not found"}), 404
+    
+    try:
+        if request.args.get('estimate', '').lower() in ('true', '1'):
+            estimate, _ = SegmentService.estimate_segment_size(seg_id, request.args.get('sample_size', type=int))
+            return jsonify({"segment_id": seg_id, "estimated": True, **estimate})
+        return jsonify({"segment_id": seg_id, "count": SegmentService.count_segment_members(seg_id)})
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+
 @segments_bp.route("/segments/<int:seg_id>/members", methods=["GET"])
 def segment_members(seg_id):
-    """Get segment members"""
-    try:
-        members = SegmentService.evaluate_segment_members(seg_id)
+    """Get segment members, streamed from the database (optional ?limit=N)"""
+    if not Segment.get_by_id(seg_id):
+        return jsonify({"error": "Segment not found"}), 404
+    limit = request.args.get('limit', type=int)
+    
+    if request.args.get('estimate', '').lower() in ('true', '1'):
+        # Estimated size plus the sampled members instead of the full list
+        try:
+            estimate, members = SegmentService.estimate_segment_size(
+                seg_id, request.args.get('sample_size', type=int), with_members=True
+            )
+        except ValueError as e:
+            return jsonify({"error": str(e)}), 400
+        members = members[:limit] if limit else members
         return jsonify({
-            "count": len(members),
-            "members": [member.to_dict() for member in members]
+            "estimate": estimate,
+            "members": [member.to_dict() for member in members],
+            "count": len(members)
         })
+    
+    try:
+        members = SegmentService.iter_segment_members(seg_id, limit)
     except ValueError as e:
-        return jsonify({"error": str(e)}), 404
+        return jsonify({"error": str(e)}), 400
+    
+    def generate():
+        count = 0
+        yield '{"members": ['
+        for member in members:
+            yield (',' if count else '') + json.dumps(member.to_dict())
+            count += 1
+        yield f'], "count": {count}}}'
+    
+    return Response(stream_with_context(generate()), mimetype='application/json')
 
 @segments_bp.route("/segments", methods=["GET"])
 def get_segments():
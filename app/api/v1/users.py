@@ -1,9 +1,8 @@
-import csv
-import io
-import json
-from flask import Blueprint, request, jsonify
+import os
+from flask import Blueprint, request, jsonify, current_app, send_file
+from app.models.import_job import ImportJob
 from app.models.user import User
-from app.utils.phone_utils import normalize_phone, validate_e164
+from app.services.user_import_service import UserImportService
 
 users_bp = Blueprint('users', __name__)
 
@@ -27,77 +26,49 @@ def create_user():
 @users_bp.route("/users/bulk", methods=["POST"])
 def bulk_users():
     """Bulk create/update users from CSV or JSON"""
-    created = 0
+    batch_size = current_app.config.get('USER_IMPORT_BATCH_SIZE', 5000)
     
-    if 'file' in request.files:
-        # Handle CSV upload
-        f = request.files['file']
-        data = f.read().decode('utf-8')
-        reader = csv.DictReader(io.StringIO(data))
-        
-        for row in reader:
-            phone_raw = row.get('phone') or row.get('phone_number') or row.get('mobile')
-            if not phone_raw:
-                continue
-            
-            try:
-                phone = normalize_phone(phone_raw)
-                if not validate_e164(phone):
-                    continue
-                
-                # Parse attributes and consent
-                attrs = {}
-                if 'attributes' in row and row['attributes']:
-                    try:
-                        attrs = json.loads(row['attributes'])
-                    except Exception:
-                        attrs = {}
-                
-                consent_data = {}
-                if 'consent' in row and row['consent']:
-                    try:
-                        consent_data = json.loads(row['consent'])
-                    except Exception:
-                        consent_data = {}
-                
-                # Create or update user
-                existing = User.get_by_phone(phone)
-                if not existing:
-                    created += 1
-                
-                User.create_or_update(phone, attrs, consent_data)
-                
-            except Exception:
-                continue
-        
-        return jsonify({"created": created}), 201
+    if request.args.get('async', '').lower() in ('true', '1'):
+        # Spool the upload and import it in the background; poll GET /users/bulk/<job_id>
+        if 'file' not in request.files:
+            return jsonify({"error": "async imports take a CSV file upload"}), 400
+        job = UserImportService.start_import_job(request.files['file'])
+        return jsonify(job.to_dict()), 202
     
+    if 'file' in request.files:
+        # Handle CSV upload, read incrementally from the uploaded stream
+        rows = UserImportService.read_csv(request.files['file'].stream)
     else:
         # Handle JSON array
         arr = request.json or []
-        for entry in arr:
-            phone_raw = entry.get('phone')
-            if not phone_raw:
-                continue
-            
-            try:
-                phone = normalize_phone(phone_raw)
-                if not validate_e164(phone):
-                    continue
-                
-                attrs = entry.get('attributes', {})
-                consent_data = entry.get('consent', {})
-                
-                existing = User.get_by_phone(phone)
-                if not existing:
-                    created += 1
-                
-                User.create_or_update(phone, attrs, consent_data)
-                
-            except Exception:
-                continue
-        
-        return jsonify({"created": created}), 201
+        if not isinstance(arr, list):
+            return jsonify({"error": "expected a JSON array of users"}), 400
+        rows = UserImportService.read_json(arr)
+    
+    try:
+        counts = UserImportService.import_users(rows, batch_size=batch_size)
+    except UnicodeDecodeError:
+        return jsonify({"error": "CSV file must be UTF-8 encoded"}), 400
+    return jsonify(counts), 201
+
+@users_bp.route("/users/bulk/<job_id>", methods=["GET"])
+def get_import_job(job_id):
+    """Progress of a background (async=true) import"""
+    job = ImportJob.get_by_id(job_id)
+    if not job:
+        return jsonify({"error": "Import job not found"}), 404
+    return jsonify(job.to_dict())
+
+@users_bp.route("/users/bulk/<job_id>/rejects", methods=["GET"])
+def get_import_rejects(job_id):
+    """Download the rejected rows of a background import as CSV"""
+    job = ImportJob.get_by_id(job_id)
+    if not job:
+        return jsonify({"error": "Import job not found"}), 404
+    if not job.rejects_path or not os.path.exists(job.rejects_path):
+        return jsonify({"error": "Rejects file not available yet"}), 404
+    return send_file(os.path.abspath(job.rejects_path), mimetype='text/csv',
+                     as_attachment=True, download_name=f"import-{job_id}-rejects.csv")
 
 @users_bp.route("/users", methods=["GET"])
 def get_users():
@@ -2,6 +2,53 @@ import sqlite3
 import os
 from flask import g, current_app
 
+# Columns added after the first schema release. They are applied to existing
+# databases before the schema script runs so its indexes can reference them.
+# SQLite cannot ADD COLUMN with a non-constant default, hence no DEFAULTs here.
+_COLUMN_MIGRATIONS = {
+    'segments': [
+        ('members_built_at', 'REAL'),
+    ],
+    'campaigns': [
+        ('next_run_at', 'REAL'),
+        ('segment_id', 'INTEGER'),
+        ('run_number', 'INTEGER DEFAULT 0'),
+        ('launch_cursor', 'TEXT'),
+        ('launch_done', 'INTEGER DEFAULT 0'),
+        ('launch_owner', 'TEXT'),
+        ('launch_heartbeat', 'REAL'),
+        ('audience_frozen_at', 'REAL'),
+        ('last_error', 'TEXT'),
+    ],
+    'messages': [
+        ('updated_at', 'DATETIME'),
+        ('lease_owner', 'TEXT'),
+        ('lease_expires_at', 'REAL'),
+        ('attempts', 'INTEGER DEFAULT 0'),
+        ('next_attempt_at', 'REAL DEFAULT 0'),
+        ('recipient_timezone', 'TEXT'),
+        # NULL on rows from before launches were numbered; NULLs never collide in idx_messages_recipient
+        ('run_number', 'INTEGER'),
+    ],
+    'import_jobs': [
+        ('owner', 'TEXT'),
+    ],
+}
+
+# Tables derived from others. One created on an existing database is filled
+# from the rows already there (in one transaction, so concurrent writes that
+# its triggers count are not counted twice).
+_BACKFILLS = {
+    'campaign_stats': (
+        "DELETE FROM campaign_stats",
+        """INSERT INTO campaign_stats (campaign_id, state, count)
+        SELECT campaign_id, state, COUNT(*) FROM messages GROUP BY campaign_id, state""",
+    ),
+}
+
+# Database files already checked by this process
+_initialised_paths = set()
+
 def get_db():
     """Get database connection"""
     if 'db' not in g:
@@ -16,19 +63,39 @@ def get_db():
         # Ensure the directory exists
         os.makedirs(os.path.dirname(db_path), exist_ok=True)
         
-        g.db = sqlite3.connect(db_path, detect_types=sqlite3.PARSE_DECLTYPES)
+        # Generous timeout: send workers in other threads/processes share the file
+        g.db = sqlite3.connect(db_path, detect_types=sqlite3.PARSE_DECLTYPES, timeout=30)
         g.db.row_factory = sqlite3.Row
         # Enable foreign keys
         g.db.execute("PRAGMA foreign_keys = ON")
         
-        # Check if tables exist and initialize if needed
-        _ensure_tables_exist(g.db, db_path)
+        # Check if tables exist and initialize if needed (once per process)
+        if db_path not in _initialised_paths:
+            _ensure_tables_exist(g.db, db_path)
+            _initialised_paths.add(db_path)
     
     return g.db
 
+def _ensure_columns_exist(db):
+    """Add columns introduced after a database was first created"""
+    for table, columns in _COLUMN_MIGRATIONS.items():
+        existing = {row['name'] for row in db.execute(f"PRAGMA table_info({table})").fetchall()}
+        if not existing:
+            # Table not created yet; the schema script will create it in full
+            continue
+        for name, decl in columns:
+            if name not in existing:
+                print(f"Adding column '{table}.{name}'")
+                db.execute(f"ALTER TABLE {table} ADD COLUMN {name} {decl}")
+    db.commit()
+
 def _ensure_tables_exist(db, db_path):
-    """Ensure all required tables exist, create them if missing"""
-    required_tables = ['users', 'topics', 'templates', 'segments', 'campaigns', 'messages', 'events_inbound', 'delivery_receipts']
+    """Ensure all required tables, columns and indexes exist, create them if missing"""
+    # WAL lets send workers in other processes read while one of them writes
+    db.execute("PRAGMA journal_mode = WAL")
+    _ensure_columns_exist(db)
+    
+    required_tables = ['users', 'topics', 'templates', 'segments', 'segment_members', 'campaigns', 'campaign_audience', 'messages', 'campaign_stats', 'campaigns_version', 'messages_dead_letter', 'events_inbound', 'delivery_receipts', 'import_jobs']
     
     missing_tables = []
     for table in required_tables:
@@ -61,11 +128,44 @@ def _ensure_tables_exist(db, db_path):
                         print(f"SUCCESS: Table '{table}' created")
                     else:
                         print(f"ERROR: Failed to create table '{table}'")
+                
+                _backfill(db, missing_tables)
                         
             except Exception as e:
                 print(f"ERROR: Error initializing database schema: {e}")
         else:
             print(f"ERROR: Schema file not found at: {schema_path}")
+    else:
+        # Tables exist; re-apply the idempotent schema for any new indexes/triggers
+        _apply_schema(db)
+
+def _backfill(db, tables):
+    """Fill newly created derived tables from existing data"""
+    for table in tables:
+        statements = _BACKFILLS.get(table)
+        if not statements:
+            continue
+        db.execute("BEGIN IMMEDIATE")
+        try:
+            for statement in statements:
+                db.execute(statement)
+            db.commit()
+            print(f"SUCCESS: Table '{table}' filled from existing data")
+        except Exception as e:
+            db.rollback()
+            print(f"ERROR: Failed to fill table '{table}': {e}")
+
+def _apply_schema(db):
+    """Run the schema script; every statement in it is IF NOT EXISTS / OR IGNORE"""
+    base_dir = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+    schema_path = os.path.join(base_dir, 'db/scripts/schema-sqlite.sql')
+    if os.path.exists(schema_path):
+        try:
+            with open(schema_path, 'r') as f:
+                db.executescript(f.read())
+            db.commit()
+        except Exception as e:
+            print(f"ERROR: Error applying database schema: {e}")
 
 def close_db(e=None):
     """Close database connection"""
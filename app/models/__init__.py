@@ -3,6 +3,8 @@ from .template import Template
 from .segment import Segment
 from .campaign import Campaign
 from .message import Message
+from .dead_letter import DeadLetter
+from .import_job import ImportJob
 from .event import DeliveryReceipt, InboundEvent
 
 __all__ = [
@@ -11,6 +13,8 @@ __all__ = [
     'Segment', 
     'Campaign', 
     'Message', 
+    'DeadLetter', 
+    'ImportJob', 
     'DeliveryReceipt', 
     'InboundEvent'
 ]
\ No newline at end of file
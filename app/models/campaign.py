@@ -1,11 +1,13 @@
 from app.database.connection import get_db
 from datetime import datetime
 import json
+import time
 
 class Campaign:
     def __init__(self,campaign_id=None, name=None, topic_id=None, template_id=None, 
                  schedule=None, status='DRAFT', rate_limit=10, quiet_hours=None,
-                 created_at=None, updated_at=None):
+                 next_run_at=None, segment_id=None, run_number=0, launch_cursor=None,
+                 audience_frozen_at=None, last_error=None, created_at=None, updated_at=None):
         self.campaign_id = campaign_id
         self.name = name
         self.topic_id = topic_id
@@ -14,6 +16,16 @@ class Campaign:
         self.status = status
         self.rate_limit = rate_limit
         self.quiet_hours = quiet_hours or {}
+        self.next_run_at = next_run_at
+        self.segment_id = segment_id
+        # Maintained by start_run / Message.queue_page only; save() leaves them alone
+        # so a stale copy can't move a running launch's checkpoint back
+        self.run_number = run_number
+        self.launch_cursor = launch_cursor
+        # Set by AudienceService when the audience is frozen into campaign_audience
+        self.audience_frozen_at = audience_frozen_at
+        # Why the last scheduled run failed to launch (record_run_failure)
+        self.last_error = last_error
         self.created_at = created_at
         self.updated_at = updated_at
     
@@ -27,6 +39,12 @@ class Campaign:
             'status': self.status,
             'rate_limit': self.rate_limit,
             'quiet_hours': self.quiet_hours,
+            'next_run_at': datetime.utcfromtimestamp(self.next_run_at).isoformat() if self.next_run_at else None,
+            'segment_id': self.segment_id,
+            'run_number': self.run_number,
+            'launch_cursor': self.launch_cursor,
+            'audience_frozen_at': datetime.utcfromtimestamp(self.audience_frozen_at).isoformat() if self.audience_frozen_at else None,
+            'last_error': self.last_error,
             'created_at': self.created_at,
             'updated_at': self.updated_at
         }
@@ -39,25 +57,261 @@ class Campaign:
             # Update existing campaign
             db.execute(
                 """UPDATE campaigns SET topic_id=?, template_id=?, schedule=?, 
-                status=?, rate_limit=?, quiet_hours=? WHERE campaign_id=?""",
+                status=?, rate_limit=?, quiet_hours=?, next_run_at=?, segment_id=? WHERE campaign_id=?""",
                 (self.topic_id, self.template_id, json.dumps(self.schedule),
                  self.status, self.rate_limit, json.dumps(self.quiet_hours), 
-                 self.campaign_id)
+                 self.next_run_at, self.segment_id, self.campaign_id)
             )
         else:
             # Create new campaign
             cursor = db.execute(
                 """INSERT INTO campaigns 
-                (topic_id, template_id, schedule, status, rate_limit, quiet_hours)
-                VALUES (?, ?, ?, ?, ?, ?)""",
+                (topic_id, template_id, schedule, status, rate_limit, quiet_hours, next_run_at, segment_id)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?)""",
                 (self.topic_id, self.template_id, json.dumps(self.schedule),
-                 self.status, self.rate_limit, json.dumps(self.quiet_hours))
+                 self.status, self.rate_limit, json.dumps(self.quiet_hours), self.next_run_at,
+                 self.segment_id)
             )
             self.campaign_id = cursor.lastrowid
         
         db.commit()
         return self
     
+    @classmethod
+    def start_run(cls, campaign_id, from_states=('DRAFT', 'SCHEDULED')):
+        """
+        Move a campaign to RUNNING under a new run_number with an empty launch
+        checkpoint. Only one caller wins; returns the new run_number, or None
+        if the campaign was not in one of from_states.
+        """
+        db = get_db()
+        placeholders = ', '.join('?' for _ in from_states)
+        cursor = db.execute(
+            f"""UPDATE campaigns SET status = 'RUNNING', run_number = COALESCE(run_number, 0) + 1,
+            launch_cursor = NULL, launch_done = 0, launch_owner = NULL, launch_heartbeat = NULL, last_error = NULL
+            WHERE campaign_id = ? AND status IN ({placeholders})""",
+            (campaign_id, *from_states)
+        )
+        db.commit()
+        if cursor.rowcount != 1:
+            return None
+        return db.execute("SELECT run_number FROM campaigns WHERE campaign_id = ?", (campaign_id,)).fetchone()[0]
+    
+    @classmethod
+    def transition(cls, campaign_id, from_status, to_status):
+        """Change status only if it is still from_status; False if another request got there first"""
+        db = get_db()
+        cursor = db.execute(
+            "UPDATE campaigns SET status = ? WHERE campaign_id = ? AND status = ?",
+            (to_status, campaign_id, from_status)
+        )
+        db.commit()
+        return cursor.rowcount == 1
+    
+    @classmethod
+    def get_status(cls, campaign_id):
+        """Current status straight from the database (None if the campaign is gone)"""
+        db = get_db()
+        row = db.execute("SELECT status FROM campaigns WHERE campaign_id = ?", (campaign_id,)).fetchone()
+        return row['status'] if row else None
+    
+    @classmethod
+    def acquire_launch(cls, campaign_id, owner, lease_seconds):
+        """
+        Take the lease on queueing the campaign's current run for `owner`;
+        False while another driver's lease is live (renewed by its pages)
+        """
+        db = get_db()
+        now = time.time()
+        cursor = db.execute(
+            """UPDATE campaigns SET launch_owner = ?, launch_heartbeat = ?
+            WHERE campaign_id = ? AND (launch_owner IS NULL OR launch_owner = ? OR launch_heartbeat < ?)""",
+            (owner, now, campaign_id, owner, now - lease_seconds)
+        )
+        db.commit()
+        return cursor.rowcount == 1
+    
+    @classmethod
+    def release_launch(cls, campaign_id, owner):
+        db = get_db()
+        db.execute(
+            "UPDATE campaigns SET launch_owner = NULL, launch_heartbeat = NULL WHERE campaign_id = ? AND launch_owner = ?",
+            (campaign_id, owner)
+        )
+        db.commit()
+    
+    @classmethod
+    def finish_queueing(cls, campaign_id, run_number):
+        """Record that the run has queued its whole audience, so it can complete once drained"""
+        db = get_db()
+        db.execute(
+            "UPDATE campaigns SET launch_done = 1 WHERE campaign_id = ? AND run_number = ?",
+            (campaign_id, run_number)
+        )
+        db.commit()
+    
+    @classmethod
+    def complete_if_drained(cls, campaign_id):
+        """
+        Mark a RUNNING campaign COMPLETED once its launch has queued every
+        recipient and none of its messages are QUEUED or SENDING
+        """
+        db = get_db()
+        cursor = db.execute(
+            """UPDATE campaigns SET status = 'COMPLETED'
+            WHERE campaign_id = ? AND status = 'RUNNING' AND launch_done = 1 AND NOT EXISTS (
+                SELECT 1 FROM messages
+                WHERE campaign_id = ? AND state IN ('QUEUED', 'SENDING')
+            )""",
+            (campaign_id, campaign_id)
+        )
+        completed = cursor.rowcount == 1
+        if completed:
+            # Recurring campaigns keep their frozen audience for the next run
+            cursor = db.execute(
+                """UPDATE campaigns SET audience_frozen_at = NULL
+                WHERE campaign_id = ? AND next_run_at IS NULL AND audience_frozen_at IS NOT NULL""",
+                (campaign_id,)
+            )
+            if cursor.rowcount:
+                db.execute("DELETE FROM campaign_audience WHERE campaign_id = ?", (campaign_id,))
+        db.commit()
+        return completed
+    
+    @classmethod
+    def get_stats(cls, campaign_id):
+        """{state: message count} for a campaign, from the campaign_stats counters"""
+        db = get_db()
+        rows = db.execute(
+            "SELECT state, count FROM campaign_stats WHERE campaign_id = ?", (campaign_id,)
+        ).fetchall()
+        return {row['state']: row['count'] for row in rows}
+    
+    @classmethod
+    def rebuild_stats(cls, campaign_id=None):
+        """
+        Recount campaign_stats from messages with one GROUP BY state (every
+        campaign when campaign_id is None), for repairs; returns the new counts
+        of the campaign, or None when all campaigns were recounted.
+        """
+        db = get_db()
+        if db.in_transaction:
+            db.commit()
+        
+        where, params = ("WHERE campaign_id = ?", (campaign_id,)) if campaign_id is not None else ("", ())
+        db.execute("BEGIN IMMEDIATE")
+        try:
+            db.execute(f"DELETE FROM campaign_stats {where}", params)
+            db.execute(
+                f"""INSERT INTO campaign_stats (campaign_id, state, count)
+                SELECT campaign_id, state, COUNT(*) FROM messages {where} GROUP BY campaign_id, state""",
+                params
+            )
+            db.commit()
+        except Exception:
+            db.rollback()
+            raise
+        return cls.get_stats(campaign_id) if campaign_id is not None else None
+    
+    @classmethod
+    def get_page_with_stats(cls, limit=50, before=None):
+        """
+        One page of campaigns, newest first (campaign_id below `before`), each
+        with its message counts: one query, the page joined to its
+        campaign_stats rows and grouped. Returns [(Campaign, {stat: count})].
+        """
+        db = get_db()
+        where, params = ("WHERE campaign_id < ?", [before]) if before is not None else ("", [])
+        rows = db.execute(
+            f"""SELECT campaigns.*,
+                COALESCE(SUM(campaign_stats.count), 0) AS stats_total,
+                COALESCE(SUM(CASE WHEN campaign_stats.state = 'SENT' THEN campaign_stats.count END), 0) AS stats_sent,
+                COALESCE(SUM(CASE WHEN campaign_stats.state = 'FAILED' THEN campaign_stats.count END), 0) AS stats_failed,
+                COALESCE(SUM(CASE WHEN campaign_stats.state = 'DELIVERED' THEN campaign_stats.count END), 0) AS stats_delivered
+            FROM (SELECT * FROM campaigns {where} ORDER BY campaign_id DESC LIMIT ?) AS campaigns
+            LEFT JOIN campaign_stats ON campaign_stats.campaign_id = campaigns.campaign_id
+            GROUP BY campaigns.campaign_id
+            ORDER BY campaigns.campaign_id DESC""",
+            params + [limit]
+        ).fetchall()
+        return [(cls._row_to_campaign(row), {
+            'total': row['stats_total'],
+            'sent': row['stats_sent'],
+            'failed': row['stats_failed'],
+            'delivered': row['stats_delivered']
+        }) for row in rows]
+    
+    @classmethod
+    def listing_version(cls):
+        """Counter bumped by every write to campaigns or campaign_stats (any process)"""
+        db = get_db()
+        row = db.execute("SELECT version FROM campaigns_version WHERE id = 1").fetchone()
+        return row['version'] if row else None
+    
+    @classmethod
+    def get_due(cls, now, limit=100):
+        """(campaign_id, next_run_at) of campaigns whose scheduled run is due, earliest first"""
+        db = get_db()
+        rows = db.execute(
+            """SELECT campaign_id, next_run_at FROM campaigns
+            WHERE next_run_at IS NOT NULL AND next_run_at <= ? ORDER BY next_run_at LIMIT ?""",
+            (now, limit)
+        ).fetchall()
+        return [(row['campaign_id'], row['next_run_at']) for row in rows]
+    
+    @classmethod
+    def advance_schedule(cls, campaign_id, due_at, next_run_at):
+        """
+        Move a due campaign on to its next run (None = no more runs). Only one
+        scheduler wins the update, and the winner is the one that launches it.
+        """
+        db = get_db()
+        cursor = db.execute(
+            "UPDATE campaigns SET next_run_at = ? WHERE campaign_id = ? AND next_run_at = ?",
+            (next_run_at, campaign_id, due_at)
+        )
+        db.commit()
+        return cursor.rowcount == 1
+    
+    @classmethod
+    def record_run_failure(cls, campaign_id, error, retry_at):
+        """
+        Record why a scheduled run didn't launch and bring its next run forward
+        to retry_at (a used-up one-off schedule gets it back). Only while the
+        campaign is still SCHEDULED; returns whether it was.
+        """
+        db = get_db()
+        cursor = db.execute(
+            """UPDATE campaigns SET last_error = ?,
+            next_run_at = CASE WHEN next_run_at IS NULL OR next_run_at > ? THEN ? ELSE next_run_at END
+            WHERE campaign_id = ? AND status = 'SCHEDULED'""",
+            (error, retry_at, retry_at, campaign_id)
+        )
+        db.commit()
+        return cursor.rowcount == 1
+    
+    @classmethod
+    def get_stale_audiences(cls, stale_before, limit=100):
+        """Ids of campaigns waiting for a run whose frozen audience was last refreshed before stale_before"""
+        db = get_db()
+        rows = db.execute(
+            """SELECT campaign_id FROM campaigns
+            WHERE audience_frozen_at IS NOT NULL AND audience_frozen_at < ?
+            AND status IN ('SCHEDULED', 'COMPLETED') AND next_run_at IS NOT NULL
+            ORDER BY next_run_at LIMIT ?""",
+            (stale_before, limit)
+        ).fetchall()
+        return [row['campaign_id'] for row in rows]
+    
+    @classmethod
+    def next_scheduled_at(cls):
+        """Earliest upcoming scheduled run over all campaigns (None if there is none)"""
+        db = get_db()
+        row = db.execute(
+            "SELECT MIN(next_run_at) AS next_run_at FROM campaigns WHERE next_run_at IS NOT NULL"
+        ).fetchone()
+        return row['next_run_at']
+    
     @classmethod
     def get_by_id(cls, campaign_id):
         """Get campaign by ID"""
@@ -91,6 +345,12 @@ class Campaign:
             status=row['status'],
             rate_limit=row['rate_limit'],
             quiet_hours=json.loads(row['quiet_hours'] or '{}'),
+            next_run_at=row['next_run_at'],
+            segment_id=row['segment_id'],
+            run_number=row['run_number'] or 0,
+            launch_cursor=row['launch_cursor'],
+            audience_frozen_at=row['audience_frozen_at'],
+            last_error=row['last_error'],
             created_at=row['created_at'],
             updated_at=row['updated_at']
         )
\ No newline at end of file
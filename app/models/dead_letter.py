@@ -0,0 +1,100 @@
+from app.database.connection import get_db
+
+
+class DeadLetter:
+    """A message that exhausted its send attempts on transient errors"""
+
+    def __init__(self, dead_letter_id=None, message_id=None, campaign_id=None,
+                 phone_number=None, attempts=0, error_code=None, created_at=None):
+        self.dead_letter_id = dead_letter_id
+        self.message_id = message_id
+        self.campaign_id = campaign_id
+        self.phone_number = phone_number
+        self.attempts = attempts
+        self.error_code = error_code
+        self.created_at = created_at
+
+    def to_dict(self):
+        return {
+            'dead_letter_id': self.dead_letter_id,
+            'message_id': self.message_id,
+            'campaign_id': self.campaign_id,
+            'phone_number': self.phone_number,
+            'attempts': self.attempts,
+            'error_code': self.error_code,
+            'created_at': self.created_at
+        }
+
+    @classmethod
+    def get_all(cls, campaign_id=None, limit=100):
+        """List dead-lettered messages, newest first"""
+        db = get_db()
+        if campaign_id is None:
+            rows = db.execute(
+                "SELECT * FROM messages_dead_letter ORDER BY dead_letter_id DESC LIMIT ?",
+                (limit,)
+            ).fetchall()
+        else:
+            rows = db.execute(
+                """SELECT * FROM messages_dead_letter WHERE campaign_id = ?
+                ORDER BY dead_letter_id DESC LIMIT ?""",
+                (campaign_id, limit)
+            ).fetchall()
+        return [cls._row_to_dead_letter(row) for row in rows]
+
+    @classmethod
+    def redrive(cls, campaign_id=None, message_ids=None, limit=1000):
+        """
+        Return dead-lettered messages to the outbox with a fresh attempt budget.
+        Their COMPLETED campaigns go back to RUNNING so they complete again
+        once drained; something has to send them (see
+        CampaignService.redrive_dead_letters). Returns (re-queued message ids,
+        ids of the campaigns reopened).
+        """
+        db = get_db()
+        query = "SELECT message_id, campaign_id FROM messages_dead_letter WHERE 1 = 1"
+        params = []
+        if campaign_id is not None:
+            query += " AND campaign_id = ?"
+            params.append(campaign_id)
+        if message_ids:
+            query += f" AND message_id IN ({','.join('?' for _ in message_ids)})"
+            params.extend(message_ids)
+        query += " ORDER BY dead_letter_id LIMIT ?"
+        params.append(limit)
+
+        try:
+            rows = db.execute(query, params).fetchall()
+            ids = [(row['message_id'],) for row in rows]
+            db.executemany(
+                """UPDATE messages SET state = 'QUEUED', attempts = 0, next_attempt_at = 0,
+                error_code = NULL WHERE message_id = ? AND state = 'FAILED'""",
+                ids
+            )
+            db.executemany("DELETE FROM messages_dead_letter WHERE message_id = ?", ids)
+            reopened = []
+            for cid in sorted({row['campaign_id'] for row in rows}):
+                # A COMPLETED run had queued everyone (its launch_done may predate the column)
+                cursor = db.execute(
+                    "UPDATE campaigns SET status = 'RUNNING', launch_done = 1 WHERE campaign_id = ? AND status = 'COMPLETED'",
+                    (cid,)
+                )
+                if cursor.rowcount:
+                    reopened.append(cid)
+            db.commit()
+        except Exception:
+            db.rollback()
+            raise
+        return [message_id for (message_id,) in ids], reopened
+
+    @classmethod
+    def _row_to_dead_letter(cls, row):
+        return cls(
+            dead_letter_id=row['dead_letter_id'],
+            message_id=row['message_id'],
+            campaign_id=row['campaign_id'],
+            phone_number=row['phone_number'],
+            attempts=row['attempts'],
+            error_code=row['error_code'],
+            created_at=row['created_at']
+        )
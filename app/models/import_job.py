@@ -0,0 +1,135 @@
+import time
+import uuid
+from datetime import datetime
+from app.database.connection import get_db
+
+
+class ImportJob:
+    """A background /users/bulk import and its progress"""
+
+    def __init__(self, job_id=None, status='QUEUED', filename=None, spool_path=None,
+                 rejects_path=None, rows_processed=0, created_count=0, updated_count=0,
+                 rejected_count=0, error=None, owner=None, started_at=None, finished_at=None, created_at=None):
+        self.job_id = job_id
+        self.status = status
+        self.filename = filename
+        self.spool_path = spool_path
+        self.rejects_path = rejects_path
+        self.rows_processed = rows_processed
+        self.created_count = created_count
+        self.updated_count = updated_count
+        self.rejected_count = rejected_count
+        self.error = error
+        self.owner = owner
+        self.started_at = started_at
+        self.finished_at = finished_at
+        self.created_at = created_at
+
+    def to_dict(self):
+        elapsed = None
+        if self.started_at:
+            elapsed = (self.finished_at or time.time()) - self.started_at
+        return {
+            'job_id': self.job_id,
+            'status': self.status,
+            'filename': self.filename,
+            'rows_processed': self.rows_processed,
+            'created': self.created_count,
+            'updated': self.updated_count,
+            'rejected': self.rejected_count,
+            'throughput_per_sec': round(self.rows_processed / elapsed, 2) if elapsed else 0,
+            'error': self.error,
+            'started_at': datetime.utcfromtimestamp(self.started_at).isoformat() if self.started_at else None,
+            'finished_at': datetime.utcfromtimestamp(self.finished_at).isoformat() if self.finished_at else None,
+            'created_at': self.created_at
+        }
+
+    @classmethod
+    def create(cls, filename, spool_path, rejects_path, job_id=None, owner=None):
+        """Record a queued import run by `owner`; spool_path must already hold the upload"""
+        db = get_db()
+        job_id = job_id or uuid.uuid4().hex
+        db.execute(
+            """INSERT INTO import_jobs (job_id, filename, spool_path, rejects_path, owner)
+            VALUES (?, ?, ?, ?, ?)""",
+            (job_id, filename, spool_path, rejects_path, owner)
+        )
+        db.commit()
+        return cls.get_by_id(job_id)
+
+    @classmethod
+    def get_by_id(cls, job_id):
+        db = get_db()
+        row = db.execute("SELECT * FROM import_jobs WHERE job_id = ?", (job_id,)).fetchone()
+        return cls._row_to_import_job(row) if row else None
+
+    @classmethod
+    def get_unfinished(cls):
+        """Jobs still QUEUED or RUNNING"""
+        db = get_db()
+        rows = db.execute("SELECT * FROM import_jobs WHERE status IN ('QUEUED', 'RUNNING')").fetchall()
+        return [cls._row_to_import_job(row) for row in rows]
+
+    @classmethod
+    def fail_interrupted(cls, job_id, owner, error):
+        """Mark an unfinished job FAILED if `owner` still holds it; False if it moved on meanwhile"""
+        db = get_db()
+        cursor = db.execute(
+            """UPDATE import_jobs SET status = 'FAILED', error = ?, finished_at = ?
+            WHERE job_id = ? AND status IN ('QUEUED', 'RUNNING') AND owner IS ?""",
+            (error, time.time(), job_id, owner)
+        )
+        db.commit()
+        return cursor.rowcount == 1
+
+    @classmethod
+    def mark_running(cls, job_id):
+        db = get_db()
+        db.execute(
+            "UPDATE import_jobs SET status = 'RUNNING', started_at = ? WHERE job_id = ?",
+            (time.time(), job_id)
+        )
+        db.commit()
+
+    @classmethod
+    def update_progress(cls, job_id, counts):
+        """Store running totals ({'created', 'updated', 'rejected'}) after a batch"""
+        db = get_db()
+        db.execute(
+            """UPDATE import_jobs SET rows_processed = ?, created_count = ?, updated_count = ?,
+            rejected_count = ? WHERE job_id = ?""",
+            (sum(counts.values()), counts['created'], counts['updated'], counts['rejected'], job_id)
+        )
+        db.commit()
+
+    @classmethod
+    def finish(cls, job_id, error=None):
+        db = get_db()
+        db.execute(
+            "UPDATE import_jobs SET status = ?, error = ?, finished_at = ? WHERE job_id = ?",
+            ('FAILED' if error else 'COMPLETED', error, time.time(), job_id)
+        )
+        db.commit()
+
+    @classmethod
+    def _row_to_import_job(cls, row):
+        """Convert database row to ImportJob object"""
+        if not row:
+            return None
+
+        return cls(
+            job_id=row['job_id'],
+            status=row['status'],
+            filename=row['filename'],
+            spool_path=row['spool_path'],
+            rejects_path=row['rejects_path'],
+            rows_processed=row['rows_processed'],
+            created_count=row['created_count'],
+            updated_count=row['updated_count'],
+            rejected_count=row['rejected_count'],
+            error=row['error'],
+            owner=row['owner'],
+            started_at=row['started_at'],
+            finished_at=row['finished_at'],
+            created_at=row['created_at']
+        )
@@ -1,9 +1,16 @@
+import time
+from collections import Counter
+from itertools import islice
 from app.database.connection import get_db
 
 class Message:
+    # provider_message_sid is NOT NULL; outbox rows carry this until the provider assigns one
+    PENDING_SID = 'pending'
+    
     def __init__(self, message_id=None, campaign_id=None, phone_number=None,
                  template_id=None, body=None, state='QUEUED', provider_message_sid=None,
-                 error_code=None, created_at=None, updated_at=None):
+                 error_code=None, attempts=0, next_attempt_at=0, recipient_timezone=None,
+                 run_number=None, created_at=None, updated_at=None):
         self.message_id = message_id
         self.campaign_id = campaign_id
         self.phone_number = phone_number
@@ -12,6 +19,10 @@ class Message:
         self.state = state
         self.provider_message_sid = provider_message_sid
         self.error_code = error_code
+        self.attempts = attempts
+        self.next_attempt_at = next_attempt_at
+        self.recipient_timezone = recipient_timezone
+        self.run_number = run_number
         self.created_at = created_at
         self.updated_at = updated_at
     
@@ -25,10 +36,38 @@ class Message:
             'state': self.state,
             'provider_message_sid': self.provider_message_sid,
             'error_code': self.error_code,
+            'attempts': self.attempts,
+            'next_attempt_at': self.next_attempt_at,
+            'recipient_timezone': self.recipient_timezone,
+            'run_number': self.run_number,
             'created_at': self.created_at,
             'updated_at': self.updated_at
         }
     
+    _INSERT_SQL = """INSERT INTO messages 
+        (campaign_id, phone_number, template_id, body, state, provider_message_sid, error_code,
+        next_attempt_at, recipient_timezone, run_number)
+        VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)"""
+    
+    def _insert_params(self):
+        return (self.campaign_id, self.phone_number, self.template_id, self.body,
+                self.state, self.provider_message_sid, self.error_code, self.next_attempt_at or 0,
+                self.recipient_timezone, self.run_number)
+    
+    @staticmethod
+    def _count_inserted(db, messages):
+        """
+        Add newly inserted messages to campaign_stats, one upsert per
+        (campaign, state) in the batch; call inside the inserting transaction.
+        State changes and deletes are counted by triggers on messages.
+        """
+        counts = Counter((message.campaign_id, message.state) for message in messages)
+        db.executemany(
+            """INSERT INTO campaign_stats (campaign_id, state, count) VALUES (?, ?, ?)
+            ON CONFLICT (campaign_id, state) DO UPDATE SET count = count + excluded.count""",
+            [(campaign_id, state, count) for (campaign_id, state), count in counts.items()]
+        )
+    
     def save(self):
         """Save message to database"""
         db = get_db()
@@ -44,18 +83,259 @@ class Message:
             )
         else:
             # Create new message
-            cursor = db.execute(
-                """INSERT INTO messages 
-                (campaign_id, phone_number, template_id, body, state, provider_message_sid, error_code)
-                VALUES (?, ?, ?, ?, ?, ?, ?)""",
-                (self.campaign_id, self.phone_number, self.template_id, self.body,
-                 self.state, self.provider_message_sid, self.error_code)
-            )
+            cursor = db.execute(Message._INSERT_SQL, self._insert_params())
             self.message_id = cursor.lastrowid
+            Message._count_inserted(db, [self])
         
         db.commit()
         return self
     
+    @classmethod
+    def bulk_insert(cls, messages, batch_size=1000):
+        """
+        Insert new messages with one executemany and one transaction per
+        `batch_size` rows. Sets message_id on each message and returns the ids
+        in input order. Accepts any iterable, so callers can stream rows.
+        Launches use queue_page instead, which also skips recipients already
+        queued and moves the launch checkpoint.
+        """
+        db = get_db()
+        if db.in_transaction:
+            db.commit()
+        
+        ids = []
+        messages = iter(messages)
+        while True:
+            batch = list(islice(messages, batch_size))
+            if not batch:
+                return ids
+            # The write lock is held for the whole batch, so its AUTOINCREMENT
+            # ids are consecutive and end at last_insert_rowid()
+            db.execute("BEGIN IMMEDIATE")
+            try:
+                db.executemany(Message._INSERT_SQL, [message._insert_params() for message in batch])
+                last_id = db.execute("SELECT last_insert_rowid()").fetchone()[0]
+                Message._count_inserted(db, batch)
+                db.commit()
+            except Exception:
+                db.rollback()
+                raise
+            first_id = last_id - len(batch) + 1
+            for offset, message in enumerate(batch):
+                message.message_id = first_id + offset
+            ids.extend(range(first_id, last_id + 1))
+    
+    @classmethod
+    def queue_page(cls, messages, campaign_id, cursor, owner=None):
+        """
+        Insert one launch page of messages and move the campaign's launch
+        checkpoint forward to `cursor` (the page's last recipient), in one
+        transaction. A recipient that already has a message in the same run
+        is skipped, so replaying a page after a crash or a retried launch
+        sends nothing twice. With `owner`, the page also renews that driver's
+        launch lease, and is rolled back (ValueError) if another driver has
+        taken the lease over. Returns how many messages were inserted.
+        """
+        db = get_db()
+        if db.in_transaction:
+            db.commit()
+        
+        db.execute("BEGIN IMMEDIATE")
+        try:
+            if messages:
+                # Recipients already queued in this run (a replayed page); one
+                # range seek on idx_messages_recipient, usually finding none
+                phones = [message.phone_number for message in messages]
+                queued = {row[0] for row in db.execute(
+                    """SELECT phone_number FROM messages
+                    WHERE campaign_id = ? AND run_number = ? AND phone_number BETWEEN ? AND ?""",
+                    (campaign_id, messages[0].run_number, min(phones), max(phones))
+                )}
+                messages = [message for message in messages if message.phone_number not in queued]
+            before = db.total_changes
+            db.executemany(
+                cls._INSERT_SQL + " ON CONFLICT (campaign_id, run_number, phone_number) DO NOTHING",
+                [message._insert_params() for message in messages]
+            )
+            inserted = db.total_changes - before
+            cls._count_inserted(db, messages)
+            # The checkpoint only moves forward, whichever driver writes last
+            checkpoint = db.execute(
+                """UPDATE campaigns SET launch_cursor = CASE
+                    WHEN launch_cursor IS NULL OR launch_cursor < ? THEN ? ELSE launch_cursor END,
+                launch_heartbeat = CASE WHEN ? IS NULL THEN launch_heartbeat ELSE ? END
+                WHERE campaign_id = ? AND (? IS NULL OR launch_owner = ?)""",
+                (cursor, cursor, owner, time.time(), campaign_id, owner, owner)
+            )
+            if checkpoint.rowcount != 1:
+                raise ValueError("Launch lease lost to another driver")
+            db.commit()
+        except Exception:
+            db.rollback()
+            raise
+        return inserted
+    
+    # ---------------------------
+    # Outbox (lease / ack)
+    # ---------------------------
+    _NOT_PAUSED = """NOT EXISTS (SELECT 1 FROM campaigns
+        WHERE campaigns.campaign_id = messages.campaign_id AND campaigns.status = 'PAUSED')"""
+    
+    @classmethod
+    def claim_batch(cls, owner, limit, lease_seconds, campaign_id=None):
+        """Lease up to `limit` due QUEUED messages to `owner` and move them to SENDING"""
+        db = get_db()
+        if db.in_transaction:
+            db.commit()
+        
+        now = time.time()
+        # IMMEDIATE takes the write lock up front so two workers never claim the same rows
+        db.execute("BEGIN IMMEDIATE")
+        try:
+            # First attempts (next_attempt_at = 0) sort ahead of retries that have come due.
+            # Messages of PAUSED campaigns stay QUEUED until the campaign is resumed.
+            if campaign_id is None:
+                rows = db.execute(
+                    f"""SELECT * FROM messages WHERE state = 'QUEUED' AND next_attempt_at <= ?
+                    AND {cls._NOT_PAUSED} ORDER BY next_attempt_at, message_id LIMIT ?""",
+                    (now, limit)
+                ).fetchall()
+            else:
+                rows = db.execute(
+                    f"""SELECT * FROM messages WHERE campaign_id = ? AND state = 'QUEUED'
+                    AND next_attempt_at <= ? AND {cls._NOT_PAUSED} ORDER BY next_attempt_at, message_id LIMIT ?""",
+                    (campaign_id, now, limit)
+                ).fetchall()
+            
+            expires_at = now + lease_seconds
+            db.executemany(
+                """UPDATE messages SET state = 'SENDING', lease_owner = ?, lease_expires_at = ?
+                WHERE message_id = ? AND state = 'QUEUED'""",
+                [(owner, expires_at, row['message_id']) for row in rows]
+            )
+            db.commit()
+        except Exception:
+            db.rollback()
+            raise
+        
+        messages = [cls._row_to_message(row) for row in rows]
+        for message in messages:
+            message.state = 'SENDING'
+        return messages
+    
+    @classmethod
+    def ack(cls, message_id, owner, state, provider_message_sid=None, error_code=None):
+        """Record the send result for a leased message; False if the lease was lost"""
+        db = get_db()
+        cursor = db.execute(
+            """UPDATE messages SET state = ?, provider_message_sid = ?, error_code = ?,
+            attempts = attempts + 1, lease_owner = NULL, lease_expires_at = NULL
+            WHERE message_id = ? AND state = 'SENDING' AND lease_owner = ?""",
+            (state, provider_message_sid or cls.PENDING_SID, error_code, message_id, owner)
+        )
+        db.commit()
+        return cursor.rowcount == 1
+    
+    @classmethod
+    def reschedule(cls, message_id, owner, next_attempt_at, error_code=None):
+        """Put a leased message back in the queue for a later attempt"""
+        db = get_db()
+        cursor = db.execute(
+            """UPDATE messages SET state = 'QUEUED', error_code = ?, next_attempt_at = ?,
+            attempts = attempts + 1, lease_owner = NULL, lease_expires_at = NULL
+            WHERE message_id = ? AND state = 'SENDING' AND lease_owner = ?""",
+            (error_code, next_attempt_at, message_id, owner)
+        )
+        db.commit()
+        return cursor.rowcount == 1
+    
+    @classmethod
+    def defer(cls, message_id, owner, release_at):
+        """Hand a leased message back unsent until release_at (quiet hours); not an attempt"""
+        db = get_db()
+        cursor = db.execute(
+            """UPDATE messages SET state = 'QUEUED', next_attempt_at = ?,
+            lease_owner = NULL, lease_expires_at = NULL
+            WHERE message_id = ? AND state = 'SENDING' AND lease_owner = ?""",
+            (release_at, message_id, owner)
+        )
+        db.commit()
+        return cursor.rowcount == 1
+    
+    @classmethod
+    def dead_letter(cls, message_id, owner, error_code=None):
+        """Fail a leased message that used up its attempts and copy it to the dead-letter table"""
+        db = get_db()
+        try:
+            cursor = db.execute(
+                """UPDATE messages SET state = 'FAILED', error_code = ?,
+                attempts = attempts + 1, lease_owner = NULL, lease_expires_at = NULL
+                WHERE message_id = ? AND state = 'SENDING' AND lease_owner = ?""",
+                (error_code, message_id, owner)
+            )
+            if cursor.rowcount == 1:
+                db.execute(
+                    """INSERT OR REPLACE INTO messages_dead_letter
+                    (message_id, campaign_id, phone_number, attempts, error_code)
+                    SELECT message_id, campaign_id, phone_number, attempts, error_code
+                    FROM messages WHERE message_id = ?""",
+                    (message_id,)
+                )
+            db.commit()
+        except Exception:
+            db.rollback()
+            raise
+        return cursor.rowcount == 1
+    
+    @classmethod
+    def next_due_at(cls, campaign_id=None):
+        """Earliest next_attempt_at among QUEUED messages (None if the queue is empty)"""
+        db = get_db()
+        if campaign_id is None:
+            row = db.execute(
+                "SELECT MIN(next_attempt_at) AS due FROM messages WHERE state = 'QUEUED'"
+            ).fetchone()
+        else:
+            row = db.execute(
+                "SELECT MIN(next_attempt_at) AS due FROM messages WHERE campaign_id = ? AND state = 'QUEUED'",
+                (campaign_id,)
+            ).fetchone()
+        return row['due']
+    
+    @classmethod
+    def release_expired_leases(cls, now=None):
+        """Return SENDING messages whose lease expired (crashed worker) to the queue"""
+        db = get_db()
+        cursor = db.execute(
+            """UPDATE messages SET state = 'QUEUED', lease_owner = NULL, lease_expires_at = NULL
+            WHERE state = 'SENDING' AND lease_expires_at < ?""",
+            (now or time.time(),)
+        )
+        db.commit()
+        return cursor.rowcount
+    
+    @classmethod
+    def pending_summary(cls, campaign_id):
+        """QUEUED and SENDING counts of a campaign plus the earliest QUEUED due time"""
+        db = get_db()
+        row = db.execute(
+            """SELECT COALESCE(SUM(state = 'QUEUED'), 0) AS queued,
+            COALESCE(SUM(state = 'SENDING'), 0) AS sending,
+            MIN(CASE WHEN state = 'QUEUED' THEN next_attempt_at END) AS next_due_at
+            FROM messages WHERE campaign_id = ? AND state IN ('QUEUED', 'SENDING')""",
+            (campaign_id,)
+        ).fetchone()
+        return {'queued': row['queued'], 'sending': row['sending'], 'next_due_at': row['next_due_at']}
+    
+    @classmethod
+    def count_pending(cls, campaign_id):
+        """Number of messages of a campaign still QUEUED or SENDING"""
+        db = get_db()
+        return db.execute(
+            "SELECT COUNT(*) AS cnt FROM messages WHERE campaign_id = ? AND state IN ('QUEUED', 'SENDING')",
+            (campaign_id,)
+        ).fetchone()['cnt']
+    
     @classmethod
     def get_by_id(cls, message_id):
         """Get message by ID"""
@@ -101,6 +381,10 @@ class Message:
             state=row['state'],
             provider_message_sid=row['provider_message_sid'],
             error_code=row['error_code'],
+            attempts=row['attempts'],
+            next_attempt_at=row['next_attempt_at'],
+            recipient_timezone=row['recipient_timezone'],
+            run_number=row['run_number'],
             created_at=row['created_at'],
             updated_at=row['updated_at']
         )
\ No newline at end of file
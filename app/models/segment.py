@@ -1,16 +1,19 @@
 from app.database.connection import get_db
 import json
+import time
 from datetime import datetime
+from app.utils.segment_filters import compile_segment
 
 class Segment:
     def __init__(self, segment_id=None, segment=None, definition=None, 
-                 created_at=None, updated_at=None, is_active=True):
+                 created_at=None, updated_at=None, is_active=True, members_built_at=None):
         self.segment_id = segment_id
         self.segment = segment
         self.definition = definition or {}
         self.created_at = created_at
         self.updated_at = updated_at
         self.is_active = is_active
+        self.members_built_at = members_built_at
     
     def to_dict(self):
         return {
@@ -23,28 +26,140 @@ class Segment:
         }
     
     def save(self):
-        """Save segment to database"""
+        """
+        Save segment to database, rebuilding its members if the definition
+        changed. The write and the rebuild are one transaction, so the members
+        always match the stored definition, even with concurrent saves or a crash.
+        """
         db = get_db()
+        if db.in_transaction:
+            db.commit()
         
-        if self.segment_id:
-            # Update existing segment
-            db.execute(
-                "UPDATE segments SET segment=?, definition=?, is_active=? WHERE segment_id=?",
-                (self.segment, json.dumps(self.definition), self.is_active, self.segment_id)
-            )
-        else:
-            # Create new segment
-            if not self.segment:
-                self.segment = f"segment_{int(datetime.utcnow().timestamp())}"
+        db.execute("BEGIN IMMEDIATE")
+        try:
+            rebuild = bool(self.is_active)
+            if self.segment_id:
+                # Read under the write lock, so a concurrent save can't slip in between
+                previous = db.execute(
+                    "SELECT definition, is_active, members_built_at FROM segments WHERE segment_id = ?",
+                    (self.segment_id,)
+                ).fetchone()
+                if previous and previous['is_active'] and previous['members_built_at']:
+                    rebuild = bool(self.is_active) and json.loads(previous['definition'] or '{}') != self.definition
+                # Update existing segment
+                db.execute(
+                    "UPDATE segments SET segment=?, definition=?, is_active=? WHERE segment_id=?",
+                    (self.segment, json.dumps(self.definition), self.is_active, self.segment_id)
+                )
+            else:
+                # Create new segment
+                if not self.segment:
+                    self.segment = f"segment_{int(datetime.utcnow().timestamp())}"
+                
+                cursor = db.execute(
+                    "INSERT INTO segments (segment, definition) VALUES (?, ?)",
+                    (self.segment, json.dumps(self.definition))
+                )
+                self.segment_id = cursor.lastrowid
             
-            cursor = db.execute(
-                "INSERT INTO segments (segment, definition) VALUES (?, ?)",
-                (self.segment, json.dumps(self.definition))
-            )
-            self.segment_id = cursor.lastrowid
+            if rebuild:
+                Segment._build_members(db, self.segment_id, self.definition)
+            elif not self.is_active:
+                Segment._drop_members(db, self.segment_id)
+            db.commit()
+        except Exception:
+            db.rollback()
+            raise
+        return self
+    
+    # ---------------------------
+    # Materialised membership (segment_members)
+    # ---------------------------
+    @classmethod
+    def rebuild_members(cls, segment_id):
+        """Recompute a segment's members from scratch, from its definition as stored"""
+        db = get_db()
+        if db.in_transaction:
+            db.commit()
         
+        db.execute("BEGIN IMMEDIATE")
+        try:
+            row = db.execute("SELECT definition FROM segments WHERE segment_id = ?", (segment_id,)).fetchone()
+            if row:
+                cls._build_members(db, segment_id, json.loads(row['definition'] or '{}'))
+            db.commit()
+        except Exception:
+            db.rollback()
+            raise
+    
+    @classmethod
+    def _build_members(cls, db, segment_id, definition):
+        # Inside the caller's write transaction
+        where, params = compile_segment(definition)
+        db.execute("DELETE FROM segment_members WHERE segment_id = ?", (segment_id,))
+        db.execute(
+            f"""INSERT INTO segment_members (segment_id, phone_number)
+            SELECT ?, phone_number FROM users WHERE {where}""",
+            [segment_id] + params
+        )
+        db.execute("UPDATE segments SET members_built_at = ? WHERE segment_id = ?", (time.time(), segment_id))
+    
+    @classmethod
+    def drop_members(cls, segment_id):
+        """Forget the members of a deactivated segment"""
+        db = get_db()
+        cls._drop_members(db, segment_id)
         db.commit()
-        return self
+    
+    @classmethod
+    def _drop_members(cls, db, segment_id):
+        db.execute("DELETE FROM segment_members WHERE segment_id = ?", (segment_id,))
+        db.execute("UPDATE segments SET members_built_at = NULL WHERE segment_id = ?", (segment_id,))
+    
+    @classmethod
+    def ensure_members(cls, segment):
+        """Build a segment's members if they never have been (e.g. segments created before materialisation)"""
+        if not segment.members_built_at:
+            cls.rebuild_members(segment.segment_id)
+    
+    @classmethod
+    def refresh_members_for(cls, phone_numbers):
+        """
+        Re-check just these users against every built segment. Runs on the
+        caller's connection without committing, so it belongs to the same
+        transaction as the user write that made it necessary.
+        """
+        phone_numbers = list(phone_numbers)
+        if not phone_numbers:
+            return
+        db = get_db()
+        segments = db.execute(
+            "SELECT segment_id, definition FROM segments WHERE is_active = 1 AND members_built_at IS NOT NULL"
+        ).fetchall()
+        for row in segments:
+            try:
+                where, params = compile_segment(json.loads(row['definition'] or '{}'))
+            except ValueError:
+                continue  # stored before definitions were validated; it can't be materialised
+            for i in range(0, len(phone_numbers), 500):
+                chunk = phone_numbers[i:i + 500]
+                placeholders = ','.join('?' * len(chunk))
+                db.execute(
+                    f"DELETE FROM segment_members WHERE segment_id = ? AND phone_number IN ({placeholders})",
+                    [row['segment_id']] + chunk
+                )
+                db.execute(
+                    f"""INSERT INTO segment_members (segment_id, phone_number)
+                    SELECT ?, phone_number FROM users WHERE phone_number IN ({placeholders}) AND {where}""",
+                    [row['segment_id']] + chunk + params
+                )
+    
+    @classmethod
+    def member_count(cls, segment_id):
+        db = get_db()
+        return db.execute(
+            "SELECT COUNT(*) FROM segment_members WHERE segment_id = ?", (segment_id,)
+        ).fetchone()[0]
     
     @classmethod
     def get_by_id(cls, segment_id):
@@ -77,5 +192,6 @@ class Segment:
             definition=json.loads(row['definition'] or '{}'),
             created_at=row['created_at'],
             updated_at=row['updated_at'],
-            is_active=bool(row['is_active'])
+            is_active=bool(row['is_active']),
+            members_built_at=row['members_built_at']
         )
\ No newline at end of file
@@ -1,4 +1,5 @@
 from app.database.connection import get_db
+from app.utils.template_utils import invalidate_template
 import json
 from datetime import datetime
 
@@ -46,6 +47,7 @@ class Template:
             self.template_id = cursor.lastrowid
         
         db.commit()
+        invalidate_template(self.template_id)
         return self
     
     @classmethod
@@ -1,6 +1,13 @@
 from app.database.connection import get_db
 import json
-from app.utils.phone_utils import normalize_phone, validate_e164
+from collections import namedtuple
+from itertools import islice
+from app.models.segment import Segment
+from app.utils.attribute_index import get_attribute_index
+from app.utils.phone_utils import normalize_and_validate
+
+# What a send needs from a user; far smaller than a User, for walking large audiences
+Recipient = namedtuple('Recipient', ['phone_number', 'attributes'])
 
 class User:
     def __init__(self, phone_number=None, attributes=None, consent_state='PENDING', 
@@ -26,18 +33,12 @@ class User:
     def create_or_update(cls, phone, attributes=None, consent=None):
         """Create or update user by phone"""
         db = get_db()
-        normalized_phone = normalize_phone(phone)
+        normalized_phone, is_valid = normalize_and_validate(phone)
         
-        if not validate_e164(normalized_phone):
+        if not is_valid:
             raise ValueError("Invalid phone number")
         
-        # Convert consent dict to consent_state
-        consent_state = 'PENDING'
-        if consent and consent.get('whatsapp') is False:
-            consent_state = 'OPT_OUT'
-        elif consent and consent.get('whatsapp') is True:
-            consent_state = 'OPT_IN'
-        
+        consent_state = cls.consent_state_for(consent)
         attributes_json = json.dumps(attributes or {})
         
         # Check if user exists
@@ -61,14 +62,75 @@ class User:
                 (normalized_phone, attributes_json, consent_state)
             )
         
+        # Keep materialised segment membership current in the same transaction
+        Segment.refresh_members_for([normalized_phone])
         db.commit()
+        if get_attribute_index():
+            get_attribute_index().refresh_users(db, [normalized_phone])
         return cls.get_by_phone(normalized_phone)
     
+    @staticmethod
+    def consent_state_for(consent):
+        """Convert a consent dict ({"whatsapp": true/false}) to consent_state"""
+        if consent and consent.get('whatsapp') is False:
+            return 'OPT_OUT'
+        if consent and consent.get('whatsapp') is True:
+            return 'OPT_IN'
+        return 'PENDING'
+    
+    # Same effect as create_or_update, for one row of an executemany
+    _UPSERT_SQL = """INSERT INTO users (phone_number, attributes, consent_state) VALUES (?, ?, ?)
+        ON CONFLICT(phone_number) DO UPDATE SET
+            attributes = excluded.attributes,
+            consent_state = excluded.consent_state,
+            is_active = 1"""
+    
+    @classmethod
+    def bulk_upsert(cls, rows, batch_size=5000):
+        """
+        Create or update users from (phone_number, attributes, consent_state)
+        tuples with normalised phones, using one executemany and one
+        transaction per `batch_size` rows. Returns (created, updated); a phone
+        repeated in the input counts as created once, then as updated.
+        """
+        db = get_db()
+        if db.in_transaction:
+            db.commit()
+        
+        created = updated = 0
+        rows = iter(rows)
+        while True:
+            batch = [(phone, json.dumps(attributes or {}), consent_state)
+                     for phone, attributes, consent_state in islice(rows, batch_size)]
+            if not batch:
+                return created, updated
+            phones = list({row[0] for row in batch})
+            # Existing rows are counted under the same write lock as the upsert
+            db.execute("BEGIN IMMEDIATE")
+            try:
+                existing = 0
+                for i in range(0, len(phones), 500):
+                    chunk = phones[i:i + 500]
+                    existing += db.execute(
+                        f"SELECT COUNT(*) FROM users WHERE phone_number IN ({','.join('?' * len(chunk))})",
+                        chunk
+                    ).fetchone()[0]
+                db.executemany(cls._UPSERT_SQL, batch)
+                Segment.refresh_members_for(phones)
+                db.commit()
+            except Exception:
+                db.rollback()
+                raise
+            if get_attribute_index():
+                get_attribute_index().refresh_users(db, phones)
+            created += len(phones) - existing
+            updated += len(batch) - (len(phones) - existing)
+    
     @classmethod
     def get_by_phone(cls, phone):
         """Get user by phone"""
         db = get_db()
-        normalized_phone = normalize_phone(phone)
+        normalized_phone, _ = normalize_and_validate(phone)
         row = db.execute(
             "SELECT * FROM users WHERE phone_number = ?", 
             (normalized_phone,)
@@ -84,6 +146,74 @@ class User:
         ).fetchall()
         return [cls._row_to_user(row) for row in rows]
     
+    @classmethod
+    def iter_recipients(cls, page_size=1000, after=None, source="users", key="users.phone_number",
+                        condition="1", params=()):
+        """
+        Yield users as Recipients, in phone_number order. Pages are read by
+        keyset (key > the last one seen), so with an index on `key` each page
+        is an index range scan however deep into the table it is, no cursor
+        stays open between pages, and memory holds one page. Pass `after` to
+        start past a given phone number.
+
+        Every user by default; a narrower audience passes the joined `source`,
+        a `condition` with its `params`, and as `key` the phone_number column
+        of the table that drives the walk (see AudienceService).
+        """
+        db = get_db()
+        after = after or ''
+        sql = (f"SELECT users.phone_number, users.attributes FROM {source} "
+               f"WHERE {condition} AND {key} > ? ORDER BY {key} LIMIT ?")
+        while True:
+            rows = db.execute(sql, (*params, after, page_size)).fetchall()
+            if not rows:
+                return
+            for row in rows:
+                yield Recipient(row['phone_number'], json.loads(row['attributes'] or '{}'))
+            after = rows[-1]['phone_number']
+    
+    @classmethod
+    def iter_where(cls, condition, params=(), batch_size=1000):
+        """
+        Stream users matching a SQL condition (e.g. from compile_segment),
+        fetching `batch_size` rows at a time instead of loading them all
+        """
+        return cls._iter_query(f"SELECT * FROM users WHERE {condition} ORDER BY phone_number", params, batch_size)
+    
+    @classmethod
+    def iter_segment(cls, segment_id, batch_size=1000):
+        """Stream the materialised members of a segment (segment_members), in phone_number order"""
+        return cls._iter_query(
+            """SELECT users.* FROM segment_members
+            JOIN users ON users.phone_number = segment_members.phone_number
+            WHERE segment_members.segment_id = ? ORDER BY segment_members.phone_number""",
+            (segment_id,), batch_size
+        )
+    
+    @classmethod
+    def _iter_query(cls, sql, params, batch_size):
+        db = get_db()
+        cursor = db.execute(sql, params)
+        while True:
+            rows = cursor.fetchmany(batch_size)
+            if not rows:
+                return
+            for row in rows:
+                yield cls._row_to_user(row)
+    
+    @classmethod
+    def count_where(cls, condition, params=()):
+        """Number of users matching a SQL condition"""
+        db = get_db()
+        return db.execute(f"SELECT COUNT(*) FROM users WHERE {condition}", params).fetchone()[0]
+    
+    @classmethod
+    def rowid_range(cls):
+        """(lowest, highest) users.rowid, or (None, None) with no users; read from the rowid b-tree ends"""
+        db = get_db()
+        low, high = db.execute("SELECT MIN(rowid), MAX(rowid) FROM users").fetchone()
+        return low, high
+    
     @classmethod
     def _row_to_user(cls, row):
         """Convert database row to User object"""
@@ -1,13 +1,16 @@
 from .messaging_service import MessagingService
 from .template_service import TemplateService
 from .segment_service import SegmentService
+from .audience_service import AudienceService
 from .campaign_service import CampaignService
 from .webhook_service import WebhookService
+from .send_engine import SendEngine
 
 __all__ = [
     'MessagingService',
     'TemplateService', 
     'SegmentService',
     'CampaignService',
-    'WebhookService'
+    'WebhookService',
+    'SendEngine'
 ]
\ No newline at end of file
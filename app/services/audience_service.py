@@ -0,0 +1,176 @@
+import time
+from app.models.segment import Segment
+from app.models.user import User
+from app.database.connection import get_db
+from app.utils.segment_filters import compile_segment
+
+# Past this many users written since the last refresh, re-freezing in one
+# INSERT ... SELECT is cheaper than re-checking them 500 at a time
+_FULL_REFRESH_CHANGES = 50000
+
+
+class AudienceService:
+    '''
+    Who a campaign sends to: users with an active subscription to the
+    campaign's topic who have not opted out, narrowed to the campaign's
+    segment when it has one. Resolved as one SQL query per page, driven by
+    the (topic_id, unsubscribed_at, phone_number) subscriptions index in
+    phone_number order; the user and segment checks are primary-key lookups
+    on the rows it yields, so no recipient is loaded only to be skipped.
+    '''
+
+    @staticmethod
+    def audience_query(campaign):
+        '''(source, condition, params) of the campaign's audience, for User.iter_recipients'''
+        source = "subscriptions JOIN users ON users.phone_number = subscriptions.phone_number"
+        source_params = []
+        condition = ("subscriptions.topic_id = ? AND subscriptions.unsubscribed_at IS NULL "
+                     "AND users.consent_state != 'OPT_OUT' AND users.is_active = 1")
+        condition_params = [campaign.topic_id]
+
+        if campaign.segment_id:
+            segment = Segment.get_by_id(campaign.segment_id)
+            if not segment:
+                raise ValueError("Segment not found")
+            if segment.is_active:
+                # Materialised members are a (segment_id, phone_number) primary-key probe
+                Segment.ensure_members(segment)
+                source += (" JOIN segment_members ON segment_members.segment_id = ?"
+                           " AND segment_members.phone_number = subscriptions.phone_number")
+                source_params.append(segment.segment_id)
+            else:
+                where, params = compile_segment(segment.definition)
+                condition += f" AND {where}"
+                condition_params += params
+
+        return source, condition, source_params + condition_params
+
+    @staticmethod
+    def _recipients_query(campaign):
+        '''(source, key, condition, params) that launch walks: the frozen snapshot if there is one'''
+        if campaign.audience_frozen_at is None:
+            source, condition, params = AudienceService.audience_query(campaign)
+            return source, "subscriptions.phone_number", condition, params
+        # Consent is re-checked on the user row, which is read for its attributes anyway
+        return (
+            "campaign_audience JOIN users ON users.phone_number = campaign_audience.phone_number",
+            "campaign_audience.phone_number",
+            "campaign_audience.campaign_id = ? AND users.consent_state != 'OPT_OUT' AND users.is_active = 1",
+            [campaign.campaign_id]
+        )
+
+    @staticmethod
+    def iter_recipients(campaign, page_size=1000, after=None):
+        '''Stream the campaign's audience as Recipients, keyset-paginated on phone_number'''
+        source, key, condition, params = AudienceService._recipients_query(campaign)
+        return User.iter_recipients(
+            page_size, after, source=source, key=key, condition=condition, params=params
+        )
+
+    @staticmethod
+    def has_recipients(campaign):
+        return next(AudienceService.iter_recipients(campaign, page_size=1), None) is not None
+
+    @staticmethod
+    def count(campaign):
+        '''Size of the audience a launch would send to right now'''
+        source, _, condition, params = AudienceService._recipients_query(campaign)
+        db = get_db()
+        return db.execute(f"SELECT COUNT(*) FROM {source} WHERE {condition}", params).fetchone()[0]
+
+    # ---------------------------
+    # Frozen audiences (campaign_audience)
+    # ---------------------------
+    @staticmethod
+    def freeze(campaign):
+        '''Snapshot the campaign's audience into campaign_audience, replacing any earlier one; returns its size'''
+        source, condition, params = AudienceService.audience_query(campaign)
+        db = get_db()
+        if db.in_transaction:
+            db.commit()
+
+        # The write lock makes frozen_at a clean cut: every user or subscription
+        # written after it has a later timestamp and is picked up by refresh()
+        db.execute("BEGIN IMMEDIATE")
+        try:
+            frozen_at = time.time()
+            size = AudienceService._refreeze(db, campaign, source, condition, params)
+            AudienceService._mark_frozen(db, campaign, frozen_at)
+            db.commit()
+        except Exception:
+            db.rollback()
+            raise
+        return size
+
+    @staticmethod
+    def refresh(campaign):
+        '''
+        Bring a frozen audience up to date by re-checking only the users and
+        subscriptions written since it was last refreshed; returns how many
+        users were re-checked. A changed segment definition re-freezes it.
+        '''
+        since = campaign.audience_frozen_at
+        if since is None:
+            return 0
+        source, condition, params = AudienceService.audience_query(campaign)
+        db = get_db()
+        if db.in_transaction:
+            db.commit()
+
+        db.execute("BEGIN IMMEDIATE")
+        try:
+            frozen_at = time.time()
+            # Row timestamps are CURRENT_TIMESTAMP text, whole UTC seconds
+            since_text = db.execute("SELECT datetime(?, 'unixepoch')", (since,)).fetchone()[0]
+            segment_changed = campaign.segment_id and db.execute(
+                "SELECT 1 FROM segments WHERE segment_id = ? AND (updated_at >= ? OR members_built_at >= ?)",
+                (campaign.segment_id, since_text, since)
+            ).fetchone()
+
+            if segment_changed:
+                changed = None
+            else:
+                changed = [row[0] for row in db.execute(
+                    """SELECT phone_number FROM users WHERE updated_at >= ?
+                    UNION SELECT phone_number FROM subscriptions WHERE topic_id = ? AND subscribed_at >= ?
+                    UNION SELECT phone_number FROM subscriptions WHERE topic_id = ? AND unsubscribed_at >= ?""",
+                    (since_text, campaign.topic_id, since_text, campaign.topic_id, since_text)
+                ).fetchall()]
+
+            if changed is None or len(changed) > _FULL_REFRESH_CHANGES:
+                rechecked = AudienceService._refreeze(db, campaign, source, condition, params)
+            else:
+                rechecked = len(changed)
+                for i in range(0, len(changed), 500):
+                    chunk = changed[i:i + 500]
+                    placeholders = ','.join('?' * len(chunk))
+                    db.execute(
+                        f"DELETE FROM campaign_audience WHERE campaign_id = ? AND phone_number IN ({placeholders})",
+                        [campaign.campaign_id] + chunk
+                    )
+                    db.execute(
+                        f"""INSERT INTO campaign_audience (campaign_id, phone_number)
+                        SELECT ?, subscriptions.phone_number FROM {source}
+                        WHERE {condition} AND subscriptions.phone_number IN ({placeholders})""",
+                        [campaign.campaign_id] + params + chunk
+                    )
+            AudienceService._mark_frozen(db, campaign, frozen_at)
+            db.commit()
+        except Exception:
+            db.rollback()
+            raise
+        return rechecked
+
+    @staticmethod
+    def _refreeze(db, campaign, source, condition, params):
+        db.execute("DELETE FROM campaign_audience WHERE campaign_id = ?", (campaign.campaign_id,))
+        return db.execute(
+            f"""INSERT INTO campaign_audience (campaign_id, phone_number)
+            SELECT ?, subscriptions.phone_number FROM {source} WHERE {condition}""",
+            [campaign.campaign_id] + params
+        ).rowcount
+
+    @staticmethod
+    def _mark_frozen(db, campaign, frozen_at):
+        db.execute("UPDATE campaigns SET audience_frozen_at = ? WHERE campaign_id = ?", (frozen_at, campaign.campaign_id))
+        campaign.audience_frozen_at = frozen_at
@@ -1,29 +1,70 @@
+import threading
+import time
+from collections import OrderedDict
 from app.models.campaign import Campaign
+from app.models.dead_letter import DeadLetter
+from app.models.segment import Segment
 from app.models.template import Template
-from app.models.user import User
-from app.models.message import Message
-from app.services.template_service import TemplateService
-from app.services.messaging_service import MessagingService
+from app.services.audience_service import AudienceService
+from app.services.outbox_service import OutboxService
+from app.services.send_engine import SendEngine
 from app.database.connection import get_db
+from app.utils.quiet_hours import get_zone, parse_clock
+from app.utils.schedule import CronExpression, first_run_time
 from flask import current_app
 
+# Failed recipients listed in a status response; the counts cover all of them
+_ERROR_DETAILS_LIMIT = 100
+# Campaign listing pages kept by get_campaigns_with_stats
+_LISTING_CACHE_PAGES = 64
+
 class CampaignService:
+    # Cached listing pages: (database, limit, before) -> (campaigns_version, expires_at, page)
+    _listing_cache = OrderedDict()
+    _listing_lock = threading.Lock()
+    
     @staticmethod
     def create_campaign(name, topic_id, template_id, segment_id, schedule_type='immediate', 
                        schedule_at=None, rate_limit=None, quiet_start=None, 
-                       quiet_end=None, timezone='UTC', created_by=None):
-        '''Create a new campaign - simplified to match schema'''
-        # Convert to schema-compatible format
+                       quiet_end=None, timezone='UTC', created_by=None, schedule_cron=None,
+                       freeze_audience=None):
+        '''
+        Create a new campaign - simplified to match schema. A scheduled
+        campaign's audience is frozen now when freeze_audience is set (default:
+        AUDIENCE_SNAPSHOT_ENABLED) and kept current until it launches.
+        '''
+        timezone = timezone or 'UTC'
+        if not get_zone(timezone):
+            raise ValueError(f"Unknown timezone: {timezone}")
+        
+        # Convert to schema-compatible format; the timezone is the campaign's,
+        # for its schedule and its quiet hours (its own or the default window)
         schedule = {
             'type': schedule_type,
-            'at': schedule_at
+            'at': schedule_at,
+            'timezone': timezone
         }
         
+        next_run_at = None
+        if schedule_type == 'scheduled':
+            if not schedule_at and not schedule_cron:
+                raise ValueError("schedule_at or schedule_cron is required for scheduled campaigns")
+            if schedule_cron:
+                CronExpression(schedule_cron)
+                schedule['cron'] = schedule_cron
+            next_run_at = first_run_time(schedule, time.time())
+        
+        if segment_id and not Segment.get_by_id(segment_id):
+            raise ValueError("Segment not found")
+        
         quiet_hours = {}
         if quiet_start and quiet_end:
+            parse_clock(quiet_start)
+            parse_clock(quiet_end)
             quiet_hours = {
                 'start': quiet_start,
-                'end': quiet_end
+                'end': quiet_end,
+                'timezone': timezone
             }
         
         campaign = Campaign(
@@ -32,17 +73,37 @@ class CampaignService:
             template_id=template_id,
             schedule=schedule,
             rate_limit=rate_limit or 10,
-            quiet_hours=quiet_hours
+            quiet_hours=quiet_hours,
+            status='SCHEDULED' if next_run_at else 'DRAFT',
+            next_run_at=next_run_at,
+            segment_id=segment_id
         )
-        return campaign.save()
+        campaign.save()
+        
+        if freeze_audience is None:
+            freeze_audience = current_app.config.get('AUDIENCE_SNAPSHOT_ENABLED', False)
+        if freeze_audience and campaign.status == 'SCHEDULED':
+            AudienceService.freeze(campaign)
+        return campaign
 
     @staticmethod
     def launch_campaign(campaign_id):
-        '''Launch a campaign'''
+        '''
+        Validate a campaign and start its sends in the background; returns the job.
+        Safe to retry: while the launch is under way the running job is
+        returned, and a RUNNING campaign whose job is gone (its process died)
+        carries on from its launch checkpoint instead of starting over.
+        '''
         campaign = Campaign.get_by_id(campaign_id)
         if not campaign:
             raise ValueError("Campaign not found")
         
+        if campaign.status == 'RUNNING':
+            job = SendEngine.get_job_for_campaign(campaign_id)
+            if job and job.status in ('PENDING', 'RUNNING'):
+                return job
+            return CampaignService._start_sends(campaign)
+        
         if campaign.status not in ('DRAFT', 'SCHEDULED'):
             raise ValueError("Campaign not in a launchable state")
         
@@ -51,147 +112,233 @@ class CampaignService:
         if not template:
             raise ValueError("Template not found")
         
-        # Get all users (or implement segment logic later)
-        recipients = User.get_all()
+        if campaign.audience_frozen_at is not None:
+            # Only what changed since the last refresh; the launch then streams the snapshot
+            AudienceService.refresh(campaign)
         
-        if not recipients:
+        if not AudienceService.has_recipients(campaign):
             raise ValueError("No recipients found")
         
-        sent_count = 0
-        failed_count = 0
-        error_details = []
+        # Update campaign status to RUNNING under a new run; only one concurrent launch wins
+        run_number = Campaign.start_run(campaign_id)
+        if run_number is None:
+            raise ValueError("Campaign not in a launchable state")
+        campaign.status = 'RUNNING'
+        campaign.run_number = run_number
+        campaign.launch_cursor = None
+        if not campaign.schedule.get('cron') and campaign.next_run_at is not None:
+            # A one-off schedule is used up by launching, by hand or by the scheduler
+            Campaign.advance_schedule(campaign_id, campaign.next_run_at, None)
+            campaign.next_run_at = None
         
-        # Update campaign status to RUNNING
+        return CampaignService._start_sends(campaign, template)
+    
+    @staticmethod
+    def pause_campaign(campaign_id):
+        '''
+        Stop a RUNNING campaign from sending. Messages already handed to the
+        provider finish; the rest stay QUEUED and the launch checkpoint is kept.
+        '''
+        if not Campaign.get_by_id(campaign_id):
+            raise ValueError("Campaign not found")
+        if not Campaign.transition(campaign_id, 'RUNNING', 'PAUSED'):
+            raise ValueError("Campaign is not running")
+        return Campaign.get_by_id(campaign_id)
+    
+    @staticmethod
+    def resume_campaign(campaign_id):
+        '''Continue a PAUSED campaign from its checkpoint; returns the new job'''
+        campaign = Campaign.get_by_id(campaign_id)
+        if not campaign:
+            raise ValueError("Campaign not found")
+        
+        job = SendEngine.get_job_for_campaign(campaign_id)
+        if job and job.status in ('PENDING', 'RUNNING'):
+            raise ValueError("Campaign is still finishing its in-flight sends; retry shortly")
+        if not Campaign.transition(campaign_id, 'PAUSED', 'RUNNING'):
+            raise ValueError("Campaign is not paused")
         campaign.status = 'RUNNING'
-        campaign.save()
+        try:
+            return CampaignService._start_sends(campaign)
+        except ValueError:
+            # e.g. the paused driver, in another process, hasn't stopped yet
+            Campaign.transition(campaign_id, 'RUNNING', 'PAUSED')
+            raise
+    
+    @staticmethod
+    def redrive_dead_letters(campaign_id=None, message_ids=None, limit=1000):
+        '''
+        Re-queue dead-lettered messages; returns their ids. A COMPLETED
+        campaign that gets messages back is RUNNING again, and its re-queued
+        messages are sent by a drain-only job started here (its recipients were
+        all queued by the original launch).
+        '''
+        requeued, reopened = DeadLetter.redrive(campaign_id=campaign_id, message_ids=message_ids, limit=limit)
+        for cid in reopened:
+            job = SendEngine.get_job_for_campaign(cid)
+            if job and job.status in ('PENDING', 'RUNNING'):
+                # Still draining after its last send; it picks the rows up
+                continue
+            campaign = Campaign.get_by_id(cid)
+            if campaign and campaign.status == 'RUNNING':
+                CampaignService._start_sends(campaign, queue_recipients=False)
+        return requeued
+    
+    @staticmethod
+    def _start_sends(campaign, template=None, queue_recipients=True):
+        '''
+        Start the background job for the campaign's current run, queueing
+        recipients from past its launch checkpoint (all of them on a fresh run).
+        With queue_recipients False it only sends what is already queued.
+        '''
+        template = template or Template.get_by_id(campaign.template_id)
+        if not template:
+            raise ValueError("Template not found")
         
-        for user in recipients:
-            try:
-                # Render template with user attributes
-                rendered_text = TemplateService.render_template(
-                    template.placeholders,
-                    user.attributes
-                )
-            except Exception as e:
-                rendered_text = f"[Template rendering error: {e}]"
-                error_msg = f"Template error: {e}"
-            
-            # Send message
-            provider_sid = None
-            error_msg = None
-            
+        campaign_id = campaign.campaign_id
+        owner = OutboxService.new_owner_id('launch')
+        rate_limit = campaign.rate_limit or current_app.config.get('DEFAULT_RATE_LIMIT', 1)
+        quiet_hours = OutboxService.quiet_hours_for(campaign)
+        
+        page_size = max(int(current_app.config.get('RECIPIENT_PAGE_SIZE', 1000) or 1), 1)
+        
+        if queue_recipients:
+            # One driver queues a run at a time, across processes; a driver that
+            # died stops renewing its lease and can be taken over after it expires
+            lease_seconds = float(current_app.config.get('OUTBOX_LEASE_SECONDS', 60) or 60)
+            if not Campaign.acquire_launch(campaign_id, owner, lease_seconds):
+                raise ValueError("Campaign is being launched by another process; retry shortly")
+            campaign.launch_cursor = Campaign.get_by_id(campaign_id).launch_cursor
+        
+        def outbox_feed():
+            if not queue_recipients:
+                yield from OutboxService.drain(owner, campaign_id, rate_limit)
+                return
+            # Recipients are walked a keyset page at a time and each page is
+            # queued in one transaction, then one claimed batch is sent, so the
+            # first send follows the first page and memory holds one page.
             try:
-                provider_sid = MessagingService.send_whatsapp_message(
-                    user.phone_number, 
-                    rendered_text
-                )
-                if provider_sid:
-                    sent_count += 1
-                    print(f"Message sent to {user.phone_number}: {provider_sid}")
-                    print(f"Message content: {rendered_text}")
-                else:
-                    failed_count += 1
-                    error_msg = "Twilio returned no message SID"
-                    error_details.append(f"{user.phone_number}: No SID returned")
-                    print(f"Failed to send to {user.phone_number}: No SID returned")
-            except Exception as e:
-                failed_count += 1
-                error_msg = str(e)
-                error_details.append(f"{user.phone_number}: {error_msg}")
-                print(f"Failed to send to {user.phone_number}: {error_msg}")
-            
-            # Create message record
-            message = Message(
-                campaign_id=campaign.campaign_id,
-                phone_number=user.phone_number,
-                template_id=template.template_id,
-                body=rendered_text,
-                provider_message_sid=provider_sid or "failed",
-                state='SENT' if provider_sid else 'FAILED',
-                error_code=error_msg
-            )
-            message.save()
-        
-        # Update campaign status based on results
-        if failed_count == len(recipients):
-            # All messages failed
-            campaign.status = 'FAILED'
-            status_message = "All messages failed to send"
-        elif failed_count > 0:
-            # Some messages failed
-            campaign.status = 'PARTIALLY_COMPLETED'
-            status_message = f"Sent {sent_count}/{len(recipients)} messages"
-        else:
-            # All messages sent successfully
-            campaign.status = 'COMPLETED'
-            status_message = "All messages sent successfully"
+                recipients = AudienceService.iter_recipients(campaign, page_size, after=campaign.launch_cursor)
+                for _ in OutboxService.materialise_pages(campaign, template, recipients, page_size, owner):
+                    if Campaign.get_status(campaign_id) in ('PAUSED', 'CANCELLED', None):
+                        # The checkpoint marks where a resume picks up
+                        return
+                    yield from OutboxService.claim(owner, campaign_id, rate_limit)
+                # Until now outbox workers draining the queue can't complete the campaign
+                Campaign.finish_queueing(campaign_id, campaign.run_number)
+            finally:
+                Campaign.release_launch(campaign_id, owner)
+            yield from OutboxService.drain(owner, campaign_id, rate_limit)
         
-        campaign.save()
+        try:
+            job = SendEngine.start_job(
+                campaign.campaign_id,
+                rate_limit,
+                recipients_factory=outbox_feed,
+                deliver=lambda message: OutboxService.deliver(message, owner, quiet_hours),
+                on_complete=CampaignService._complete_launch
+            )
+        except Exception:
+            if queue_recipients:
+                Campaign.release_launch(campaign_id, owner)
+            raise
+        print(f"Campaign {campaign_id} launched as job {job.job_id}")
+        return job
+    
+    @staticmethod
+    def run_scheduled(campaign_id):
+        '''Start one scheduled run of a campaign (called by the scheduler); returns the job or None'''
+        campaign = Campaign.get_by_id(campaign_id)
+        if not campaign:
+            return None
         
-        print(f"Campaign {campaign_id} completed: {status_message}")
+        if campaign.status == 'CANCELLED':
+            campaign.next_run_at = None
+            campaign.save()
+            return None
+        if campaign.status in ('RUNNING', 'PAUSED'):
+            print(f"Campaign {campaign_id} is still {campaign.status}; skipping this scheduled run")
+            return None
+        if campaign.status == 'COMPLETED' and campaign.schedule.get('cron'):
+            # Each run of a recurring campaign starts from SCHEDULED again
+            campaign.status = 'SCHEDULED'
+            campaign.save()
         
-        return {
-            "queued": len(recipients),
-            "sent": sent_count,
-            "failed": failed_count,
-            "campaign_status": campaign.status,
-            "status_message": status_message,
-            "errors": error_details if error_details else None
-        }
+        return CampaignService.launch_campaign(campaign_id)
+    
+    @staticmethod
+    def _complete_launch(job):
+        '''Mark the campaign finished once the outbox holds nothing pending for it'''
+        # Rows leased by outbox workers may still be in flight; the worker that
+        # acks the last one completes the campaign instead
+        Campaign.complete_if_drained(job.campaign_id)
     
     @staticmethod
     def get_campaign_status(campaign_id):
-        '''Get campaign status with message counts'''
+        '''Get campaign status with message counts (from the campaign_stats counters)'''
         campaign = Campaign.get_by_id(campaign_id)
         if not campaign:
             raise ValueError("Campaign not found")
         
-        db = get_db()
-        total = db.execute(
-            "SELECT COUNT(*) as cnt FROM messages WHERE campaign_id=?", 
-            (campaign_id,)
-        ).fetchone()['cnt']
-        
-        counts = {}
-        for state in ['QUEUED', 'SENDING', 'SENT', 'DELIVERED', 'FAILED', 'UNDLVD']:
-            counts[state] = db.execute(
-                "SELECT COUNT(*) as cnt FROM messages WHERE campaign_id=? AND state=?", 
-                (campaign_id, state)
-            ).fetchone()['cnt']
-        
-        # Get error details for failed messages
-        failed_messages = db.execute(
-            "SELECT phone_number, error_code FROM messages WHERE campaign_id=? AND state='FAILED'",
-            (campaign_id,)
-        ).fetchall()
+        stats = Campaign.get_stats(campaign_id)
+        total = sum(stats.values())
+        counts = {state: stats.get(state, 0) for state in ['QUEUED', 'SENDING', 'SENT', 'DELIVERED', 'FAILED', 'UNDLVD']}
         
+        # Get error details for failed messages, a bounded sample: the
+        # (campaign_id, state, ...) index seeks straight to them
         error_details = []
-        for msg in failed_messages:
-            if msg['error_code']:
-                error_details.append(f"{msg['phone_number']}: {msg['error_code']}")
+        if counts['FAILED']:
+            db = get_db()
+            failed_messages = db.execute(
+                """SELECT phone_number, error_code FROM messages
+                WHERE campaign_id=? AND state='FAILED' AND error_code IS NOT NULL LIMIT ?""",
+                (campaign_id, _ERROR_DETAILS_LIMIT)
+            ).fetchall()
+            error_details = [f"{msg['phone_number']}: {msg['error_code']}" for msg in failed_messages]
+        
+        job = SendEngine.get_job_for_campaign(campaign_id)
         
         return {
             "campaign": campaign.to_dict(),
             "total": total,
             "counts": counts,
-            "error_details": error_details if error_details else None
+            "error_details": error_details if error_details else None,
+            "job": job.to_dict() if job else None
         }
     
     @staticmethod
-    def get_campaigns_with_stats():
-        '''Get all campaigns with message statistics'''
-        campaigns = Campaign.get_all()
-        result = []
+    def get_campaigns_with_stats(limit=50, before=None):
+        '''
+        One page of campaigns, newest first, with message statistics; returns
+        (campaigns, next_before), next_before being None on the last page.
+        The page is one aggregate over the campaign_stats counters, so its
+        cost doesn't grow with campaign history. Pages are cached for
+        CAMPAIGN_LIST_CACHE_SECONDS, and only while no campaign or counter
+        has changed since.
+        '''
+        ttl = float(current_app.config.get('CAMPAIGN_LIST_CACHE_SECONDS', 5) or 0)
+        key = (current_app.config.get('DATABASE_PATH'), limit, before)
+        version = Campaign.listing_version()
+        if ttl > 0:
+            with CampaignService._listing_lock:
+                entry = CampaignService._listing_cache.get(key)
+                if entry and entry[0] == version and entry[1] > time.time():
+                    return entry[2]
         
-        for campaign in campaigns:
-            stats = CampaignService.get_campaign_status(campaign.campaign_id)
+        result = []
+        page = Campaign.get_page_with_stats(limit, before)
+        for campaign, stats in page:
             campaign_data = campaign.to_dict()
-            campaign_data['message_stats'] = {
-                'total': stats['total'],
-                'sent': stats['counts']['SENT'],
-                'failed': stats['counts']['FAILED'],
-                'delivered': stats['counts']['DELIVERED']
-            }
+            campaign_data['message_stats'] = stats
             result.append(campaign_data)
+        next_before = page[-1][0].campaign_id if len(page) == limit else None
         
-        return result
\ No newline at end of file
+        if ttl > 0:
+            with CampaignService._listing_lock:
+                # Stored under the version read before the query, so a write
+                # racing with it only makes the entry look stale sooner
+                CampaignService._listing_cache[key] = (version, time.time() + ttl, (result, next_before))
+                CampaignService._listing_cache.move_to_end(key)
+                while len(CampaignService._listing_cache) > _LISTING_CACHE_PAGES:
+                    CampaignService._listing_cache.popitem(last=False)
+        return result, next_before
@@ -1,58 +1,73 @@
-from twilio.rest import Client
 from flask import current_app
 from app.models.message import Message
 from app.models.user import User
+from app.services.providers import ProviderError, TwilioProvider, get_provider
 from app.utils.phone_utils import normalize_phone
+from app.utils.rate_controller import get_rate_controller
+from app.utils.verified_numbers import get_verified_numbers
 
 class MessagingService:
+    _validated = set()
+    
+    @staticmethod
+    def get_provider():
+        '''Get the process-wide provider transport chosen by MESSAGING_PROVIDER'''
+        return get_provider(current_app.config)
+    
     @staticmethod
     def get_twilio_client():
-        '''Get Twilio client instance with proper error handling. All hard coded values for testing purposes only.'''
+        '''Get the shared Twilio client for the configured credentials (None if not configured)'''
+        sid = current_app.config.get('TWILIO_ACCOUNT_SID')
+        token = current_app.config.get('TWILIO_AUTH_TOKEN')
+        
+        if not sid or not token:
+            print("Twilio credentials missing: Check TWILIO_ACCOUNT_SID and TWILIO_AUTH_TOKEN in config")
+            return None
+        
+        provider = MessagingService.get_provider()
+        if not isinstance(provider, TwilioProvider):
+            provider = TwilioProvider(sid, token, pool_size=current_app.config.get('SEND_CONCURRENCY', 8))
+        return provider.client
+    
+    @staticmethod
+    def validate_twilio_credentials(force=False):
+        '''Check the provider credentials once; cached on success'''
+        provider = MessagingService.get_provider()
+        if isinstance(provider, TwilioProvider) and not (provider.account_sid and provider.auth_token):
+            print("Twilio credentials missing: Check TWILIO_ACCOUNT_SID and TWILIO_AUTH_TOKEN in config")
+            return False
+        
+        if provider in MessagingService._validated and not force:
+            return True
+        
         try:
-            sid = current_app.config.get('TWILIO_ACCOUNT_SID')
-            token = current_app.config.get('TWILIO_AUTH_TOKEN')
-            
-            if not sid or not token:
-                print("Twilio credentials missing: Check TWILIO_ACCOUNT_SID and TWILIO_AUTH_TOKEN in config")
-                return None
-            
-            if sid == "AC3aa3ec3d2826ec3dfc0b487212b9c6d5" and token == "ae253dc977bd86db579aa5cc58fc7b07":
-                print("Using provided test credentials - these may not be valid")
-            
-            # Test if credentials are valid by creating a client
-            client = Client(sid, token)
-            # Try a simple API call to validate credentials
-            client.api.accounts(sid).fetch()
-            print("Twilio client initialized successfully")
-            return client
-            
+            provider.account_info()
         except Exception as e:
-            print(f"Twilio client initialization failed: {str(e)}")
-            return None
+            print(f"Twilio credential validation failed: {str(e)}")
+            return False
+        MessagingService._validated.add(provider)
+        return True
     
     @staticmethod
     def send_whatsapp_message(to_phone, body):
-        '''Send WhatsApp message via Twilio with proper error handling'''
-        client = MessagingService.get_twilio_client()
-        if not client:
-            raise Exception("Twilio client not configured or credentials invalid")
+        '''Send WhatsApp message via the configured provider; raises ProviderError on rejection'''
+        provider = MessagingService.get_provider()
+        if isinstance(provider, TwilioProvider) and not (provider.account_sid and provider.auth_token):
+            raise ProviderError("Twilio client not configured or credentials invalid", retryable=False)
         
         from_phone = current_app.config.get('TWILIO_WHATSAPP_FROM')
         if not from_phone:
-            raise Exception("Twilio WhatsApp from number not configured")
+            raise ProviderError("Twilio WhatsApp from number not configured", retryable=False)
         
         # Check verified numbers for trial accounts
-        verified_numbers = current_app.config.get('VERIFIED_NUMBERS', [])
+        verified_numbers = get_verified_numbers(current_app.config)
         to_phone_clean = to_phone.replace('whatsapp:', '')
         
-        if verified_numbers:
-            # Check if the number is verified
-            is_verified = any(
-                to_phone_clean.endswith(str(num).replace('+', '').replace('whatsapp:', '').strip()) 
-                for num in verified_numbers
+        if verified_numbers and to_phone_clean not in verified_numbers:
+            raise ProviderError(
+                f"Number {to_phone_clean} not in verified numbers list: {verified_numbers.numbers}",
+                retryable=False
             )
-            if not is_verified:
-                raise Exception(f"Number {to_phone_clean} not in verified numbers list: {verified_numbers}")
         
         try:
             # Ensure proper WhatsApp formatting
@@ -65,40 +80,42 @@ class MessagingService:
             print(f"Attempting to send message from {from_phone} to {to_phone}")
             print(f"Message: {body}")
             
-            message = client.messages.create(
-                body=body,
-                from_=from_phone,
-                to=to_phone
+            # Pace this sender number to what the provider currently accepts
+            controller = get_rate_controller(from_phone, current_app.config.get('DEFAULT_RATE_LIMIT', 1))
+            controller.acquire()
+            
+            sid = provider.send(
+                from_phone,
+                to_phone,
+                body,
+                status_callback=current_app.config.get('STATUS_CALLBACK_URL') or None
             )
             
-            print(f"✅ Message sent successfully: {message.sid}")
-            return message.sid
+            controller.on_success()
+            print(f"✅ Message sent successfully: {sid}")
+            return sid
             
-        except Exception as e:
-            error_msg = f"Twilio API error: {str(e)}"
-            print(f"❌ {error_msg}")
-            raise Exception(error_msg)
+        except ProviderError as e:
+            if e.is_throttle:
+                controller.on_throttle(e.retry_after)
+            print(f"❌ {str(e)}")
+            raise
     
     @staticmethod
     def test_twilio_connection():
         '''Test Twilio connection and return detailed status'''
         try:
-            client = MessagingService.get_twilio_client()
-            if not client:
+            provider = MessagingService.get_provider()
+            if isinstance(provider, TwilioProvider) and not (provider.account_sid and provider.auth_token):
                 return {
                     "status": "error",
                     "message": "Twilio client not configured"
                 }
             
-            sid = current_app.config.get('TWILIO_ACCOUNT_SID')
-            account = client.api.accounts(sid).fetch()
-            
             return {
+                **provider.account_info(),
                 "status": "success",
-                "account_sid": account.sid,
-                "friendly_name": account.friendly_name,
-                "status": account.status,
-                "type": account.type,
+                "provider": provider.name,
                 "whatsapp_from": current_app.config.get('TWILIO_WHATSAPP_FROM'),
                 "verified_numbers": current_app.config.get('VERIFIED_NUMBERS', [])
             }
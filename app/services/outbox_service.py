@@ -0,0 +1,240 @@
+import os
+import socket
+import time
+import uuid
+from itertools import islice
+from flask import current_app
+from app.models.campaign import Campaign
+from app.models.message import Message
+from app.services.messaging_service import MessagingService
+from app.services.providers import ProviderError
+from app.services.template_service import RenderCache, TemplateService
+from app.utils.quiet_hours import QuietHours, recipient_timezone
+from app.utils.retry_policy import backoff_delay, is_retryable
+
+
+class OutboxService:
+    '''
+    Durable send queue on top of the messages table.
+
+    Launch materialises one QUEUED row per recipient before anything is sent.
+    Senders (the in-process launch job or separate worker processes) lease
+    batches of rows, send them and ack the result. A sender that dies leaves
+    its rows SENDING until the lease expires and they return to QUEUED, so
+    delivery is at-least-once: a crash between the provider call and the ack
+    can send that one message twice.
+
+    Transient send failures (throttling, 5xx, network errors) go back to
+    QUEUED with next_attempt_at pushed out by exponential backoff. A message
+    that still fails after SEND_MAX_ATTEMPTS is FAILED and copied to
+    messages_dead_letter, from where it can be re-driven.
+
+    Quiet hours work the same way: a message that would land inside the
+    recipient's quiet window is written (or handed back) with next_attempt_at
+    at the end of that window. The (state, next_attempt_at) index keeps the
+    deferred rows ordered by release time, so nothing scans them while they
+    wait and they come out through the normal paced claims once due.
+    '''
+
+    @staticmethod
+    def new_owner_id(prefix='worker'):
+        '''Unique lease owner id for one sender'''
+        return f"{prefix}:{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+
+    @staticmethod
+    def quiet_hours_for(campaign):
+        '''Quiet hours for a campaign, or None'''
+        return QuietHours.for_campaign(campaign, current_app.config)
+
+    @staticmethod
+    def build_message(campaign, template, user, quiet_hours=None, now=None, renderer=None):
+        '''
+        Render one unsaved QUEUED message; template errors give a FAILED one.
+        Inside the recipient's quiet hours the message is due when they end.
+        Pass a RenderCache as renderer to reuse renders across recipients.
+        '''
+        state = 'QUEUED'
+        error_msg = None
+        rendered_text = None
+        try:
+            # Render template with user attributes
+            if renderer:
+                rendered_text = renderer.render(user.attributes)
+            else:
+                rendered_text = TemplateService.render_template(
+                    template.placeholders,
+                    user.attributes,
+                    template.template_id
+                )
+        except Exception as e:
+            state = 'FAILED'
+            error_msg = f"Template error: {e}"
+
+        timezone = recipient_timezone(user.attributes)
+        release_at = None
+        if quiet_hours and state == 'QUEUED':
+            release_at = quiet_hours.release_at(now or time.time(), timezone)
+
+        message = Message(
+            campaign_id=campaign.campaign_id,
+            phone_number=user.phone_number,
+            template_id=template.template_id,
+            body=rendered_text,
+            provider_message_sid=Message.PENDING_SID,
+            state=state,
+            error_code=error_msg,
+            next_attempt_at=release_at or 0,
+            recipient_timezone=timezone,
+            run_number=campaign.run_number
+        )
+        return message
+
+    @staticmethod
+    def materialise_pages(campaign, template, recipients, page_size=1000, owner=None):
+        '''
+        Write a QUEUED row for every recipient, one transaction per page of
+        page_size, and checkpoint the last recipient of each page on the
+        campaign in the same transaction. Recipients already queued in this
+        run are skipped, and `owner` is the launch lease holder (see
+        Message.queue_page). Yields the running count of new rows after each
+        page, so the caller can start sending between pages; only one page of
+        recipients and messages is held at a time.
+        '''
+        quiet_hours = OutboxService.quiet_hours_for(campaign)
+        # Recipients that agree on every attribute the template reads share one render
+        renderer = RenderCache(template)
+        recipients = iter(recipients)
+        count = 0
+        while True:
+            page = list(islice(recipients, page_size))
+            if not page:
+                break
+            count += Message.queue_page(
+                [OutboxService.build_message(campaign, template, user, quiet_hours, renderer=renderer)
+                 for user in page],
+                campaign.campaign_id,
+                page[-1].phone_number,
+                owner
+            )
+            yield count
+        print(f"Campaign {campaign.campaign_id}: {count} messages queued, "
+              f"{renderer.misses} distinct renders over {renderer.variables}")
+
+    @staticmethod
+    def claim_size(rate_limit):
+        '''
+        Batch size for one claim. A paced sender must get through its batch
+        well inside the lease, or the rows would be handed to someone else.
+        '''
+        batch_size = int(current_app.config.get('OUTBOX_BATCH_SIZE', 100) or 1)
+        lease_seconds = float(current_app.config.get('OUTBOX_LEASE_SECONDS', 60) or 60)
+        if rate_limit:
+            batch_size = min(batch_size, int(float(rate_limit) * lease_seconds / 2))
+        return max(batch_size, 1)
+
+    @staticmethod
+    def claim(owner, campaign_id, rate_limit=None):
+        '''Lease one batch of the campaign's due messages (possibly empty)'''
+        lease_seconds = float(current_app.config.get('OUTBOX_LEASE_SECONDS', 60) or 60)
+        return Message.claim_batch(owner, OutboxService.claim_size(rate_limit), lease_seconds, campaign_id=campaign_id)
+
+    @staticmethod
+    def drain(owner, campaign_id, rate_limit=None, max_wait=1.0):
+        '''
+        Yield leased messages batch by batch until the campaign has nothing
+        QUEUED or SENDING left. When nothing is due it sleeps until the next
+        retry or quiet-hours release. While messages are still in flight the
+        sleep is capped at max_wait, since one of them may come back as a retry
+        that is due sooner.
+        '''
+        lease_seconds = float(current_app.config.get('OUTBOX_LEASE_SECONDS', 60) or 60)
+        limit = OutboxService.claim_size(rate_limit)
+        last_release = time.time()
+        while True:
+            batch = Message.claim_batch(owner, limit, lease_seconds, campaign_id=campaign_id)
+            if batch:
+                for message in batch:
+                    yield message
+                continue
+
+            pending = Message.pending_summary(campaign_id)
+            if not pending['queued'] and not pending['sending']:
+                return
+            if Campaign.get_status(campaign_id) != 'RUNNING':
+                # Paused (or cancelled): what is left stays QUEUED for a resume
+                return
+            now = time.time()
+            if now - last_release >= lease_seconds:
+                # Rows stuck SENDING under a dead worker's lease would otherwise keep us waiting
+                Message.release_expired_leases(now)
+                last_release = now
+
+            wait = lease_seconds
+            if pending['next_due_at'] is not None:
+                wait = min(wait, max(pending['next_due_at'] - now, 0.05))
+            if pending['sending']:
+                wait = min(wait, max_wait)
+            time.sleep(wait)
+
+    @staticmethod
+    def deliver(message, owner, quiet_hours=None):
+        '''
+        Send one leased message and record the result. Returns (ok, error)
+        where ok is None when the message went back to the queue (a retry, or
+        the recipient's quiet hours started after it was queued).
+        '''
+        if quiet_hours:
+            release_at = quiet_hours.release_at(time.time(), message.recipient_timezone)
+            if release_at:
+                if not Message.defer(message.message_id, owner, release_at):
+                    print(f"Lease lost for message {message.message_id}; deferral not recorded")
+                return None, None
+
+        provider_sid = None
+        error_msg = None
+        try:
+            provider_sid = MessagingService.send_whatsapp_message(message.phone_number, message.body)
+            if not provider_sid:
+                error_msg = "Twilio returned no message SID"
+        except ProviderError as e:
+            if is_retryable(e):
+                return OutboxService._retry_or_dead_letter(message, owner, e)
+            error_msg = str(e)
+        except Exception as e:
+            error_msg = str(e)
+
+        acked = Message.ack(
+            message.message_id,
+            owner,
+            'SENT' if provider_sid else 'FAILED',
+            provider_message_sid=provider_sid,
+            error_code=error_msg
+        )
+        if not acked:
+            print(f"Lease lost for message {message.message_id}; result not recorded")
+
+        if provider_sid:
+            return True, None
+        return False, f"{message.phone_number}: {error_msg}"
+
+    @staticmethod
+    def _retry_or_dead_letter(message, owner, error):
+        '''Reschedule a transient failure with backoff, or dead-letter it once out of attempts'''
+        config = current_app.config
+        attempt = (message.attempts or 0) + 1
+        error_msg = str(error)
+
+        if attempt >= int(config.get('SEND_MAX_ATTEMPTS', 5) or 1):
+            if not Message.dead_letter(message.message_id, owner, error_msg):
+                print(f"Lease lost for message {message.message_id}; result not recorded")
+            return False, f"{message.phone_number}: {error_msg} (gave up after {attempt} attempts)"
+
+        delay = backoff_delay(
+            attempt,
+            float(config.get('RETRY_BASE_DELAY', 2) or 0),
+            float(config.get('RETRY_MAX_DELAY', 600) or 0),
+            retry_after=error.retry_after
+        )
+        if not Message.reschedule(message.message_id, owner, time.time() + delay, error_msg):
+            print(f"Lease lost for message {message.message_id}; retry not scheduled")
+        return None, None
@@ -0,0 +1,294 @@
+import heapq
+import math
+import random
+import threading
+import time
+import uuid
+import requests
+from requests.adapters import HTTPAdapter
+from twilio.base.exceptions import TwilioRestException
+from twilio.http.http_client import TwilioHttpClient
+from twilio.request_validator import RequestValidator
+from twilio.rest import Client
+from app.utils.rate_limiter import TokenBucket
+
+
+class ProviderError(Exception):
+    '''
+    A send the provider rejected.
+
+    status is the HTTP status, code the provider error code, retry_after the
+    provider's back-off hint in seconds (if any). retryable overrides the
+    status/code based classification in app.utils.retry_policy.
+    '''
+
+    def __init__(self, message, status=None, code=None, retry_after=None, retryable=None):
+        super().__init__(message)
+        self.status = status
+        self.code = code
+        self.retry_after = retry_after
+        self.retryable = retryable
+
+    @property
+    def is_throttle(self):
+        return self.status == 429 or str(self.code) in ('20429', '63018')
+
+
+class MessagingProvider:
+    '''Transport that hands one WhatsApp message to a messaging provider'''
+    name = None
+
+    def send(self, from_, to, body, status_callback=None):
+        '''Send a message and return the provider message SID; raise ProviderError on rejection'''
+        raise NotImplementedError
+
+    def account_info(self):
+        '''Return a dict describing the provider account (raises on bad credentials)'''
+        raise NotImplementedError
+
+
+class TwilioProvider(MessagingProvider):
+    name = 'twilio'
+
+    # One Twilio client per credential pair for the whole process. Twilio clients
+    # are safe to share between threads; reusing one keeps its HTTP connections
+    # alive instead of paying a TCP/TLS handshake per message.
+    _clients = {}
+    _clients_lock = threading.Lock()
+    # Retry-After of the last response seen on this thread; Twilio's exceptions drop headers
+    _last_response = threading.local()
+
+    def __init__(self, account_sid, auth_token, pool_size=8):
+        self.account_sid = account_sid
+        self.auth_token = auth_token
+        self.pool_size = max(int(pool_size or 1), 1)
+
+    @property
+    def client(self):
+        key = (self.account_sid, self.auth_token)
+        client = TwilioProvider._clients.get(key)
+        if client is not None:
+            return client
+
+        with TwilioProvider._clients_lock:
+            client = TwilioProvider._clients.get(key)
+            if client is None:
+                client = Client(self.account_sid, self.auth_token, http_client=self._build_http_client())
+                TwilioProvider._clients[key] = client
+                print("Twilio client initialized successfully")
+        return client
+
+    def _build_http_client(self):
+        '''Keep-alive HTTP client whose connection pool matches the send concurrency'''
+        http_client = TwilioHttpClient(
+            pool_connections=True,
+            request_hooks={'response': [TwilioProvider._remember_retry_after]}
+        )
+        # pool_block makes extra threads wait for a free connection rather than
+        # opening (and then discarding) connections beyond the pool
+        http_client.session.mount(
+            "https://", HTTPAdapter(pool_connections=1, pool_maxsize=self.pool_size, pool_block=True)
+        )
+        return http_client
+
+    @staticmethod
+    def _remember_retry_after(response, *args, **kwargs):
+        TwilioProvider._last_response.retry_after = response.headers.get('Retry-After')
+        return response
+
+    @staticmethod
+    def _parse_retry_after(value):
+        try:
+            return max(float(value), 0.0)
+        except (TypeError, ValueError):
+            # HTTP-date form is not used by Twilio; ignore anything else
+            return None
+
+    def send(self, from_, to, body, status_callback=None):
+        kwargs = {'body': body, 'from_': from_, 'to': to}
+        if status_callback:
+            kwargs['status_callback'] = status_callback
+        TwilioProvider._last_response.retry_after = None
+        try:
+            return self.client.messages.create(**kwargs).sid
+        except TwilioRestException as e:
+            raise ProviderError(
+                f"Twilio API error: {str(e)}",
+                status=e.status,
+                code=e.code,
+                retry_after=self._parse_retry_after(TwilioProvider._last_response.retry_after)
+            )
+        except Exception as e:
+            raise ProviderError(f"Twilio API error: {str(e)}")
+
+    def account_info(self):
+        account = self.client.api.accounts(self.account_sid).fetch()
+        return {
+            "account_sid": account.sid,
+            "friendly_name": account.friendly_name,
+            "status": account.status,
+            "type": account.type
+        }
+
+
+class FakeProvider(MessagingProvider):
+    '''
+    In-process stand-in for Twilio for load and latency testing.
+
+    Each send sleeps for a latency drawn from the configured distribution,
+    then fails with ERROR_RATE, is throttled (HTTP 429 / code 20429) with
+    THROTTLE_RATE or whenever sends exceed MAX_RATE per second, and otherwise
+    returns a Twilio-shaped SID. Accepted messages get 'sent' and 'delivered'
+    status callbacks POSTed to STATUS_CALLBACK_URL, signed like Twilio's.
+    '''
+    name = 'fake'
+
+    DEFAULTS = {
+        'LATENCY_DISTRIBUTION': 'lognormal',  # fixed | uniform | normal | lognormal
+        'LATENCY_MS_MEAN': 150,
+        'LATENCY_MS_STDDEV': 50,
+        'ERROR_RATE': 0.0,
+        'THROTTLE_RATE': 0.0,
+        'THROTTLE_RETRY_AFTER': 1,
+        'MAX_RATE': 0,                        # sends/second before 429s; 0 = unlimited
+        'STATUS_CALLBACK_URL': 'http://127.0.0.1:5000/api/v1/webhooks/twilio/status',
+        'CALLBACK_DELAY_MS': 500,
+        'SEED': None
+    }
+
+    def __init__(self, settings=None, auth_token=None):
+        self.settings = dict(self.DEFAULTS)
+        self.settings.update({k.upper(): v for k, v in (settings or {}).items()})
+        self._random = random.Random(self.settings['SEED'])
+        self._random_lock = threading.Lock()
+        max_rate = float(self.settings['MAX_RATE'] or 0)
+        self._capacity = TokenBucket(max_rate) if max_rate > 0 else None
+        self._callbacks = _CallbackDispatcher(auth_token) if self.settings['STATUS_CALLBACK_URL'] else None
+
+    def _latency_seconds(self):
+        mean = float(self.settings['LATENCY_MS_MEAN']) / 1000.0
+        stddev = float(self.settings['LATENCY_MS_STDDEV']) / 1000.0
+        distribution = self.settings['LATENCY_DISTRIBUTION']
+        with self._random_lock:
+            if distribution == 'fixed' or mean <= 0:
+                value = mean
+            elif distribution == 'uniform':
+                value = self._random.uniform(max(mean - stddev, 0), mean + stddev)
+            elif distribution == 'normal':
+                value = self._random.gauss(mean, stddev)
+            else:
+                # lognormal parameterised by the mean/stddev of the latency itself
+                sigma2 = math.log(1 + (stddev / mean) ** 2)
+                value = self._random.lognormvariate(math.log(mean) - sigma2 / 2, math.sqrt(sigma2))
+        return max(value, 0.0)
+
+    def _roll(self, rate):
+        with self._random_lock:
+            return self._random.random() < float(rate or 0)
+
+    def send(self, from_, to, body, status_callback=None):
+        time.sleep(self._latency_seconds())
+
+        if self._roll(self.settings['THROTTLE_RATE']) or (
+                self._capacity and self._capacity.try_acquire() > 0):
+            raise ProviderError(
+                "Twilio API error: HTTP 429 error: Too Many Requests",
+                status=429, code=20429, retry_after=self.settings['THROTTLE_RETRY_AFTER']
+            )
+        if self._roll(self.settings['ERROR_RATE']):
+            raise ProviderError(
+                "Twilio API error: HTTP 400 error: Invalid 'To' Phone Number",
+                status=400, code=21211
+            )
+
+        sid = "SM" + uuid.uuid4().hex
+        if self._callbacks:
+            url = status_callback or self.settings['STATUS_CALLBACK_URL']
+            delay = float(self.settings['CALLBACK_DELAY_MS']) / 1000.0
+            base = {'MessageSid': sid, 'SmsSid': sid, 'From': from_, 'To': to}
+            self._callbacks.schedule(delay, url, dict(base, MessageStatus='sent'))
+            self._callbacks.schedule(delay * 2, url, dict(base, MessageStatus='delivered'))
+        return sid
+
+    def account_info(self):
+        return {
+            "account_sid": "AC" + "0" * 32,
+            "friendly_name": "Fake provider",
+            "status": "active",
+            "type": "Fake"
+        }
+
+
+class _CallbackDispatcher:
+    '''Posts status callbacks when they fall due, from one thread and a heap'''
+
+    def __init__(self, auth_token=None):
+        self._heap = []
+        self._seq = 0
+        self._cond = threading.Condition()
+        self._session = requests.Session()
+        self._validator = RequestValidator(auth_token) if auth_token else None
+        self._thread = threading.Thread(target=self._run, name="fake-provider-callbacks", daemon=True)
+        self._thread.start()
+
+    def schedule(self, delay, url, payload):
+        with self._cond:
+            self._seq += 1
+            heapq.heappush(self._heap, (time.monotonic() + delay, self._seq, url, payload))
+            self._cond.notify()
+
+    def _run(self):
+        while True:
+            with self._cond:
+                while not self._heap:
+                    self._cond.wait()
+                due, _, url, payload = self._heap[0]
+                wait = due - time.monotonic()
+                if wait > 0:
+                    self._cond.wait(wait)
+                    continue
+                heapq.heappop(self._heap)
+            self._post(url, payload)
+
+    def _post(self, url, payload):
+        headers = {}
+        if self._validator:
+            headers['X-Twilio-Signature'] = self._validator.compute_signature(url, payload)
+        try:
+            self._session.post(url, data=payload, headers=headers, timeout=5)
+        except Exception as e:
+            print(f"Fake provider status callback to {url} failed: {e}")
+
+
+_providers = {}
+_providers_lock = threading.Lock()
+
+
+def get_provider(config):
+    '''Return the process-wide provider selected by MESSAGING_PROVIDER in `config`'''
+    name = str(config.get('MESSAGING_PROVIDER') or 'twilio').lower()
+    if name == 'fake':
+        settings = config.get('FAKE_PROVIDER') or {}
+        key = (name, tuple(sorted((str(k), str(v)) for k, v in settings.items())))
+    elif name == 'twilio':
+        key = (name, config.get('TWILIO_ACCOUNT_SID'), config.get('TWILIO_AUTH_TOKEN'))
+    else:
+        raise ValueError(f"Unknown MESSAGING_PROVIDER: {name}")
+
+    provider = _providers.get(key)
+    if provider is not None:
+        return provider
+
+    with _providers_lock:
+        provider = _providers.get(key)
+        if provider is None:
+            if name == 'fake':
+                provider = FakeProvider(config.get('FAKE_PROVIDER'), config.get('TWILIO_AUTH_TOKEN'))
+            else:
+                provider = TwilioProvider(
+                    config.get('TWILIO_ACCOUNT_SID'),
+                    config.get('TWILIO_AUTH_TOKEN'),
+                    pool_size=config.get('SEND_CONCURRENCY', 8)
+                )
+            _providers[key] = provider
+    return provider
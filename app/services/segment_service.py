@@ -1,48 +1,144 @@
+import json
+import math
+import random
+from itertools import islice
+from flask import current_app
 from app.models.segment import Segment
 from app.models.user import User
+from app.utils.attribute_index import get_attribute_index
+from app.utils.segment_filters import compile_segment
+
+
+def _wilson_interval(successes, trials, z=1.96):
+    """Confidence interval (default 95%) for a proportion; stays inside [0, 1] even for 0 or all successes"""
+    p = successes / trials
+    denominator = 1 + z * z / trials
+    centre = (p + z * z / (2 * trials)) / denominator
+    margin = z * math.sqrt(p * (1 - p) / trials + z * z / (4 * trials * trials)) / denominator
+    return max(centre - margin, 0.0), min(centre + margin, 1.0)
+
 
 class SegmentService:
     @staticmethod
     def create_segment(name, definition):
         '''Create a new segment'''
+        # Reject definitions that can't be evaluated before storing them
+        compile_segment(definition)
         segment = Segment(segment=name, definition=definition)  # Changed parameter name
         return segment.save()
 
     @staticmethod
-    def evaluate_segment_members(segment_id):
-        '''Evaluate and return segment members'''
+    def update_segment(segment_id, name=None, definition=None, is_active=None):
+        '''Update a segment; its members are rebuilt only if the definition changes'''
+        segment = SegmentService.get_segment(segment_id)
+        if definition is not None:
+            compile_segment(definition)
+            segment.definition = definition
+        if name:
+            segment.segment = name
+        if is_active is not None:
+            segment.is_active = bool(is_active)
+        return segment.save()
+
+    @staticmethod
+    def get_segment(segment_id):
         segment = Segment.get_by_id(segment_id)
         if not segment:
             raise ValueError("Segment not found")
-        
-        definition = segment.definition
-        filters = definition.get('filters', [])
-        all_users = User.get_all()
-        matched_users = []
-        
-        for user in all_users:
-            if SegmentService._user_matches_filters(user, filters):
-                matched_users.append(user)
-        
-        return matched_users
-    
-    @staticmethod
-    def _user_matches_filters(user, filters):
-        '''Check if user matches all segment filters'''
-        for filter_obj in filters:
-            path = filter_obj.get('path', '')
-            if not path.startswith('attributes.'):
-                return False
-            
-            key = path.split('.', 1)[1]
-            op = filter_obj.get('op', 'eq')
-            value = filter_obj.get('value')
-            
-            if op == 'eq':
-                if user.attributes.get(key) != value:
-                    return False
-            else:
-                # Add more operators as needed
-                return False
-        
-        return True
\ No newline at end of file
+        return segment
+
+    @staticmethod
+    def iter_segment_members(segment_id, limit=None):
+        '''
+        Stream segment members, in phone_number order, from the materialised
+        segment_members table (built on first use if needed). Inactive
+        segments aren't maintained, so they are evaluated directly. An
+        invalid definition raises ValueError here; the query runs once iterated.
+        '''
+        segment = SegmentService.get_segment(segment_id)
+        if segment.is_active:
+            Segment.ensure_members(segment)
+            members = User.iter_segment(segment_id)
+        else:
+            where, params = compile_segment(segment.definition)
+            members = User.iter_where(where, params)
+        return islice(members, limit) if limit else members
+
+    @staticmethod
+    def evaluate_segment_members(segment_id):
+        '''Evaluate and return segment members'''
+        return list(SegmentService.iter_segment_members(segment_id))
+
+    @staticmethod
+    def count_segment_members(segment_id):
+        '''Number of users in a segment'''
+        segment = SegmentService.get_segment(segment_id)
+        if not segment.is_active:
+            where, params = compile_segment(segment.definition)
+            return User.count_where(where, params)
+        Segment.ensure_members(segment)
+        return Segment.member_count(segment_id)
+
+    @staticmethod
+    def preview_count(definition):
+        '''
+        Members of an unsaved definition, as (count, source). Answered from
+        the in-memory attribute index when it is enabled, built and covers
+        every filter ("bitmap"), otherwise by a SQL count ("sql").
+        '''
+        index = get_attribute_index()
+        if index:
+            count = index.count(definition)
+            if count is not None:
+                return count, 'bitmap'
+        where, params = compile_segment(definition)
+        return User.count_where(where, params), 'sql'
+
+    @staticmethod
+    def estimate_segment_size(segment_id, sample_size=None, with_members=False):
+        '''
+        Approximate segment size for planning, in milliseconds however large
+        the users table. A uniform random sample of the users.rowid range is
+        evaluated with the compiled definition and scaled to the whole range,
+        with a 95% confidence interval (rowids left by deleted users count as
+        non-members). The count is exact instead when the attribute index
+        covers the definition ("bitmap") or the table is no bigger than the
+        sample ("exact").
+
+        Returns (estimate, members); with with_members, members are the
+        sampled users in the segment (a random sample of it, in
+        phone_number order), otherwise None.
+        '''
+        segment = SegmentService.get_segment(segment_id)
+        where, params = compile_segment(segment.definition)
+        sample_size = max(int(sample_size or current_app.config.get('SEGMENT_ESTIMATE_SAMPLE_SIZE', 10000)), 1)
+
+        low, high = User.rowid_range()
+        span = high - low + 1 if low is not None else 0
+        if span <= sample_size:
+            members = list(User.iter_where(where, params)) if with_members else None
+            count = len(members) if with_members else User.count_where(where, params)
+            return {"count": count, "low": count, "high": count, "confidence": 1.0, "method": "exact"}, members
+
+        members = None
+        condition = f"users.rowid IN (SELECT value FROM json_each(?)) AND {where}"
+        condition_params = [json.dumps(random.sample(range(low, high + 1), sample_size))] + params
+        if with_members:
+            members = list(User.iter_where(condition, condition_params))
+
+        index = get_attribute_index()
+        count = index.count(segment.definition) if index else None
+        if count is not None:
+            return {"count": count, "low": count, "high": count, "confidence": 1.0, "method": "bitmap"}, members
+
+        matched = len(members) if with_members else User.count_where(condition, condition_params)
+        p_low, p_high = _wilson_interval(matched, sample_size)
+        return {
+            "count": round(matched / sample_size * span),
+            "low": math.floor(p_low * span),
+            "high": math.ceil(p_high * span),
+            "confidence": 0.95,
+            "method": "sample",
+            "sample_size": sample_size,
+            "sample_matches": matched
+        }, members
@@ -0,0 +1,207 @@
+import queue
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from datetime import datetime
+from flask import current_app
+from app.utils.rate_limiter import TokenBucket
+
+_STOP = object()
+# Finished jobs kept for get_job, least recently used first out; each
+# campaign's latest job is kept regardless, for get_job_for_campaign
+_FINISHED_JOBS_KEPT = 500
+
+
+class LaunchJob:
+    '''In-memory progress record for one background campaign send'''
+
+    def __init__(self, campaign_id, rate_limit, concurrency):
+        self.job_id = uuid.uuid4().hex
+        self.campaign_id = campaign_id
+        self.rate_limit = rate_limit
+        self.concurrency = concurrency
+        self.status = 'PENDING'
+        self.total = 0
+        self.sent = 0
+        self.failed = 0
+        self.requeued = 0
+        self.errors = []
+        self.error = None
+        self.started_at = None
+        self.finished_at = None
+        self._lock = threading.Lock()
+
+    def add_total(self):
+        '''Count a recipient handed to the workers (they may be taking one back meanwhile)'''
+        with self._lock:
+            self.total += 1
+
+    def record(self, ok, error=None):
+        '''
+        ok is True/False for a final result, None for a recipient handed back
+        to come round again later (it is counted in total again then)
+        '''
+        with self._lock:
+            if ok is None:
+                self.requeued += 1
+                self.total -= 1
+            elif ok:
+                self.sent += 1
+            else:
+                self.failed += 1
+                # Keep only a sample of errors so a bad run can't grow memory unbounded
+                if error and len(self.errors) < 100:
+                    self.errors.append(error)
+
+    def to_dict(self):
+        elapsed = None
+        if self.started_at:
+            elapsed = (self.finished_at or time.time()) - self.started_at
+        processed = self.sent + self.failed
+        return {
+            'job_id': self.job_id,
+            'campaign_id': self.campaign_id,
+            'status': self.status,
+            'total': self.total,
+            'processed': processed,
+            'sent': self.sent,
+            'failed': self.failed,
+            'requeued': self.requeued,
+            'rate_limit': self.rate_limit,
+            'concurrency': self.concurrency,
+            'throughput_per_sec': round(processed / elapsed, 2) if elapsed else 0,
+            'started_at': datetime.utcfromtimestamp(self.started_at).isoformat() if self.started_at else None,
+            'finished_at': datetime.utcfromtimestamp(self.finished_at).isoformat() if self.finished_at else None,
+            'error': self.error,
+            'errors': self.errors or None
+        }
+
+
+class SendEngine:
+    '''
+    Runs campaign sends in the background.
+
+    Each job gets one driver thread that walks the recipients and paces them
+    through a token bucket, plus a bounded pool of worker threads that do the
+    actual provider calls. Every thread runs inside its own app context so it
+    gets its own SQLite connection.
+    '''
+    _jobs = OrderedDict()
+    _jobs_by_campaign = {}
+    _lock = threading.Lock()
+
+    @staticmethod
+    def start_job(campaign_id, rate_limit, recipients_factory, deliver, on_complete=None):
+        '''
+        Start a background send and return its LaunchJob.
+
+        recipients_factory() -> iterable of recipients (called on the driver thread)
+        deliver(recipient) -> (ok, error) (called on a worker thread)
+        on_complete(job) is called on the driver thread once all sends finish.
+        '''
+        app = current_app._get_current_object()
+        concurrency = max(int(app.config.get('SEND_CONCURRENCY', 8) or 1), 1)
+        rate_limit = rate_limit or app.config.get('DEFAULT_RATE_LIMIT', 1)
+
+        with SendEngine._lock:
+            running = SendEngine._jobs_by_campaign.get(campaign_id)
+            if running and running.status in ('PENDING', 'RUNNING'):
+                raise ValueError("Campaign already has a running send job")
+            job = LaunchJob(campaign_id, rate_limit, concurrency)
+            SendEngine._jobs[job.job_id] = job
+            SendEngine._jobs_by_campaign[campaign_id] = job
+            SendEngine._prune()
+
+        driver = threading.Thread(
+            target=SendEngine._run_job,
+            args=(app, job, recipients_factory, deliver, on_complete),
+            name=f"campaign-{campaign_id}-driver",
+            daemon=True
+        )
+        driver.start()
+        return job
+
+    @staticmethod
+    def get_job(job_id):
+        with SendEngine._lock:
+            job = SendEngine._jobs.get(job_id)
+            if job:
+                SendEngine._jobs.move_to_end(job_id)
+            return job
+
+    @staticmethod
+    def _prune():
+        '''Forget finished jobs beyond _FINISHED_JOBS_KEPT (called holding _lock)'''
+        excess = len(SendEngine._jobs) - _FINISHED_JOBS_KEPT
+        if excess <= 0:
+            return
+        for job_id, job in list(SendEngine._jobs.items()):
+            if excess <= 0:
+                break
+            if job.status in ('PENDING', 'RUNNING') or SendEngine._jobs_by_campaign.get(job.campaign_id) is job:
+                continue
+            del SendEngine._jobs[job_id]
+            excess -= 1
+
+    @staticmethod
+    def get_job_for_campaign(campaign_id):
+        return SendEngine._jobs_by_campaign.get(campaign_id)
+
+    @staticmethod
+    def _run_job(app, job, recipients_factory, deliver, on_complete):
+        job.status = 'RUNNING'
+        job.started_at = time.time()
+        bucket = TokenBucket(job.rate_limit)
+        # Bounded hand-off queue: the driver never gets more than a few batches ahead
+        work = queue.Queue(maxsize=job.concurrency * 2)
+        workers = [
+            threading.Thread(
+                target=SendEngine._worker_loop,
+                args=(app, job, work, deliver),
+                name=f"campaign-{job.campaign_id}-worker-{i}",
+                daemon=True
+            )
+            for i in range(job.concurrency)
+        ]
+        for worker in workers:
+            worker.start()
+
+        with app.app_context():
+            try:
+                for recipient in recipients_factory():
+                    job.add_total()
+                    bucket.acquire()
+                    work.put(recipient)
+            except Exception as e:
+                job.error = str(e)
+                print(f"Send job {job.job_id} aborted: {e}")
+            finally:
+                for _ in workers:
+                    work.put(_STOP)
+                for worker in workers:
+                    worker.join()
+
+            job.status = 'FAILED' if job.error else 'COMPLETED'
+            job.finished_at = time.time()
+            if on_complete:
+                try:
+                    on_complete(job)
+                except Exception as e:
+                    print(f"Send job {job.job_id} completion hook failed: {e}")
+
+        print(f"Send job {job.job_id} for campaign {job.campaign_id} finished: "
+              f"{job.sent} sent, {job.failed} failed")
+
+    @staticmethod
+    def _worker_loop(app, job, work, deliver):
+        with app.app_context():
+            while True:
+                recipient = work.get()
+                if recipient is _STOP:
+                    return
+                try:
+                    ok, error = deliver(recipient)
+                except Exception as e:
+                    ok, error = False, str(e)
+                job.record(ok, error)
@@ -1,8 +1,79 @@
-from jinja2 import Environment, StrictUndefined
+import json
+from collections import OrderedDict
 from app.models.template import Template
+from app.utils.template_utils import get_compiled_template, template_variables
+
+
+class RenderCache:
+    '''
+    Renders one template for many recipients, once per distinct combination
+    of the attributes the template actually reads.
+
+    Recipients are grouped by the projection of their attributes onto the
+    template's variables (jinja2.meta.find_undeclared_variables), so a
+    "Hi {{ first_name }}" campaign renders once per distinct first name.
+    Rendering errors are cached too. The cache is bounded, and if the first
+    `probe` recipients share almost no renders it stops keying and renders
+    directly. Templates that use per-render randomness would be deduplicated.
+    '''
+
+    _SCALARS = (str, int, float, bool, type(None))
+
+    def __init__(self, template, maxsize=10000, probe=1000):
+        self.body = TemplateService.template_body(template.placeholders)
+        self.template_id = template.template_id
+        self.variables = tuple(sorted(template_variables(self.body)))
+        self.maxsize = maxsize
+        self.probe = probe
+        self.enabled = True
+        self._rendered = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def _value_key(self, value):
+        # Type is part of the key: 1, 1.0 and True hash alike but render differently
+        if isinstance(value, self._SCALARS):
+            return (value.__class__, value)
+        return (value.__class__, json.dumps(value, sort_keys=True, default=str))
+
+    def _render(self, attributes):
+        return TemplateService.render_template(self.body, attributes, self.template_id)
+
+    def render(self, attributes):
+        attributes = attributes or {}
+        if not self.enabled:
+            self.misses += 1
+            return self._render(attributes)
+
+        key = tuple(
+            self._value_key(attributes[name]) if name in attributes else None
+            for name in self.variables
+        )
+        cached = self._rendered.get(key)
+        if cached is not None:
+            self._rendered.move_to_end(key)
+            self.hits += 1
+        else:
+            self.misses += 1
+            try:
+                cached = (self._render(attributes), None)
+            except Exception as e:
+                cached = (None, e)
+            self._rendered[key] = cached
+            if len(self._rendered) > self.maxsize:
+                self._rendered.popitem(last=False)
+            if self.misses == self.probe and self.hits < self.probe // 10:
+                # Nearly every recipient is unique; keying would only add overhead
+                self.enabled = False
+                self._rendered.clear()
+
+        rendered, error = cached
+        if error is not None:
+            raise error
+        return rendered
+
 
 class TemplateService:
-    _env = Environment(undefined=StrictUndefined)
     
     @staticmethod
     def create_template(name, body, placeholders, channel='whatsapp', locale='en'):
@@ -21,16 +92,19 @@ class TemplateService:
         return template.save()
     
     @staticmethod
-    def render_template(template_placeholders, user_attributes):
-        '''Render template with placeholders'''
+    def template_body(template_placeholders):
+        '''The Jinja source stored in a template's placeholders'''
+        # If placeholders is a list, use the first item as template body
+        if isinstance(template_placeholders, list) and template_placeholders:
+            return template_placeholders[0]
+        return str(template_placeholders)
+    
+    @staticmethod
+    def render_template(template_placeholders, user_attributes, template_id=None):
+        '''Render template with placeholders (compiled once, via the shared template cache)'''
         try:
-            # If placeholders is a list, use the first item as template body
-            if isinstance(template_placeholders, list) and template_placeholders:
-                template_body = template_placeholders[0]
-            else:
-                template_body = str(template_placeholders)
-                
-            template = TemplateService._env.from_string(template_body)
+            template_body = TemplateService.template_body(template_placeholders)
+            template = get_compiled_template(template_body, template_id)
             return template.render(**user_attributes)
         except Exception as e:
             raise Exception(f"Template rendering error: {str(e)}")
@@ -43,7 +117,9 @@ class TemplateService:
             raise ValueError("Template not found")
         
         try:
-            rendered = TemplateService.render_template(template.placeholders, placeholders)
+            rendered = TemplateService.render_template(
+                template.placeholders, placeholders, template.template_id
+            )
             return rendered
         except Exception as e:
             raise ValueError(f"Template preview error: {str(e)}")
\ No newline at end of file
@@ -0,0 +1,188 @@
+import csv
+import io
+import json
+import os
+import socket
+import threading
+import uuid
+from itertools import islice
+from flask import current_app
+from app.models.import_job import ImportJob
+from app.models.user import User
+from app.utils.phone_utils import normalize_and_validate_many
+
+
+class UserImportService:
+    # Caps concurrent background imports so they can't crowd out API requests
+    _slots = None
+    _slots_lock = threading.Lock()
+
+    @staticmethod
+    def read_csv(stream):
+        '''Yield (row_number, phone, attributes, consent) from a binary CSV stream, one row at a time'''
+        reader = csv.DictReader(io.TextIOWrapper(stream, encoding='utf-8-sig', newline=''))
+        for row in reader:
+            phone_raw = row.get('phone') or row.get('phone_number') or row.get('mobile')
+
+            # Parse attributes and consent
+            attrs = {}
+            if row.get('attributes'):
+                try:
+                    attrs = json.loads(row['attributes'])
+                except Exception:
+                    attrs = {}
+
+            consent_data = {}
+            if row.get('consent'):
+                try:
+                    consent_data = json.loads(row['consent'])
+                except Exception:
+                    consent_data = {}
+
+            # Header is line 1
+            yield reader.line_num, phone_raw, attrs, consent_data
+
+    @staticmethod
+    def read_json(entries):
+        '''Yield (row_number, phone, attributes, consent) from a JSON array of user objects'''
+        for row_number, entry in enumerate(entries, start=1):
+            if not isinstance(entry, dict):
+                yield row_number, None, {}, {}
+                continue
+            yield row_number, entry.get('phone'), entry.get('attributes', {}), entry.get('consent', {})
+
+    @staticmethod
+    def import_users(rows, batch_size=5000, on_reject=None, on_progress=None):
+        '''
+        Create or update users from (row_number, phone, attributes, consent)
+        rows. Phones are validated a batch at a time and each batch is
+        upserted in one transaction, so memory stays flat however large the
+        input. Rejected rows are passed to on_reject(row_number, phone, reason)
+        and the running counts to on_progress(counts) after every batch.
+        '''
+        counts = {'created': 0, 'updated': 0, 'rejected': 0}
+        rows = iter(rows)
+        while True:
+            batch = list(islice(rows, batch_size))
+            if not batch:
+                return counts
+
+            results = normalize_and_validate_many(phone_raw or '' for _, phone_raw, _, _ in batch)
+            upserts = []
+            for (row_number, phone_raw, attrs, consent_data), (phone, is_valid) in zip(batch, results):
+                if not phone_raw:
+                    reason = 'missing phone'
+                elif not is_valid:
+                    reason = 'invalid phone'
+                elif not isinstance(attrs, dict) or not isinstance(consent_data, dict):
+                    reason = 'attributes and consent must be objects'
+                else:
+                    upserts.append((phone, attrs, User.consent_state_for(consent_data)))
+                    continue
+                counts['rejected'] += 1
+                if on_reject:
+                    on_reject(row_number, phone_raw, reason)
+
+            created, updated = User.bulk_upsert(upserts, batch_size=batch_size)
+            counts['created'] += created
+            counts['updated'] += updated
+            if on_progress:
+                on_progress(dict(counts))
+
+    @staticmethod
+    def start_import_job(upload):
+        '''Spool an uploaded CSV to disk and import it in the background; returns the ImportJob'''
+        app = current_app._get_current_object()
+        spool_dir = app.config.get('IMPORT_SPOOL_DIR') or 'db/imports'
+        os.makedirs(spool_dir, exist_ok=True)
+
+        job_id = uuid.uuid4().hex
+        spool_path = os.path.join(spool_dir, f"{job_id}.csv")
+        upload.save(spool_path)
+        job = ImportJob.create(upload.filename, spool_path, os.path.join(spool_dir, f"{job_id}.rejects.csv"), job_id,
+                               owner=UserImportService._owner_id())
+
+        with UserImportService._slots_lock:
+            if UserImportService._slots is None:
+                concurrency = max(int(app.config.get('IMPORT_CONCURRENCY', 2) or 1), 1)
+                UserImportService._slots = threading.BoundedSemaphore(concurrency)
+
+        threading.Thread(
+            target=UserImportService._run_import_job,
+            args=(app, job_id),
+            name=f"user-import-{job_id[:8]}",
+            daemon=True
+        ).start()
+        return job
+
+    @staticmethod
+    def _run_import_job(app, job_id):
+        # Jobs beyond IMPORT_CONCURRENCY stay QUEUED until a slot frees up
+        with UserImportService._slots, app.app_context():
+            job = ImportJob.get_by_id(job_id)
+            ImportJob.mark_running(job_id)
+            error = None
+            try:
+                with open(job.spool_path, 'rb') as upload, open(job.rejects_path, 'w', newline='') as rejects:
+                    writer = csv.writer(rejects)
+                    writer.writerow(['row_number', 'phone', 'reason'])
+                    counts = UserImportService.import_users(
+                        UserImportService.read_csv(upload),
+                        batch_size=app.config.get('USER_IMPORT_BATCH_SIZE', 5000),
+                        on_reject=lambda row_number, phone, reason: writer.writerow([row_number, phone, reason]),
+                        on_progress=lambda counts: ImportJob.update_progress(job_id, counts)
+                    )
+                print(f"Import job {job_id} finished: {counts['created']} created, "
+                      f"{counts['updated']} updated, {counts['rejected']} rejected")
+            except Exception as e:
+                error = str(e)
+                print(f"Import job {job_id} failed: {e}")
+
+            ImportJob.finish(job_id, error)
+            try:
+                os.remove(job.spool_path)
+            except OSError:
+                pass
+
+    @staticmethod
+    def _owner_id():
+        return f"{socket.gethostname()}:{os.getpid()}"
+
+    @staticmethod
+    def _owner_alive(owner):
+        '''Whether the process that owns a job may still be running it'''
+        host, _, pid = (owner or '').rpartition(':')
+        if host != socket.gethostname():
+            # Another host's job; its spool file isn't here either
+            return bool(owner)
+        try:
+            os.kill(int(pid), 0)
+        except ProcessLookupError:
+            return False
+        except (PermissionError, ValueError):
+            return True
+        return True
+
+    @staticmethod
+    def fail_interrupted_jobs():
+        '''
+        Fail the QUEUED/RUNNING jobs whose process has died (import threads
+        don't survive a restart) and remove their spooled uploads. Called at
+        startup; returns how many were failed.
+        '''
+        failed = 0
+        for job in ImportJob.get_unfinished():
+            if UserImportService._owner_alive(job.owner):
+                continue
+            error = "Interrupted by a restart; re-submit the file (rows are upserted, so repeating them is safe)"
+            if not ImportJob.fail_interrupted(job.job_id, job.owner, error):
+                continue
+            failed += 1
+            try:
+                if job.spool_path:
+                    os.remove(job.spool_path)
+            except OSError:
+                pass
+        if failed:
+            print(f"Marked {failed} interrupted import job(s) FAILED")
+        return failed
@@ -1,9 +1,11 @@
-from .phone_utils import normalize_phone, validate_e164
+from .phone_utils import normalize_and_validate, normalize_and_validate_many, normalize_phone, validate_e164
 from .template_utils import render_template_text
 from .validation import validate_phone, validate_template
 from .helpers import row_to_dict
 
 __all__ = [
+    'normalize_and_validate',
+    'normalize_and_validate_many',
     'normalize_phone',
     'validate_e164', 
     'render_template_text',
@@ -0,0 +1,381 @@
+import json
+import threading
+from array import array
+import time
+from app.utils.segment_filters import compile_segment
+
+
+def _value_key(value):
+    """
+    Hashable key for an attribute value, with the same equalities as the
+    compiled SQL: numbers compare by value (1 == 1.0), booleans and strings
+    are their own types. Containers are not indexed (None).
+    """
+    if isinstance(value, bool):
+        return ('b', value)
+    if isinstance(value, (int, float)):
+        return ('n', value)
+    if isinstance(value, str):
+        return ('s', value)
+    if value is None:
+        return ('z', None)
+    return None
+
+
+def _popcount(bits):
+    # int.bit_count() is Python 3.10+
+    return bits.bit_count() if hasattr(bits, 'bit_count') else bin(bits).count('1')
+
+
+class _Bitmap:
+    """Mutable bitset over user ordinals (users.rowid), one bit per user"""
+
+    __slots__ = ('bits',)
+
+    def __init__(self, size=0):
+        self.bits = bytearray(size)
+
+    def set(self, ordinal):
+        """Set a bit; returns how many bytes the bitmap grew by"""
+        byte = ordinal >> 3
+        grown = 0
+        if byte >= len(self.bits):
+            # Grow with some headroom so appending new users doesn't reallocate every time
+            grown = byte + 1 - len(self.bits) + len(self.bits) // 4
+            self.bits.extend(bytes(grown))
+        self.bits[byte] |= 1 << (ordinal & 7)
+        return grown
+
+    def clear(self, ordinal):
+        byte = ordinal >> 3
+        if byte < len(self.bits):
+            self.bits[byte] &= ~(1 << (ordinal & 7)) & 0xFF
+
+    def test(self, ordinal):
+        byte = ordinal >> 3
+        return byte < len(self.bits) and bool(self.bits[byte] & (1 << (ordinal & 7)))
+
+    def as_int(self):
+        return int.from_bytes(self.bits, 'little')
+
+    @property
+    def nbytes(self):
+        return len(self.bits)
+
+
+class _Attribute:
+    """
+    Bitmaps of one attribute. slots holds each user's value as 1 + its
+    position in keys (0 when unset), so rewriting a user clears the one
+    bitmap with their old value instead of scanning every value bitmap.
+    """
+    __slots__ = ('present', 'values', 'keys', 'slot_of', 'slots')
+
+    def __init__(self, max_values):
+        self.present = _Bitmap()
+        self.values = {}
+        self.keys = []
+        self.slot_of = {}
+        self.slots = array('H' if max_values < 0xFFFF else 'L')
+
+    def add_value(self, key):
+        bitmap = self.values[key] = _Bitmap()
+        self.keys.append(key)
+        self.slot_of[key] = len(self.keys)
+        return bitmap
+
+    def set_slot(self, ordinal, key):
+        """Record the user's value; returns how many bytes the slots grew by"""
+        grown = 0
+        if ordinal >= len(self.slots):
+            count = ordinal + 1 - len(self.slots) + len(self.slots) // 4
+            self.slots.frombytes(bytes(count * self.slots.itemsize))
+            grown = count * self.slots.itemsize
+        self.slots[ordinal] = self.slot_of[key]
+        return grown
+
+    def clear(self, ordinal):
+        """Clear the user's presence bit and the one value bit they have"""
+        if not self.present.test(ordinal):
+            return
+        self.present.clear(ordinal)
+        slot = self.slots[ordinal]
+        if slot:
+            self.values[self.keys[slot - 1]].clear(ordinal)
+            self.slots[ordinal] = 0
+
+    @property
+    def nbytes(self):
+        return (self.present.nbytes + len(self.slots) * self.slots.itemsize
+                + sum(bitmap.nbytes for bitmap in self.values.values()))
+
+
+class AttributeBitmapIndex:
+    """
+    In-process index from (attribute, value) to a bitmap of users, for
+    counting ad-hoc segment definitions without touching the database.
+
+    Bits are users.rowid, so AND/OR/NOT of whole segments run as big-integer
+    operations in C. Memory is bounded: an attribute with more than
+    max_values distinct values is dropped, and so is the largest attribute
+    whenever the total passes max_bytes. Definitions that need a dropped
+    attribute (or an unindexed value, e.g. an array) are not answerable and
+    callers fall back to SQL.
+
+    The index is per process: it is built from the users table in the
+    background and kept current by user writes made in this process.
+    """
+
+    def __init__(self, max_bytes=256 * 1024 * 1024, max_values=1000):
+        self.max_bytes = max_bytes
+        self.max_values = max_values
+        self.live = _Bitmap()
+        self.attributes = {}
+        self.dropped = {}
+        self.users = 0
+        self.nbytes = 0
+        self.ready = False
+        self.built_at = None
+        self.build_seconds = None
+        self._pending = set()
+        self._lock = threading.RLock()
+
+    # ---------------------------
+    # Maintenance
+    # ---------------------------
+    def build(self, db, batch_size=10000):
+        """Index every user; writes made meanwhile are replayed afterwards"""
+        started = time.time()
+        cursor = db.execute("SELECT rowid, attributes FROM users")
+        while True:
+            rows = cursor.fetchmany(batch_size)
+            if not rows:
+                break
+            with self._lock:
+                for ordinal, attributes in rows:
+                    self._add(ordinal, json.loads(attributes or '{}'))
+
+        with self._lock:
+            pending, self._pending = self._pending, set()
+            self.ready = True
+            self.built_at = time.time()
+            self.build_seconds = round(self.built_at - started, 2)
+        self.refresh_users(db, pending)
+
+    def refresh_users(self, db, phone_numbers):
+        """Re-index users after they were written (called with committed data)"""
+        phone_numbers = list(phone_numbers)
+        if not phone_numbers:
+            return
+        with self._lock:
+            if not self.ready:
+                self._pending.update(phone_numbers)
+                return
+        for i in range(0, len(phone_numbers), 500):
+            chunk = phone_numbers[i:i + 500]
+            rows = db.execute(
+                f"SELECT rowid, attributes FROM users WHERE phone_number IN ({','.join('?' * len(chunk))})",
+                chunk
+            ).fetchall()
+            with self._lock:
+                for ordinal, attributes in rows:
+                    self._remove(ordinal)
+                    self._add(ordinal, json.loads(attributes or '{}'))
+
+    def _add(self, ordinal, attributes):
+        if not self.live.test(ordinal):
+            self.users += 1
+        grown = self.live.set(ordinal)
+        for name, value in attributes.items():
+            if name in self.dropped:
+                continue
+            key = _value_key(value)
+            if key is None:
+                self._drop(name, 'non-scalar values')
+                continue
+            attribute = self.attributes.get(name)
+            if attribute is None:
+                attribute = self.attributes[name] = _Attribute(self.max_values)
+            bitmap = attribute.values.get(key)
+            if bitmap is None:
+                if len(attribute.values) >= self.max_values:
+                    self._drop(name, f'more than {self.max_values} distinct values')
+                    continue
+                bitmap = attribute.add_value(key)
+            grown += attribute.present.set(ordinal)
+            grown += bitmap.set(ordinal)
+            grown += attribute.set_slot(ordinal, key)
+        if grown:
+            self.nbytes += grown
+            self._enforce_budget()
+
+    def _remove(self, ordinal):
+        for attribute in self.attributes.values():
+            attribute.clear(ordinal)
+
+    def _drop(self, name, reason):
+        attribute = self.attributes.pop(name, None)
+        if attribute is not None:
+            self.nbytes -= attribute.nbytes
+        self.dropped[name] = reason
+
+    def _enforce_budget(self):
+        while self.attributes and self.nbytes > self.max_bytes:
+            largest = max(self.attributes, key=lambda name: self.attributes[name].nbytes)
+            self._drop(largest, 'memory budget')
+
+    # ---------------------------
+    # Queries
+    # ---------------------------
+    def count(self, definition):
+        """Members of an ad-hoc definition, or None if the index can't answer it"""
+        compile_segment(definition)  # same validation (ValueError) as stored segments
+        with self._lock:
+            if not self.ready:
+                return None
+            try:
+                return _popcount(self._items((definition or {}).get('filters', []), 'and'))
+            except LookupError:
+                return None
+
+    def _items(self, items, joiner):
+        if joiner == 'and':
+            result = self.live.as_int()
+            for item in items:
+                result &= self._item(item)
+        else:
+            result = 0
+            for item in items:
+                result |= self._item(item)
+        return result
+
+    def _item(self, item):
+        if 'and' in item or 'or' in item:
+            group = 'and' if 'and' in item else 'or'
+            return self._items(item[group], group)
+        return self._filter(item)
+
+    def _attribute(self, path):
+        name = path.split('.', 1)[1]
+        if '.' in name or name not in self.attributes:
+            if '.' in name or name in self.dropped:
+                raise LookupError(name)
+            return None  # no user has it
+        return self.attributes[name]
+
+    def _union(self, attribute, keys):
+        result = 0
+        if attribute is not None:
+            for key in keys:
+                bitmap = attribute.values.get(key)
+                if bitmap is not None:
+                    result |= bitmap.as_int()
+        return result
+
+    def _matching(self, attribute, predicate):
+        result = 0
+        if attribute is not None:
+            for key, bitmap in attribute.values.items():
+                if predicate(key):
+                    result |= bitmap.as_int()
+        return result
+
+    @staticmethod
+    def _eq_keys(value):
+        key = _value_key(value)
+        if key is None:
+            raise LookupError(value)
+        if key[0] == 'n' and value in (0, 1):
+            # json_extract turns true/false into 1/0
+            return [key, ('b', bool(value))]
+        return [key]
+
+    def _filter(self, filter_obj):
+        attribute = self._attribute(filter_obj.get('path'))
+        op = filter_obj.get('op', 'eq')
+        value = filter_obj.get('value')
+        live = self.live.as_int()
+        present = attribute.present.as_int() if attribute is not None else 0
+
+        if op in ('eq', 'neq'):
+            if isinstance(value, bool):
+                matched = self._union(attribute, [('b', value)])
+            elif value is None:
+                # Missing and JSON null both read as NULL
+                matched = live & ~(present & ~self._union(attribute, [('z', None)]))
+            else:
+                matched = self._union(attribute, self._eq_keys(value))
+            return live & ~matched if op == 'neq' else matched
+
+        if op == 'in':
+            keys = []
+            for item in value:
+                if isinstance(item, bool):
+                    # Bound as 1/0 in SQL, which also matches the numbers 1/0
+                    keys += [('b', item), ('n', int(item))]
+                elif item is not None:  # "IN (NULL)" never matches
+                    keys += self._eq_keys(item)
+            return self._union(attribute, keys)
+
+        if op in ('gt', 'lt'):
+            kind = 's' if isinstance(value, str) else 'n'
+            if op == 'gt':
+                return self._matching(attribute, lambda key: key[0] == kind and key[1] > value)
+            return self._matching(attribute, lambda key: key[0] == kind and key[1] < value)
+
+        if op == 'exists':
+            return present if value is None or value else live & ~present
+
+        if op == 'contains':
+            # Arrays are never indexed, so only string attributes remain
+            needle = str(value)
+            return self._matching(attribute, lambda key: key[0] == 's' and needle in key[1])
+
+        raise LookupError(op)
+
+    def stats(self):
+        with self._lock:
+            return {
+                'ready': self.ready,
+                'users': self.users,
+                'attributes': len(self.attributes),
+                'bitmaps': sum(len(attribute.values) + 1 for attribute in self.attributes.values()) + 1,
+                'memory_bytes': self.nbytes,
+                'max_bytes': self.max_bytes,
+                'max_values_per_attribute': self.max_values,
+                'dropped_attributes': dict(self.dropped),
+                'build_seconds': self.build_seconds
+            }
+
+
+_index = None
+
+
+def get_attribute_index():
+    """The process-wide index, or None when ATTRIBUTE_INDEX_ENABLED is off"""
+    return _index
+
+
+def configure_attribute_index(app):
+    """Create the index and build it from the users table on a background thread"""
+    global _index
+    if not app.config.get('ATTRIBUTE_INDEX_ENABLED'):
+        _index = None
+        return
+    _index = AttributeBitmapIndex(
+        max_bytes=int(float(app.config.get('ATTRIBUTE_INDEX_MAX_MB', 256)) * 1024 * 1024),
+        max_values=int(app.config.get('ATTRIBUTE_INDEX_MAX_VALUES', 1000))
+    )
+    index = _index
+
+    def build():
+        from app.database.connection import get_db
+        with app.app_context():
+            try:
+                index.build(get_db())
+                print(f"Attribute index built: {index.users} users, {index.nbytes / 1048576:.1f} MB "
+                      f"in {index.build_seconds}s")
+            except Exception as e:
+                print(f"Attribute index build failed: {e}")
+
+    threading.Thread(target=build, name="attribute-index-build", daemon=True).start()
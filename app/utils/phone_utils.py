@@ -1,17 +1,77 @@
+import re
+from functools import lru_cache
+
 import phonenumbers
 
-def validate_e164(phone):
-    """Validate E.164 phone number format"""
+# Already-normalised input: "+", a country code and digits only
+_E164_RE = re.compile(r'^\+([1-9]\d{6,14})$')
+
+
+def _fast_path(phone):
+    """
+    Validate a string that is already E.164 without phonenumbers.parse.
+
+    Builds the PhoneNumber directly from the country code and national
+    number. Only a valid result is trusted: the parser may still strip a
+    national prefix (e.g. "+7 8...") and accept what this rejects, so
+    anything else returns None and goes through the full parser.
+    """
+    match = _E164_RE.match(phone)
+    if not match:
+        return None
+    digits = match.group(1)
+    for length in (1, 2, 3):
+        country_code = int(digits[:length])
+        if country_code in phonenumbers.COUNTRY_CODE_TO_REGION_CODE:
+            national = digits[length:]
+            # Leading zeros (e.g. Italian fixed lines) need the parser's bookkeeping
+            if not national or national[0] == '0':
+                return None
+            number = phonenumbers.PhoneNumber(country_code=country_code, national_number=int(national))
+            return (phone, True) if phonenumbers.is_valid_number(number) else None
+    return None
+
+
+@lru_cache(maxsize=65536)
+def _normalize_and_validate(phone):
+    result = _fast_path(phone)
+    if result is not None:
+        return result
     try:
         p = phonenumbers.parse(phone, None)
-        return phonenumbers.is_valid_number(p)
     except Exception:
-        return False
+        return phone, False
+    return phonenumbers.format_number(p, phonenumbers.PhoneNumberFormat.E164), phonenumbers.is_valid_number(p)
+
+
+def normalize_and_validate(phone):
+    """
+    Normalize a phone number to E.164 and validate it in one pass.
+
+    Returns (normalized, is_valid); when the number cannot be parsed the
+    input is returned unchanged with is_valid False. Results are memoised.
+    """
+    if not isinstance(phone, str):
+        return phone, False
+    return _normalize_and_validate(phone)
+
+
+def normalize_and_validate_many(phones):
+    """
+    normalize_and_validate for a list of numbers, in input order.
+
+    Runs in the calling thread: the fast path and memo keep this near 50k
+    numbers/s, and worker processes forked from a threaded server (or
+    spawned, re-importing it) cost more than they would save.
+    """
+    return [normalize_and_validate(phone) for phone in phones]
+
+
+def validate_e164(phone):
+    """Validate E.164 phone number format"""
+    return normalize_and_validate(phone)[1]
+
 
 def normalize_phone(phone):
     """Normalize phone number to E.164 format"""
-    try:
-        p = phonenumbers.parse(phone, None)
-        return phonenumbers.format_number(p, phonenumbers.PhoneNumberFormat.E164)
-    except Exception:
-        return phone
\ No newline at end of file
+    return normalize_and_validate(phone)[0]
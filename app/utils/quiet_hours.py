@@ -0,0 +1,86 @@
+from datetime import datetime, time as dtime, timedelta
+from functools import lru_cache
+from zoneinfo import ZoneInfo, ZoneInfoNotFoundError
+
+
+def parse_clock(value):
+    """Parse a quiet-hours bound: 22, "22", "22:00" or "22:30" -> datetime.time"""
+    if value is None or value == '':
+        return None
+    if isinstance(value, dtime):
+        return value
+    if isinstance(value, int):
+        return dtime(value % 24)
+    hours, _, minutes = str(value).strip().partition(':')
+    return dtime(int(hours) % 24, int(minutes or 0))
+
+
+@lru_cache(maxsize=1024)
+def get_zone(name):
+    """ZoneInfo for an IANA name, or None if unknown (bad user data shouldn't break a send)"""
+    if not name:
+        return None
+    try:
+        return ZoneInfo(str(name))
+    except (ZoneInfoNotFoundError, ValueError):
+        return None
+
+
+class QuietHours:
+    """
+    A daily window (in the recipient's local time) during which nothing is sent.
+
+    start > end is an overnight window, e.g. 22:00-08:00. Recipients without
+    a known timezone use the campaign's timezone.
+    """
+
+    def __init__(self, start, end, timezone='UTC'):
+        self.start = parse_clock(start)
+        self.end = parse_clock(end)
+        self.default_zone = get_zone(timezone) or get_zone('UTC')
+
+    @classmethod
+    def for_campaign(cls, campaign, config):
+        """
+        Quiet hours that apply to a campaign: its own quiet_hours, else the
+        DEFAULT_QUIET_START/END config, either way in the campaign's timezone.
+        None when there is no window.
+        """
+        quiet = campaign.quiet_hours or {}
+        if quiet.get('enabled') is False:
+            return None
+        start = quiet.get('start') or config.get('DEFAULT_QUIET_START')
+        end = quiet.get('end') or config.get('DEFAULT_QUIET_END')
+        if start is None or end is None:
+            return None
+        timezone = quiet.get('timezone') or (campaign.schedule or {}).get('timezone') or 'UTC'
+        quiet_hours = cls(start, end, timezone)
+        if quiet_hours.start == quiet_hours.end:
+            return None
+        return quiet_hours
+
+    def release_at(self, now, timezone=None):
+        """
+        Unix time at which a message for a recipient in `timezone` may be sent,
+        or None if `now` (unix time) is outside the quiet window there.
+        """
+        zone = get_zone(timezone) or self.default_zone
+        local = datetime.fromtimestamp(now, zone)
+        clock = local.time()
+
+        if self.start < self.end:
+            quiet = self.start <= clock < self.end
+            release_day = local.date()
+        else:
+            quiet = clock >= self.start or clock < self.end
+            release_day = local.date() if clock < self.end else local.date() + timedelta(days=1)
+        if not quiet:
+            return None
+        return datetime.combine(release_day, self.end, tzinfo=zone).timestamp()
+
+
+def recipient_timezone(attributes):
+    """The recipient's IANA timezone from their attributes, if they have a valid one"""
+    attributes = attributes or {}
+    name = attributes.get('timezone') or attributes.get('tz')
+    return name if get_zone(name) else None
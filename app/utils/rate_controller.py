@@ -0,0 +1,100 @@
+import threading
+import time
+from app.utils.rate_limiter import TokenBucket
+
+
+class AdaptiveRateController:
+    """
+    AIMD send-rate control for one sender number.
+
+    The rate starts low and grows by `increase_step` msgs/s for every second's
+    worth of accepted sends, up to `max_rate`. A throttle response (HTTP 429,
+    Twilio 20429/63018) multiplies it by `decrease_factor` and, when the
+    provider sent a Retry-After hint, pauses all sends until it has passed.
+    Throttles arriving within `cooldown` seconds of the last decrease come from
+    requests already in flight and don't cut the rate again.
+    """
+
+    def __init__(self, max_rate, min_rate=0.2, initial_rate=None,
+                 increase_step=1.0, decrease_factor=0.5, cooldown=1.0):
+        self.max_rate = max(float(max_rate or 1), min_rate)
+        self.min_rate = min_rate
+        self.increase_step = increase_step
+        self.decrease_factor = decrease_factor
+        self.cooldown = cooldown
+        self.rate = min(float(initial_rate or max(self.max_rate / 2, min_rate)), self.max_rate)
+        self._bucket = TokenBucket(self.rate)
+        self._lock = threading.Lock()
+        self._successes = 0
+        self._throttles = 0
+        self._paused_until = 0.0
+        self._last_decrease = 0.0
+
+    def acquire(self):
+        """Block until this sender may make another request"""
+        while True:
+            wait = self._paused_until - time.monotonic()
+            if wait <= 0:
+                break
+            time.sleep(wait)
+        self._bucket.acquire()
+
+    def on_success(self):
+        with self._lock:
+            self._successes += 1
+            # Additive increase once per "round": a second's worth of accepted sends
+            if self._successes >= self.rate and self.rate < self.max_rate:
+                self._successes = 0
+                self._set_rate(min(self.rate + self.increase_step, self.max_rate))
+
+    def on_throttle(self, retry_after=None):
+        now = time.monotonic()
+        with self._lock:
+            self._throttles += 1
+            self._successes = 0
+            if retry_after:
+                self._paused_until = max(self._paused_until, now + float(retry_after))
+            if now - self._last_decrease >= self.cooldown:
+                self._last_decrease = now
+                self._set_rate(max(self.rate * self.decrease_factor, self.min_rate))
+
+    def set_max_rate(self, max_rate):
+        with self._lock:
+            self.max_rate = max(float(max_rate or 1), self.min_rate)
+            if self.rate > self.max_rate:
+                self._set_rate(self.max_rate)
+
+    def _set_rate(self, rate):
+        self.rate = rate
+        self._bucket.set_rate(rate)
+
+    def snapshot(self):
+        paused_for = max(self._paused_until - time.monotonic(), 0.0)
+        return {
+            'effective_rate': round(self.rate, 3),
+            'max_rate': self.max_rate,
+            'throttles': self._throttles,
+            'paused_for_seconds': round(paused_for, 3)
+        }
+
+
+_controllers = {}
+_controllers_lock = threading.Lock()
+
+
+def get_rate_controller(sender, max_rate):
+    """Return the process-wide controller for a sender number, capped at max_rate"""
+    controller = _controllers.get(sender)
+    if controller is None:
+        with _controllers_lock:
+            controller = _controllers.get(sender)
+            if controller is None:
+                controller = _controllers[sender] = AdaptiveRateController(max_rate)
+    elif controller.max_rate != float(max_rate or 1):
+        controller.set_max_rate(max_rate)
+    return controller
+
+
+def rate_controller_snapshots():
+    """Current effective rate per sender number (this process only)"""
+    return {sender: controller.snapshot() for sender, controller in list(_controllers.items())}
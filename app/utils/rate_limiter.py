@@ -0,0 +1,49 @@
+import threading
+import time
+
+
+class TokenBucket:
+    """
+    Thread-safe token bucket.
+
+    Tokens refill continuously at `rate` per second up to `capacity`;
+    acquire() blocks the calling thread until a token is available, so a
+    bucket shared by several sender threads caps their combined throughput.
+    """
+
+    def __init__(self, rate, capacity=None):
+        self.rate = max(float(rate or 1), 0.001)
+        self.capacity = float(capacity) if capacity else max(self.rate, 1.0)
+        self._tokens = self.capacity
+        self._last = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _refill(self):
+        now = time.monotonic()
+        self._tokens = min(self.capacity, self._tokens + (now - self._last) * self.rate)
+        self._last = now
+
+    def set_rate(self, rate, capacity=None):
+        """Change the refill rate without dropping the tokens already earned"""
+        with self._lock:
+            self._refill()
+            self.rate = max(float(rate), 0.001)
+            self.capacity = float(capacity) if capacity else max(self.rate, 1.0)
+            self._tokens = min(self._tokens, self.capacity)
+
+    def try_acquire(self, tokens=1):
+        """Take tokens if available; return seconds to wait otherwise (0 on success)"""
+        with self._lock:
+            self._refill()
+            if self._tokens >= tokens:
+                self._tokens -= tokens
+                return 0.0
+            return (tokens - self._tokens) / self.rate
+
+    def acquire(self, tokens=1):
+        """Block until `tokens` are available and take them"""
+        while True:
+            wait = self.try_acquire(tokens)
+            if wait <= 0:
+                return
+            time.sleep(wait)
@@ -0,0 +1,49 @@
+import random
+
+# HTTP statuses worth retrying: throttling, timeouts and provider-side failures
+RETRYABLE_STATUSES = {408, 429, 500, 502, 503, 504}
+
+# Twilio error codes that are transient despite a 4xx status
+RETRYABLE_CODES = {
+    '20429',  # Too many requests
+    '63018',  # Rate limit exceeded for channel
+    '30001',  # Queue overflow
+    '20500',  # Internal server error
+    '20503',  # Service unavailable
+}
+
+
+def is_retryable(error):
+    """
+    Decide whether a failed send should be tried again.
+
+    Errors that say so explicitly (ProviderError.retryable) win; otherwise
+    throttling, 5xx and the transient Twilio codes are retryable, other
+    provider rejections (bad number, unsubscribed, ...) are permanent, and an
+    error with no HTTP status at all is a network failure and retryable.
+    """
+    retryable = getattr(error, 'retryable', None)
+    if retryable is not None:
+        return retryable
+    code = getattr(error, 'code', None)
+    if code is not None and str(code) in RETRYABLE_CODES:
+        return True
+    status = getattr(error, 'status', None)
+    if status is None:
+        return True
+    return status in RETRYABLE_STATUSES
+
+
+def backoff_delay(attempt, base_delay, max_delay, retry_after=None, rng=random):
+    """
+    Seconds to wait before retry number `attempt` (1-based).
+
+    Full-jitter exponential backoff: uniform over [0, min(max, base * 2^(n-1))],
+    so retries from one burst of failures spread out instead of returning
+    together. A provider Retry-After hint is treated as a floor.
+    """
+    ceiling = min(float(max_delay), float(base_delay) * (2 ** max(attempt - 1, 0)))
+    delay = rng.uniform(0, ceiling)
+    if retry_after:
+        delay = max(delay, float(retry_after))
+    return delay
@@ -0,0 +1,155 @@
+from datetime import datetime, timedelta
+from app.utils.quiet_hours import get_zone
+
+_FIELDS = (
+    ('minute', 0, 59),
+    ('hour', 0, 23),
+    ('day', 1, 31),
+    ('month', 1, 12),
+    ('weekday', 0, 7),
+)
+
+
+def _parse_field(expr, low, high):
+    """One cron field ("*", "5", "1-5", "*/15", "0-30/10", "1,15") -> set of values"""
+    values = set()
+    for part in expr.split(','):
+        spec, _, step = part.partition('/')
+        step = int(step) if step else 1
+        if step < 1:
+            raise ValueError(f"Invalid cron step: {part}")
+        if spec == '*':
+            start, end = low, high
+        elif '-' in spec:
+            start, end = (int(v) for v in spec.split('-', 1))
+        else:
+            start = end = int(spec)
+            if step > 1:
+                end = high
+        if start < low or end > high or start > end:
+            raise ValueError(f"Cron value out of range: {part}")
+        values.update(range(start, end + 1, step))
+    return values
+
+
+class CronExpression:
+    """
+    Standard five-field cron expression: minute hour day-of-month month day-of-week.
+
+    Day of week is 0-6 with 0 = Sunday (7 is accepted for Sunday too). As in
+    cron, when both day fields are restricted a day matches if either does.
+    """
+
+    def __init__(self, expr):
+        fields = str(expr).split()
+        if len(fields) != 5:
+            raise ValueError(f"Cron expression needs 5 fields: {expr!r}")
+        try:
+            parsed = [_parse_field(field, low, high) for field, (_, low, high) in zip(fields, _FIELDS)]
+        except ValueError as e:
+            raise ValueError(f"Invalid cron expression {expr!r}: {e}")
+        self.expr = expr
+        self.minutes, self.hours, self.days, self.months, weekdays = parsed
+        self.weekdays = {value % 7 for value in weekdays}
+        self._any_day = fields[2] == '*'
+        self._any_weekday = fields[4] == '*'
+
+    def _day_matches(self, value):
+        day_ok = value.day in self.days
+        # Python weekday() is Monday=0; cron is Sunday=0
+        weekday_ok = (value.weekday() + 1) % 7 in self.weekdays
+        if self._any_day:
+            return weekday_ok
+        if self._any_weekday:
+            return day_ok
+        return day_ok or weekday_ok
+
+    def next_after(self, after):
+        """First matching naive local datetime strictly after `after` (naive local)"""
+        value = after.replace(second=0, microsecond=0) + timedelta(minutes=1)
+        # Jumps a field at a time, so this is bounded by a few thousand steps
+        limit = value + timedelta(days=366 * 5)
+        while value <= limit:
+            if value.month not in self.months:
+                year, month = (value.year + 1, 1) if value.month == 12 else (value.year, value.month + 1)
+                value = value.replace(year=year, month=month, day=1, hour=0, minute=0)
+                continue
+            if not self._day_matches(value):
+                value = value.replace(hour=0, minute=0) + timedelta(days=1)
+                continue
+            if value.hour not in self.hours:
+                value = value.replace(minute=0) + timedelta(hours=1)
+                continue
+            if value.minute not in self.minutes:
+                value += timedelta(minutes=1)
+                continue
+            return value
+        raise ValueError(f"Cron expression {self.expr!r} never fires")
+
+
+def parse_schedule_time(value, timezone='UTC'):
+    """ISO date/time (naive values are in `timezone`) -> unix seconds"""
+    if value is None or value == '':
+        return None
+    if isinstance(value, (int, float)):
+        return float(value)
+    parsed = datetime.fromisoformat(str(value).replace('Z', '+00:00'))
+    if parsed.tzinfo is None:
+        parsed = parsed.replace(tzinfo=get_zone(timezone) or get_zone('UTC'))
+    return parsed.timestamp()
+
+
+def next_run_time(schedule, after):
+    """
+    Next unix time a campaign schedule fires strictly after `after`, or None.
+
+    {"type": "scheduled", "at": ...} fires once at `at`. Adding "cron" makes
+    it recurring, starting from `at` if given. Times are in schedule.timezone.
+    """
+    schedule = schedule or {}
+    if schedule.get('type') != 'scheduled':
+        return None
+    timezone = schedule.get('timezone') or 'UTC'
+    start = parse_schedule_time(schedule.get('at'), timezone)
+
+    cron = schedule.get('cron')
+    if not cron:
+        return start if start is not None and start > after else None
+
+    zone = get_zone(timezone) or get_zone('UTC')
+    expression = CronExpression(cron)
+    # The run at `start` itself counts, so search from just before it
+    base = max(after, start - 60) if start is not None else after
+    local = datetime.fromtimestamp(base, zone).replace(tzinfo=None)
+    # Cron matches wall-clock times, which repeat when the clocks go back:
+    # a match is the first of its instants past `base`, or the search moves on
+    while True:
+        local = expression.next_after(local)
+        later = [moment for moment in _instants(local, zone) if moment > base]
+        if later:
+            return later[0]
+
+
+def _instants(local, zone):
+    """
+    Unix times a naive local time names in `zone`, earliest first: two in the
+    hour repeated when the clocks go back, and for a time skipped when they go
+    forward the moment just after the gap (as cron runs it).
+    """
+    moments = []
+    for fold in (0, 1):
+        moment = local.replace(tzinfo=zone, fold=fold).timestamp()
+        if datetime.fromtimestamp(moment, zone).replace(tzinfo=None) == local and moment not in moments:
+            moments.append(moment)
+    return sorted(moments) or [local.replace(tzinfo=zone).timestamp()]
+
+
+def first_run_time(schedule, now):
+    """
+    When a newly scheduled campaign should first run: `at` for a one-off
+    (immediately if that is already past), else the next cron time.
+    """
+    schedule = schedule or {}
+    if schedule.get('type') == 'scheduled' and not schedule.get('cron'):
+        return parse_schedule_time(schedule.get('at'), schedule.get('timezone') or 'UTC')
+    return next_run_time(schedule, now)
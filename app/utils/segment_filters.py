@@ -0,0 +1,114 @@
+"""
+Compile segment definitions to a parameterised SQL condition on users.
+
+A definition's "filters" list is ANDed. Each item is either a filter
+
+    {"path": "attributes.plan", "op": "eq", "value": "premium"}
+
+or a group {"and": [...]} / {"or": [...]} of further items. Attribute
+values are read with json_extract, so SQLite evaluates the segment without
+loading or decoding users in Python.
+"""
+import json
+import re
+
+OPERATORS = ('eq', 'neq', 'in', 'gt', 'lt', 'exists', 'contains')
+
+_KEY_RE = re.compile(r'^[A-Za-z0-9_\-]+$')
+
+
+def json_path(path):
+    """'attributes.address.city' -> '$."address"."city"' (raises ValueError for other paths)"""
+    if not isinstance(path, str) or not path.startswith('attributes.'):
+        raise ValueError(f"Unsupported filter path: {path!r} (expected attributes.<key>)")
+    keys = path.split('.')[1:]
+    if not all(_KEY_RE.match(key) for key in keys):
+        raise ValueError(f"Invalid attribute key in filter path: {path!r}")
+    return '$' + ''.join(f'."{key}"' for key in keys)
+
+
+def _scalar(value):
+    """Filter value as a SQL parameter; JSON containers compare as minified JSON text"""
+    if isinstance(value, (dict, list)):
+        return json.dumps(value, separators=(',', ':'))
+    return value
+
+
+def _compile_filter(filter_obj, params):
+    path = json_path(filter_obj.get('path'))
+    op = filter_obj.get('op', 'eq')
+    value = filter_obj.get('value')
+    extract = "json_extract(users.attributes, ?)"
+    jtype = "json_type(users.attributes, ?)"
+
+    if op in ('eq', 'neq'):
+        negate = op == 'neq'
+        if isinstance(value, bool):
+            # JSON true/false come back from json_extract as 1/0, so compare the JSON type
+            params += [path, 'true' if value else 'false']
+            return f"{jtype} {'IS NOT' if negate else '='} ?"
+        if value is None:
+            params.append(path)
+            return f"{extract} {'IS NOT' if negate else 'IS'} NULL"
+        params += [path, _scalar(value)]
+        # A missing attribute is "not equal", as it was with attributes.get(key) != value
+        return f"{extract} {'IS NOT' if negate else '='} ?"
+
+    if op == 'in':
+        if not isinstance(value, list) or not value:
+            raise ValueError("'in' filter needs a non-empty list value")
+        params.append(path)
+        params.extend(_scalar(item) for item in value)
+        return f"{extract} IN ({', '.join('?' for _ in value)})"
+
+    if op in ('gt', 'lt'):
+        if isinstance(value, bool) or not isinstance(value, (int, float, str)):
+            raise ValueError(f"'{op}' filter needs a number or string value")
+        # Only compare like with like: SQLite orders every string above every number
+        types = "('text')" if isinstance(value, str) else "('integer', 'real')"
+        params += [path, path, value]
+        return f"({jtype} IN {types} AND {extract} {'>' if op == 'gt' else '<'} ?)"
+
+    if op == 'exists':
+        params.append(path)
+        return f"{jtype} {'IS NOT' if value is None or value else 'IS'} NULL"
+
+    if op == 'contains':
+        if value is None:
+            raise ValueError("'contains' filter needs a value")
+        # Substring of a string attribute, or an element of an array attribute
+        params += [path, path, str(value), path, _scalar(value)]
+        return (f"(CASE {jtype} "
+                f"WHEN 'text' THEN instr({extract}, ?) > 0 "
+                f"WHEN 'array' THEN EXISTS (SELECT 1 FROM json_each(users.attributes, ?) WHERE json_each.value = ?) "
+                f"ELSE 0 END)")
+
+    raise ValueError(f"Unsupported filter op: {op!r} (expected one of {', '.join(OPERATORS)})")
+
+
+def _compile_items(items, joiner, params):
+    if not isinstance(items, list):
+        raise ValueError("Segment filters must be a list")
+    clauses = []
+    for item in items:
+        if not isinstance(item, dict):
+            raise ValueError(f"Invalid segment filter: {item!r}")
+        if 'and' in item or 'or' in item:
+            group = 'and' if 'and' in item else 'or'
+            clauses.append(_compile_items(item[group], group.upper(), params))
+        else:
+            clauses.append(_compile_filter(item, params))
+    if not clauses:
+        # An empty AND group matches everyone, an empty OR group nobody
+        return '1' if joiner == 'AND' else '0'
+    return '(' + f' {joiner} '.join(clauses) + ')'
+
+
+def compile_segment(definition):
+    """
+    SQL condition (on the users table) and parameters for a segment
+    definition. Raises ValueError for an invalid definition.
+    """
+    params = []
+    where = _compile_items((definition or {}).get('filters', []), 'AND', params)
+    return where, params
@@ -1,10 +1,12 @@
 ALLOWED = {
     "QUEUED": ["SENDING"],
-    "SENDING": ["SENT", "FAILED", "UNDLVD"],
+    # SENDING -> QUEUED when an outbox lease expires or a retryable send is rescheduled
+    "SENDING": ["SENT", "FAILED", "UNDLVD", "QUEUED"],
     "SENT": ["DELIVERED", "FAILED", "UNDLVD"],
     "DELIVERED": ["READ"],
     "READ": [],
-    "FAILED": [],
+    # FAILED -> QUEUED when a dead-lettered message is re-driven
+    "FAILED": ["QUEUED"],
     "UNDLVD": []
 }
 
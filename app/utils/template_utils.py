@@ -1,8 +1,122 @@
-from jinja2 import Environment, StrictUndefined
+import hashlib
+import os
+import threading
+from collections import OrderedDict
+from functools import lru_cache
+from jinja2 import Environment, FileSystemBytecodeCache, StrictUndefined, meta
 
 ENV = Environment(undefined=StrictUndefined)
 
-def render_template_text(body, placeholders):
+
+class CompiledTemplateCache:
+    """
+    Bounded LRU of compiled Jinja templates, keyed by template source.
+
+    Keying by the source itself means an edited template can never be served
+    stale; entries are also tagged with their template_id so Template.save()
+    can drop the old version straight away. With a bytecode cache configured,
+    a miss loads the compiled module from disk instead of re-parsing.
+    """
+
+    def __init__(self, env, maxsize=256):
+        self.env = env
+        self.maxsize = maxsize
+        self._templates = OrderedDict()
+        self._sources_by_id = {}
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, source, template_id=None):
+        with self._lock:
+            entry = self._templates.get(source)
+            if entry is not None:
+                self._templates.move_to_end(source)
+                self.hits += 1
+                return entry[0]
+            self.misses += 1
+
+        # Compile outside the lock; two threads racing on one source both get a valid template
+        template = self._compile(source)
+        with self._lock:
+            self._templates[source] = (template, template_id)
+            self._templates.move_to_end(source)
+            if template_id is not None:
+                self._sources_by_id.setdefault(template_id, set()).add(source)
+            while len(self._templates) > self.maxsize:
+                evicted, (_, evicted_id) = self._templates.popitem(last=False)
+                self._sources_by_id.get(evicted_id, set()).discard(evicted)
+        return template
+
+    def _compile(self, source):
+        bytecode_cache = self.env.bytecode_cache
+        if bytecode_cache is None:
+            return self.env.from_string(source)
+
+        # Same steps as jinja2's BaseLoader.load, for templates that have no loader
+        name = "template-" + hashlib.sha1(source.encode("utf-8")).hexdigest()
+        bucket = bytecode_cache.get_bucket(self.env, name, None, source)
+        code = bucket.code
+        if code is None:
+            code = self.env.compile(source, name)
+            bucket.code = code
+            bytecode_cache.set_bucket(bucket)
+        return self.env.template_class.from_code(self.env, code, self.env.make_globals(None))
+
+    def invalidate(self, template_id):
+        with self._lock:
+            for source in self._sources_by_id.pop(template_id, ()):
+                self._templates.pop(source, None)
+
+    def configure(self, maxsize=None, bytecode_cache_dir=None):
+        with self._lock:
+            if maxsize:
+                self.maxsize = int(maxsize)
+            self.env.bytecode_cache = FileSystemBytecodeCache(bytecode_cache_dir) if bytecode_cache_dir else None
+            self._templates.clear()
+            self._sources_by_id.clear()
+
+    def stats(self):
+        return {
+            'size': len(self._templates),
+            'maxsize': self.maxsize,
+            'hits': self.hits,
+            'misses': self.misses,
+            'bytecode_cache': self.env.bytecode_cache.directory if self.env.bytecode_cache else None
+        }
+
+
+_cache = CompiledTemplateCache(ENV)
+
+
+def get_compiled_template(body, template_id=None):
+    """Compiled Jinja template for `body`, from the shared cache"""
+    return _cache.get(body, template_id)
+
+
+def invalidate_template(template_id):
+    """Forget compiled versions of a stored template (called when it is saved)"""
+    _cache.invalidate(template_id)
+
+
+def configure_template_cache(maxsize=None, bytecode_cache_dir=None):
+    """Size the compiled-template cache and optionally persist bytecode to a directory"""
+    if bytecode_cache_dir:
+        os.makedirs(bytecode_cache_dir, exist_ok=True)
+    _cache.configure(maxsize, bytecode_cache_dir)
+
+
+@lru_cache(maxsize=256)
+def template_variables(body):
+    """Top-level names a template reads from its context, e.g. {'first_name', 'plan'}"""
+    return frozenset(meta.find_undeclared_variables(ENV.parse(body)))
+
+
+def template_cache_stats():
+    return _cache.stats()
+
+
+def render_template_text(body, placeholders, template_id=None):
     """Render template text with placeholders"""
-    tmpl = ENV.from_string(body)
-    return tmpl.render(**placeholders)
\ No newline at end of file
+    tmpl = get_compiled_template(body, template_id)
+    return tmpl.render(**placeholders)
@@ -1,9 +1,9 @@
-from app.utils.phone_utils import validate_e164, normalize_phone
+from app.utils.phone_utils import normalize_and_validate
 
 def validate_phone(phone):
     """Validate phone number"""
-    normalized = normalize_phone(phone)
-    return validate_e164(normalized), normalized
+    normalized, is_valid = normalize_and_validate(phone)
+    return is_valid, normalized
 
 def validate_template(template_body, placeholders):
     """Validate template syntax and placeholders"""
@@ -0,0 +1,59 @@
+import threading
+
+
+def _clean(number):
+    return str(number).replace('whatsapp:', '').replace(' ', '').replace('-', '').strip()
+
+
+class VerifiedNumbers:
+    """
+    Allow-list of recipient numbers for Twilio trial accounts.
+
+    Entries in E.164 form ("+94123458986") must match exactly and live in a
+    set. Entries without a leading "+" are treated as trailing digits (the
+    old loose match, e.g. a local number without country code) and go in a
+    suffix index keyed by length, so a check costs one set lookup per
+    distinct suffix length rather than a scan of the whole list.
+    """
+
+    def __init__(self, numbers):
+        if isinstance(numbers, str):
+            numbers = numbers.split(',')
+        self.numbers = [_clean(number) for number in numbers or [] if _clean(number)]
+        self.exact = {number for number in self.numbers if number.startswith('+')}
+        self.suffixes = {}
+        for number in self.numbers:
+            if not number.startswith('+'):
+                self.suffixes.setdefault(len(number), set()).add(number)
+
+    def __bool__(self):
+        return bool(self.numbers)
+
+    def __contains__(self, phone):
+        phone = _clean(phone)
+        if phone in self.exact:
+            return True
+        digits = phone.lstrip('+')
+        return any(digits[-length:] in numbers for length, numbers in self.suffixes.items()
+                   if len(digits) >= length)
+
+
+_index = None
+_index_source = None
+_index_lock = threading.Lock()
+
+
+def get_verified_numbers(config):
+    """
+    The VerifiedNumbers index for config['VERIFIED_NUMBERS']. Built once and
+    rebuilt only when the config value is replaced.
+    """
+    global _index, _index_source
+    source = config.get('VERIFIED_NUMBERS')
+    if source is _index_source and _index is not None:
+        return _index
+    with _index_lock:
+        if source is not _index_source or _index is None:
+            _index = VerifiedNumbers(source)
+            _index_source = source
+        return _index
@@ -0,0 +1,110 @@
+#!/usr/bin/env python3
+"""
+Outbox worker: sends QUEUED messages from the messages table.
+
+Run one or more of these next to the API to scale sending out across
+processes on the same box; they coordinate purely through row leases.
+
+    python -m app.workers.outbox_worker --concurrency 8
+"""
+import argparse
+import os
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, wait
+
+# Add the parent directory to Python path to find the app package
+parent_dir = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+if parent_dir not in sys.path:
+    sys.path.insert(0, parent_dir)
+
+from app import create_app
+from app.models.campaign import Campaign
+from app.models.message import Message
+from app.services.messaging_service import MessagingService
+from app.services.outbox_service import OutboxService
+from app.utils.rate_limiter import TokenBucket
+
+
+class OutboxWorker:
+    def __init__(self, app, concurrency=None, poll_interval=1.0):
+        self.app = app
+        self.owner = OutboxService.new_owner_id()
+        self.concurrency = concurrency or int(app.config.get('SEND_CONCURRENCY', 8) or 1)
+        self.poll_interval = poll_interval
+        self._buckets = {}
+        self._quiet_hours = {}
+        self._stop = threading.Event()
+
+    def _bucket_for(self, campaign_id):
+        '''Per-campaign token bucket; the rate applies per worker process'''
+        bucket = self._buckets.get(campaign_id)
+        if bucket is None:
+            campaign = Campaign.get_by_id(campaign_id)
+            rate = (campaign.rate_limit if campaign else None) or self.app.config.get('DEFAULT_RATE_LIMIT', 1)
+            bucket = self._buckets[campaign_id] = TokenBucket(rate)
+            self._quiet_hours[campaign_id] = OutboxService.quiet_hours_for(campaign) if campaign else None
+        return bucket
+
+    def _init_thread(self):
+        # Each pool thread keeps one app context (and so one SQLite connection)
+        self.app.app_context().push()
+
+    def run_once(self, pool):
+        '''Claim and send one batch; returns the number of messages processed'''
+        lease_seconds = float(self.app.config.get('OUTBOX_LEASE_SECONDS', 60) or 60)
+        batch = Message.claim_batch(self.owner, OutboxService.claim_size(None), lease_seconds)
+        futures = []
+        for message in batch:
+            self._bucket_for(message.campaign_id).acquire()
+            quiet_hours = self._quiet_hours.get(message.campaign_id)
+            futures.append(pool.submit(OutboxService.deliver, message, self.owner, quiet_hours))
+        wait(futures)
+
+        for campaign_id in {message.campaign_id for message in batch}:
+            Campaign.complete_if_drained(campaign_id)
+        return len(batch)
+
+    def run(self):
+        with self.app.app_context():
+            # Validate credentials once up front rather than on every send
+            if not MessagingService.validate_twilio_credentials():
+                print("WARNING: Twilio credentials could not be validated; sends will fail")
+            released = Message.release_expired_leases()
+            print(f"Outbox worker {self.owner} started; {released} expired leases returned to the queue")
+
+            with ThreadPoolExecutor(max_workers=self.concurrency, initializer=self._init_thread) as pool:
+                while not self._stop.is_set():
+                    if self.run_once(pool):
+                        continue
+                    # Nothing due: recover rows from crashed workers, then sleep until the
+                    # next retry/quiet-hours release (or poll_interval, for new launches)
+                    Message.release_expired_leases()
+                    due = Message.next_due_at()
+                    wait = self.poll_interval
+                    if due is not None:
+                        wait = min(wait, max(due - time.time(), 0.05))
+                    self._stop.wait(wait)
+
+    def stop(self):
+        self._stop.set()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Send queued messages from the outbox")
+    parser.add_argument('--concurrency', type=int, default=None, help="sender threads (default SEND_CONCURRENCY)")
+    parser.add_argument('--poll-interval', type=float, default=1.0, help="seconds to wait when the queue is empty")
+    args = parser.parse_args()
+
+    app = create_app()
+    worker = OutboxWorker(app, concurrency=args.concurrency, poll_interval=args.poll_interval)
+    try:
+        worker.run()
+    except KeyboardInterrupt:
+        worker.stop()
+        print("Outbox worker stopped")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,122 @@
+#!/usr/bin/env python3
+"""
+Campaign scheduler: launches `schedule.type = scheduled` campaigns when due.
+
+Due campaigns are found through the indexed campaigns.next_run_at column, and
+the loop sleeps until the earliest next_run_at, so the work per wake-up
+depends on how many campaigns are due, not on how many exist. Launched
+campaigns are sent by this process (outbox workers can share the load).
+Frozen audiences of campaigns waiting for a run are refreshed every
+AUDIENCE_SNAPSHOT_REFRESH_SECONDS, so launching one has little left to do.
+A run that fails to launch (no recipients, a missing template) is recorded
+in the campaign's last_error and retried after SCHEDULE_RETRY_SECONDS.
+
+    python -m app.workers.scheduler
+"""
+import argparse
+import os
+import sys
+import threading
+import time
+
+# Add the parent directory to Python path to find the app package
+parent_dir = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+if parent_dir not in sys.path:
+    sys.path.insert(0, parent_dir)
+
+from app import create_app
+from app.models.campaign import Campaign
+from app.services.audience_service import AudienceService
+from app.services.campaign_service import CampaignService
+from app.services.messaging_service import MessagingService
+from app.utils.schedule import next_run_time
+
+
+class CampaignScheduler:
+    def __init__(self, app, max_sleep=5.0, batch_size=100):
+        self.app = app
+        # Upper bound on a sleep, so campaigns scheduled by the API meanwhile are noticed
+        self.max_sleep = max_sleep
+        self.batch_size = batch_size
+        self.audience_refresh = float(app.config.get('AUDIENCE_SNAPSHOT_REFRESH_SECONDS', 300) or 0)
+        self.retry_delay = float(app.config.get('SCHEDULE_RETRY_SECONDS', 300) or 0)
+        self._stop = threading.Event()
+
+    def run_once(self, now=None):
+        '''Launch every campaign that is due; returns how many were due'''
+        now = now or time.time()
+        due = Campaign.get_due(now, self.batch_size)
+        for campaign_id, due_at in due:
+            campaign = Campaign.get_by_id(campaign_id)
+            # Recurring campaigns move on to the next cron time after now, so a
+            # scheduler that was down fires a missed run once rather than repeatedly
+            next_run_at = next_run_time(campaign.schedule, now) if campaign else None
+            if not Campaign.advance_schedule(campaign_id, due_at, next_run_at):
+                continue  # another scheduler took it, or it was rescheduled meanwhile
+            try:
+                job = CampaignService.run_scheduled(campaign_id)
+                if job:
+                    print(f"Scheduled run of campaign {campaign_id} started as job {job.job_id}")
+            except Exception as e:
+                # The schedule has already moved on; without this a failed
+                # one-off run would never come round again
+                retry_at = time.time() + max(self.retry_delay, self.max_sleep)
+                if Campaign.record_run_failure(campaign_id, str(e), retry_at):
+                    print(f"Scheduled run of campaign {campaign_id} failed: {e}; retrying in {retry_at - time.time():.0f}s")
+                else:
+                    print(f"Scheduled run of campaign {campaign_id} failed: {e}")
+        return len(due)
+
+    def refresh_audiences(self, now=None):
+        '''Bring frozen audiences last refreshed over audience_refresh seconds ago up to date'''
+        if self.audience_refresh <= 0:
+            return 0
+        stale = Campaign.get_stale_audiences((now or time.time()) - self.audience_refresh, self.batch_size)
+        for campaign_id in stale:
+            try:
+                campaign = Campaign.get_by_id(campaign_id)
+                if campaign:
+                    AudienceService.refresh(campaign)
+            except Exception as e:
+                print(f"Refreshing the audience of campaign {campaign_id} failed: {e}")
+        return len(stale)
+
+    def seconds_until_next(self, now=None):
+        next_run_at = Campaign.next_scheduled_at()
+        if next_run_at is None:
+            return self.max_sleep
+        return min(max(next_run_at - (now or time.time()), 0.0), self.max_sleep)
+
+    def run(self):
+        with self.app.app_context():
+            if not MessagingService.validate_twilio_credentials():
+                print("WARNING: Twilio credentials could not be validated; sends will fail")
+            print("Campaign scheduler started")
+
+            while not self._stop.is_set():
+                if self.run_once() >= self.batch_size:
+                    continue  # more may be due right now
+                self.refresh_audiences()
+                self._stop.wait(self.seconds_until_next())
+
+    def stop(self):
+        self._stop.set()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Launch scheduled campaigns when they are due")
+    parser.add_argument('--max-sleep', type=float, default=5.0,
+                        help="longest wait between checks for newly scheduled campaigns")
+    args = parser.parse_args()
+
+    app = create_app()
+    scheduler = CampaignScheduler(app, max_sleep=args.max_sleep)
+    try:
+        scheduler.run()
+    except KeyboardInterrupt:
+        scheduler.stop()
+        print("Campaign scheduler stopped")
+
+
+if __name__ == "__main__":
+    main()
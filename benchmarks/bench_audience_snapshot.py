@@ -0,0 +1,118 @@
+#!/usr/bin/env python3
+"""
+Benchmark: resolving a campaign audience at launch vs streaming a frozen snapshot.
+
+The live paths resolve topic subscription, consent and segment while the
+launch walks the audience (the segment either materialised or compiled
+inline). The snapshot path freezes the audience into campaign_audience when
+the campaign is scheduled, refreshes it after --changes users are written,
+and launch then walks the snapshot. Each walk reads keyset pages the way a
+launch does.
+Runs against a throwaway SQLite database created from the app's schema.
+
+    python benchmarks/bench_audience_snapshot.py --users 1000000 --changes 1000
+"""
+import argparse
+import contextlib
+import os
+import random
+import sys
+import tempfile
+import time
+
+# Add the parent directory to Python path to find the app package
+parent_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if parent_dir not in sys.path:
+    sys.path.insert(0, parent_dir)
+
+from flask import Flask
+
+from app.database.connection import close_db, get_db
+from app.models.campaign import Campaign
+from app.models.segment import Segment
+from app.models.user import User
+from app.services.audience_service import AudienceService
+
+DEFINITION = {"filters": [
+    {"path": "attributes.plan", "op": "eq", "value": "premium"},
+    {"path": "attributes.city", "op": "in", "value": ["Kandy", "Galle"]},
+]}
+
+
+def _users(count, seed=7):
+    rng = random.Random(seed)
+    for i in range(count):
+        yield (f"+9477{i:07d}", {
+            "first_name": f"Name{rng.randint(0, 500)}",
+            "plan": rng.choice(["basic", "premium", "family"]),
+            "city": rng.choice(["Colombo", "Kandy", "Galle", "Jaffna"]),
+        }, rng.choice(["OPT_IN", "OPT_IN", "OPT_IN", "OPT_OUT"]))
+
+
+def _campaign(db, name, segment_id):
+    cursor = db.execute(
+        """INSERT INTO campaigns (name, topic_id, template_id, schedule, status, segment_id)
+        VALUES (?, 1, 1, '{}', 'SCHEDULED', ?)""",
+        (name, segment_id)
+    )
+    db.commit()
+    return Campaign.get_by_id(cursor.lastrowid)
+
+
+def _time(label, run):
+    started = time.perf_counter()
+    count = run()
+    elapsed = time.perf_counter() - started
+    print(f"{label:<34} {count:>10} {elapsed * 1000:>12.1f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--users", type=int, default=1000000)
+    parser.add_argument("--changes", type=int, default=1000)
+    parser.add_argument("--page-size", type=int, default=1000)
+    args = parser.parse_args()
+
+    workdir = tempfile.TemporaryDirectory(prefix="bench_audience_snapshot_")
+    app = Flask(__name__)
+    app.config.update(DATABASE_PATH=os.path.join(workdir.name, "bench.db"))
+    app.teardown_appcontext(close_db)
+
+    with app.app_context():
+        # Silence schema initialisation output
+        with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+            db = get_db()
+        User.bulk_upsert(_users(args.users), batch_size=10000)
+        db.execute("INSERT INTO subscriptions (phone_number, topic_id) SELECT phone_number, 1 FROM users WHERE rowid % 5 != 0")
+        db.execute("INSERT INTO templates (locale, placeholders) VALUES ('en_US', '{}')")
+        db.commit()
+        materialised = Segment(segment="bench", definition=DEFINITION).save()
+        inline = Segment(segment="bench_inline", definition=DEFINITION).save()
+        inline.is_active = False
+        inline.save()
+
+        def walk(campaign):
+            return lambda: sum(1 for _ in AudienceService.iter_recipients(campaign, args.page_size))
+
+        print(f"{'strategy':<34} {'recipients':>10} {'ms':>12}")
+        _time("live walk, inline segment", walk(_campaign(db, "inline", inline.segment_id)))
+        _time("live walk, materialised segment", walk(_campaign(db, "live", materialised.segment_id)))
+
+        campaign = _campaign(db, "frozen", materialised.segment_id)
+        _time("freeze (at schedule time)", lambda: AudienceService.freeze(campaign))
+        # The refresh only sees writes from the second after the freeze on
+        time.sleep(1.1)
+        changed = [f"+9477{i:07d}" for i in random.Random(11).sample(range(args.users), args.changes)]
+        db.executemany(
+            "UPDATE users SET consent_state = 'OPT_OUT' WHERE phone_number = ?", [(phone,) for phone in changed]
+        )
+        Segment.refresh_members_for(changed)
+        db.commit()
+        _time(f"refresh after {args.changes} user writes", lambda: AudienceService.refresh(campaign))
+        _time("snapshot walk (at launch)", walk(campaign))
+
+    workdir.cleanup()
+
+
+if __name__ == "__main__":
+    main()
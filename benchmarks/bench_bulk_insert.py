@@ -0,0 +1,109 @@
+#!/usr/bin/env python3
+"""
+Benchmark: rows/sec writing campaign messages, row-by-row vs Message.bulk_insert.
+
+Row-by-row is the old materialisation path (one INSERT and one commit per
+message); bulk_insert uses executemany with one transaction per batch. Runs
+against a throwaway SQLite database created from the app's schema.
+
+    python benchmarks/bench_bulk_insert.py --sizes 10000,100000,1000000
+"""
+import argparse
+import contextlib
+import os
+import sys
+import tempfile
+import time
+
+# Add the parent directory to Python path to find the app package
+parent_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if parent_dir not in sys.path:
+    sys.path.insert(0, parent_dir)
+
+from flask import Flask
+
+from app.database.connection import close_db, get_db
+from app.models.message import Message
+
+
+def _messages(campaign_id, count):
+    for i in range(count):
+        yield Message(
+            campaign_id=campaign_id,
+            phone_number=f"+9477{i:07d}",
+            template_id=1,
+            body=f"Hi user {i}, your plan renews soon.",
+            provider_message_sid=Message.PENDING_SID
+        )
+
+
+def _new_campaign(db, name):
+    cursor = db.execute(
+        "INSERT INTO campaigns (name, topic_id, template_id, schedule) VALUES (?, 1, 1, '{}')",
+        (name,)
+    )
+    db.commit()
+    return cursor.lastrowid
+
+
+def _row_by_row(campaign_id, count):
+    for message in _messages(campaign_id, count):
+        message.save()
+
+
+def _bulk(campaign_id, count, batch_size):
+    ids = Message.bulk_insert(_messages(campaign_id, count), batch_size=batch_size)
+    stored = get_db().execute(
+        "SELECT MIN(message_id), MAX(message_id), COUNT(*) FROM messages WHERE campaign_id = ?",
+        (campaign_id,)
+    ).fetchone()
+    assert (ids[0], ids[-1], len(ids)) == tuple(stored), "returned ids do not match the stored rows"
+
+
+def _time(label, count, run):
+    started = time.perf_counter()
+    run()
+    elapsed = time.perf_counter() - started
+    print(f"{label:<26} {count:>10} {elapsed:>10.2f} {count / elapsed:>12.0f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--sizes", default="10000,100000,1000000")
+    parser.add_argument("--batch-size", type=int, default=1000)
+    parser.add_argument("--row-by-row-max", type=int, default=10000,
+                        help="skip the row-by-row run above this size (it is very slow)")
+    args = parser.parse_args()
+    sizes = [int(size) for size in args.sizes.split(",")]
+
+    workdir = tempfile.TemporaryDirectory(prefix="bench_bulk_insert_")
+    app = Flask(__name__)
+    app.config.update(DATABASE_PATH=os.path.join(workdir.name, "bench.db"))
+    app.teardown_appcontext(close_db)
+
+    with app.app_context():
+        # Silence schema initialisation output
+        with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+            db = get_db()
+        db.execute("INSERT INTO templates (locale, placeholders) VALUES ('en', '[\"Hi {{ first_name }}\"]')")
+        # messages.phone_number references users, so create every recipient up front
+        db.executemany(
+            "INSERT INTO users (phone_number) VALUES (?)",
+            ((f"+9477{i:07d}",) for i in range(max(sizes)))
+        )
+        db.commit()
+
+        print(f"{'strategy':<26} {'rows':>10} {'seconds':>10} {'rows/sec':>12}")
+        for run, count in enumerate(sizes):
+            if count <= args.row_by_row_max:
+                campaign_id = _new_campaign(db, f"row-by-row-{run}")
+                _time("row-by-row save()", count, lambda: _row_by_row(campaign_id, count))
+            campaign_id = _new_campaign(db, f"bulk-{run}")
+            _time(f"bulk_insert (batch {args.batch_size})", count,
+                  lambda: _bulk(campaign_id, count, args.batch_size))
+
+    workdir.cleanup()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,127 @@
+#!/usr/bin/env python3
+"""
+Benchmark: campaign listing with stats, a status read per campaign vs one paged aggregate.
+
+The old get_campaigns_with_stats loaded every campaign and ran
+get_campaign_status for each of them. The paged path reads one page of
+campaigns joined to their campaign_stats counters in a single query; the
+cached path serves the same page again while nothing has changed. Each
+listing is timed as the campaign history grows.
+Runs against a throwaway SQLite database created from the app's schema.
+
+    python benchmarks/bench_campaign_list.py --campaigns 100,1000,10000
+"""
+import argparse
+import contextlib
+import os
+import random
+import sys
+import tempfile
+import time
+
+# Add the parent directory to Python path to find the app package
+parent_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if parent_dir not in sys.path:
+    sys.path.insert(0, parent_dir)
+
+from flask import Flask
+
+from app.database.connection import close_db, get_db
+from app.models.campaign import Campaign
+from app.models.message import Message
+from app.services.campaign_service import CampaignService
+
+STATES = ['SENT', 'DELIVERED', 'FAILED', 'UNDLVD']
+
+
+def _add_campaigns(db, first, count, messages, rng):
+    for i in range(first, first + count):
+        cursor = db.execute(
+            "INSERT INTO campaigns (name, topic_id, template_id, schedule, status) VALUES (?, 1, 1, '{}', 'COMPLETED')",
+            (f"campaign {i}",)
+        )
+        db.commit()
+        Message.bulk_insert((Message(
+            campaign_id=cursor.lastrowid,
+            phone_number=f"+9477{n:07d}",
+            template_id=1,
+            body="Hi, your plan renews soon.",
+            state=rng.choice(STATES),
+            provider_message_sid=f"SM{i:06d}{n:05d}"
+        ) for n in range(messages)), batch_size=messages)
+
+
+def _status_per_campaign():
+    # get_campaigns_with_stats as it was
+    result = []
+    for campaign in Campaign.get_all():
+        stats = CampaignService.get_campaign_status(campaign.campaign_id)
+        campaign_data = campaign.to_dict()
+        campaign_data['message_stats'] = {
+            'total': stats['total'],
+            'sent': stats['counts']['SENT'],
+            'failed': stats['counts']['FAILED'],
+            'delivered': stats['counts']['DELIVERED']
+        }
+        result.append(campaign_data)
+    return result
+
+
+def _time(label, campaigns, run, repeat=1):
+    started = time.perf_counter()
+    for _ in range(repeat):
+        run()
+    elapsed = (time.perf_counter() - started) / repeat
+    print(f"{label:<34} {campaigns:>10} {elapsed * 1000:>12.2f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--campaigns", default="100,1000,10000", help="comma-separated campaign counts")
+    parser.add_argument("--messages", type=int, default=50, help="messages per campaign")
+    parser.add_argument("--page-size", type=int, default=50)
+    parser.add_argument("--repeat", type=int, default=20, help="page reads averaged per strategy")
+    args = parser.parse_args()
+    sizes = sorted(int(size) for size in args.campaigns.split(","))
+
+    workdir = tempfile.TemporaryDirectory(prefix="bench_campaign_list_")
+    app = Flask(__name__)
+    app.config.update(DATABASE_PATH=os.path.join(workdir.name, "bench.db"), CAMPAIGN_LIST_CACHE_SECONDS=60)
+    app.teardown_appcontext(close_db)
+
+    with app.app_context():
+        # Silence schema initialisation output
+        with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+            db = get_db()
+        db.execute("INSERT INTO templates (locale, placeholders) VALUES ('en', '[]')")
+        # messages.phone_number references users
+        db.executemany("INSERT INTO users (phone_number) VALUES (?)",
+                       ((f"+9477{n:07d}",) for n in range(args.messages)))
+        db.commit()
+
+        def uncached():
+            CampaignService._listing_cache.clear()
+            return CampaignService.get_campaigns_with_stats(args.page_size)
+
+        rng = random.Random(5)
+        print(f"{'strategy':<34} {'campaigns':>10} {'ms':>12}")
+        created = 0
+        for size in sizes:
+            _add_campaigns(db, created, size - created, args.messages, rng)
+            created = size
+
+            _time("status per campaign (all)", size, _status_per_campaign)
+            _time(f"paged aggregate (first {args.page_size})", size, uncached, args.repeat)
+            page, _ = CampaignService.get_campaigns_with_stats(args.page_size)
+            _time("paged aggregate, cached", size,
+                  lambda: CampaignService.get_campaigns_with_stats(args.page_size), args.repeat)
+
+            expected = {c['campaign_id']: c['message_stats'] for c in _status_per_campaign()}
+            assert all(expected[c['campaign_id']] == c['message_stats'] for c in page), \
+                "paged stats disagree with get_campaign_status"
+
+    workdir.cleanup()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,160 @@
+#!/usr/bin/env python3
+"""
+Benchmark: campaign status reads, per-state COUNT queries vs campaign_stats counters.
+
+The old get_campaign_status ran a COUNT for the total, one COUNT per state
+and fetched every FAILED row. The counter path reads the campaign's
+campaign_stats rows, kept in the message write transactions (per insert
+batch by Message.bulk_insert, per state change by triggers); their cost is
+measured as insert and state-change time with and without them. The
+rebuild is the GROUP BY state repair.
+Runs against a throwaway SQLite database created from the app's schema.
+
+    python benchmarks/bench_campaign_status.py --messages 1000000
+"""
+import argparse
+import contextlib
+import os
+import random
+import sys
+import tempfile
+import time
+from itertools import islice
+
+# Add the parent directory to Python path to find the app package
+parent_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if parent_dir not in sys.path:
+    sys.path.insert(0, parent_dir)
+
+from flask import Flask
+
+from app.database.connection import close_db, get_db
+from app.models.campaign import Campaign
+from app.models.message import Message
+from app.services.campaign_service import CampaignService
+
+STATES = ['QUEUED', 'SENDING', 'SENT', 'DELIVERED', 'FAILED', 'UNDLVD']
+
+
+def _messages(campaign_id, count):
+    for i in range(count):
+        yield Message(
+            campaign_id=campaign_id,
+            phone_number=f"+9477{i:07d}",
+            template_id=1,
+            body=f"Hi user {i}, your plan renews soon.",
+            provider_message_sid=Message.PENDING_SID
+        )
+
+
+def _new_campaign(db, name):
+    cursor = db.execute(
+        "INSERT INTO campaigns (name, topic_id, template_id, schedule) VALUES (?, 1, 1, '{}')",
+        (name,)
+    )
+    db.commit()
+    return cursor.lastrowid
+
+
+def _insert_uncounted(db, campaign_id, count, batch_size=1000):
+    """bulk_insert without the campaign_stats upsert"""
+    messages = _messages(campaign_id, count)
+    while True:
+        batch = list(islice(messages, batch_size))
+        if not batch:
+            return
+        db.execute("BEGIN IMMEDIATE")
+        db.executemany(Message._INSERT_SQL, [message._insert_params() for message in batch])
+        db.commit()
+
+
+def _settle(db, campaign_id, seed=3):
+    """Move every message to a final-looking state, one UPDATE per message as the senders do"""
+    rng = random.Random(seed)
+    ids = [row[0] for row in db.execute("SELECT message_id FROM messages WHERE campaign_id = ?", (campaign_id,))]
+    for i in range(0, len(ids), 1000):
+        db.executemany(
+            "UPDATE messages SET state = ?, error_code = ? WHERE message_id = ?",
+            [(state, '63016' if state == 'FAILED' else None, message_id)
+             for message_id, state in ((message_id, rng.choice(STATES[2:])) for message_id in ids[i:i + 1000])]
+        )
+        db.commit()
+
+
+def _counting_status(db, campaign_id):
+    # get_campaign_status as it was
+    total = db.execute("SELECT COUNT(*) as cnt FROM messages WHERE campaign_id=?", (campaign_id,)).fetchone()['cnt']
+    counts = {}
+    for state in STATES:
+        counts[state] = db.execute(
+            "SELECT COUNT(*) as cnt FROM messages WHERE campaign_id=? AND state=?", (campaign_id, state)
+        ).fetchone()['cnt']
+    failed = db.execute(
+        "SELECT phone_number, error_code FROM messages WHERE campaign_id=? AND state='FAILED'", (campaign_id,)
+    ).fetchall()
+    return total, counts, len(failed)
+
+
+def _time(label, count, run, repeat=1):
+    started = time.perf_counter()
+    for _ in range(repeat):
+        result = run()
+    elapsed = (time.perf_counter() - started) / repeat
+    print(f"{label:<34} {count:>10} {elapsed * 1000:>12.2f}")
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--messages", type=int, default=1000000)
+    parser.add_argument("--repeat", type=int, default=20, help="status reads averaged per strategy")
+    args = parser.parse_args()
+
+    workdir = tempfile.TemporaryDirectory(prefix="bench_campaign_status_")
+    app = Flask(__name__)
+    app.config.update(DATABASE_PATH=os.path.join(workdir.name, "bench.db"))
+    app.teardown_appcontext(close_db)
+
+    with app.app_context():
+        # Silence schema initialisation output
+        with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+            db = get_db()
+        db.execute("INSERT INTO templates (locale, placeholders) VALUES ('en', '[\"Hi {{ first_name }}\"]')")
+        # messages.phone_number references users, so create every recipient up front
+        db.executemany("INSERT INTO users (phone_number) VALUES (?)",
+                       ((f"+9477{i:07d}",) for i in range(args.messages)))
+        db.commit()
+
+        triggers = {name: sql for name, sql in db.execute(
+            "SELECT name, sql FROM sqlite_master WHERE type = 'trigger' AND name LIKE 'trg_messages_stats_%'")}
+
+        print(f"{'strategy':<34} {'messages':>10} {'ms':>12}")
+        for counters in (False, True):
+            if not counters:
+                for name in triggers:
+                    db.execute(f"DROP TRIGGER {name}")
+            else:
+                for sql in triggers.values():
+                    db.execute(sql)
+            db.commit()
+            label = "with counters" if counters else "no counters"
+            campaign_id = _new_campaign(db, label)
+            if counters:
+                _time(f"bulk_insert, {label}", args.messages,
+                      lambda: Message.bulk_insert(_messages(campaign_id, args.messages), batch_size=1000))
+            else:
+                _time(f"bulk_insert, {label}", args.messages, lambda: _insert_uncounted(db, campaign_id, args.messages))
+            _time(f"state updates, {label}", args.messages, lambda: _settle(db, campaign_id))
+
+        total, counts, _ = _time("status, COUNT per state", args.messages,
+                                 lambda: _counting_status(db, campaign_id), args.repeat)
+        status = _time("status, campaign_stats", args.messages,
+                       lambda: CampaignService.get_campaign_status(campaign_id), args.repeat)
+        assert (status['total'], status['counts']) == (total, counts), "counters disagree with COUNT(*)"
+        _time("rebuild (GROUP BY state)", args.messages, lambda: Campaign.rebuild_stats(campaign_id))
+
+    workdir.cleanup()
+
+
+if __name__ == "__main__":
+    main()
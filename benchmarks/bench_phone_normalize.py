@@ -0,0 +1,82 @@
+#!/usr/bin/env python3
+"""
+Benchmark: phone numbers/sec, normalize_phone + validate_e164 vs normalize_and_validate.
+
+The old path parses every number twice with phonenumbers.parse; the new one
+validates already-E.164 input without the parser and memoises results. The
+input mixes E.164 numbers, formatted numbers ("+1 415 555 0100") and repeats,
+like a typical import file.
+
+    python benchmarks/bench_phone_normalize.py --numbers 100000 --repeat 0.3
+"""
+import argparse
+import os
+import random
+import sys
+import time
+
+# Add the parent directory to Python path to find the app package
+parent_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if parent_dir not in sys.path:
+    sys.path.insert(0, parent_dir)
+
+import phonenumbers
+
+from app.utils import phone_utils
+
+
+def _numbers(count, repeat, seed=7):
+    rng = random.Random(seed)
+    numbers = []
+    for i in range(count):
+        if numbers and rng.random() < repeat:
+            numbers.append(rng.choice(numbers))
+        elif i % 4 == 0:
+            numbers.append(f"+1 415 {rng.randint(200, 999)} {rng.randint(0, 9999):04d}")
+        else:
+            numbers.append(f"+9477{rng.randint(0, 9999999):07d}")
+    return numbers
+
+
+def _parse_twice(phone):
+    # normalize_phone + validate_e164 as they were: two parses per number
+    try:
+        normalized = phonenumbers.format_number(phonenumbers.parse(phone, None), phonenumbers.PhoneNumberFormat.E164)
+    except Exception:
+        normalized = phone
+    try:
+        return normalized, phonenumbers.is_valid_number(phonenumbers.parse(normalized, None))
+    except Exception:
+        return normalized, False
+
+
+def _time(label, count, run):
+    started = time.perf_counter()
+    results = run()
+    elapsed = time.perf_counter() - started
+    print(f"{label:<34} {elapsed:>8.2f}s {count / elapsed:>12.0f}/s")
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--numbers", type=int, default=100000)
+    parser.add_argument("--repeat", type=float, default=0.3, help="fraction of numbers that repeat an earlier one")
+    args = parser.parse_args()
+
+    numbers = _numbers(args.numbers, args.repeat)
+    expected = _time("parse twice", len(numbers), lambda: [_parse_twice(phone) for phone in numbers])
+
+    phone_utils._normalize_and_validate.cache_clear()
+    single = _time("normalize_and_validate", len(numbers),
+                   lambda: [phone_utils.normalize_and_validate(phone) for phone in numbers])
+
+    phone_utils._normalize_and_validate.cache_clear()
+    batch = _time("normalize_and_validate_many", len(numbers),
+                  lambda: phone_utils.normalize_and_validate_many(numbers))
+
+    assert single == expected and batch == expected, "results differ from the parser"
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,102 @@
+#!/usr/bin/env python3
+"""
+Benchmark: ad-hoc segment counts, SQL COUNT vs the attribute bitmap index.
+
+/segments/preview-count answers unsaved definitions while filters are being
+edited. The SQL path compiles the definition with compile_segment and counts
+with json_extract over every user; the bitmap path answers the same
+definition from AttributeBitmapIndex (one bitmap per attribute value, set
+operations on big integers). Also reports the index build time and memory.
+Runs against a throwaway SQLite database created from the app's schema.
+
+    python benchmarks/bench_preview_count.py --users 1000000
+"""
+import argparse
+import contextlib
+import os
+import random
+import sys
+import tempfile
+import time
+
+# Add the parent directory to Python path to find the app package
+parent_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if parent_dir not in sys.path:
+    sys.path.insert(0, parent_dir)
+
+from flask import Flask
+
+from app.database.connection import close_db, get_db
+from app.models.user import User
+from app.utils.attribute_index import AttributeBitmapIndex
+from app.utils.segment_filters import compile_segment
+
+DEFINITIONS = {
+    "plan = premium": {"filters": [
+        {"path": "attributes.plan", "op": "eq", "value": "premium"},
+    ]},
+    "plan and city in": {"filters": [
+        {"path": "attributes.plan", "op": "eq", "value": "premium"},
+        {"path": "attributes.city", "op": "in", "value": ["Kandy", "Galle"]},
+    ]},
+    "age > 40 or not opted": {"filters": [
+        {"or": [
+            {"path": "attributes.age", "op": "gt", "value": 40},
+            {"path": "attributes.newsletter", "op": "neq", "value": True},
+        ]},
+    ]},
+}
+
+
+def _users(count, seed=7):
+    rng = random.Random(seed)
+    for i in range(count):
+        yield (f"+9477{i:07d}", {
+            "first_name": f"Name{rng.randint(0, 500)}",
+            "plan": rng.choice(["basic", "premium", "family"]),
+            "city": rng.choice(["Colombo", "Kandy", "Galle", "Jaffna"]),
+            "age": rng.randint(18, 80),
+            "newsletter": rng.random() < 0.3,
+        }, "OPT_IN")
+
+
+def _time(run):
+    started = time.perf_counter()
+    result = run()
+    return result, (time.perf_counter() - started) * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--users", type=int, default=1000000)
+    args = parser.parse_args()
+
+    workdir = tempfile.TemporaryDirectory(prefix="bench_preview_count_")
+    app = Flask(__name__)
+    app.config.update(DATABASE_PATH=os.path.join(workdir.name, "bench.db"))
+    app.teardown_appcontext(close_db)
+
+    with app.app_context():
+        # Silence schema initialisation output
+        with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+            get_db()
+        User.bulk_upsert(_users(args.users), batch_size=10000)
+
+        index = AttributeBitmapIndex()
+        _, build_ms = _time(lambda: index.build(get_db()))
+        stats = index.stats()
+        print(f"index build: {build_ms / 1000:.1f}s, {stats['memory_bytes'] / 1048576:.1f} MB, "
+              f"{stats['bitmaps']} bitmaps, dropped: {stats['dropped_attributes'] or 'none'}")
+
+        print(f"{'definition':<24} {'members':>10} {'sql ms':>10} {'bitmap ms':>10}")
+        for label, definition in DEFINITIONS.items():
+            sql_count, sql_ms = _time(lambda: User.count_where(*compile_segment(definition)))
+            bitmap_count, bitmap_ms = _time(lambda: index.count(definition))
+            assert sql_count == bitmap_count, (label, sql_count, bitmap_count)
+            print(f"{label:<24} {sql_count:>10} {sql_ms:>10.1f} {bitmap_ms:>10.1f}")
+
+    workdir.cleanup()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,83 @@
+#!/usr/bin/env python3
+"""
+Benchmark: walking a campaign audience, User.get_all() vs User.iter_recipients.
+
+get_all() loads and decodes every user before the first one is returned;
+iter_recipients reads keyset pages on phone_number and yields lightweight
+Recipient records. Reports the time to the first recipient, the total walk
+time and peak Python memory (tracemalloc) for each.
+Runs against a throwaway SQLite database created from the app's schema.
+
+    python benchmarks/bench_recipients.py --users 1000000
+"""
+import argparse
+import contextlib
+import os
+import random
+import sys
+import tempfile
+import time
+import tracemalloc
+
+# Add the parent directory to Python path to find the app package
+parent_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if parent_dir not in sys.path:
+    sys.path.insert(0, parent_dir)
+
+from flask import Flask
+
+from app.database.connection import close_db, get_db
+from app.models.user import User
+
+
+def _users(count, seed=7):
+    rng = random.Random(seed)
+    for i in range(count):
+        yield (f"+9477{i:07d}", {
+            "first_name": f"Name{rng.randint(0, 500)}",
+            "plan": rng.choice(["basic", "premium", "family"]),
+            "city": rng.choice(["Colombo", "Kandy", "Galle", "Jaffna"]),
+        }, "OPT_IN")
+
+
+def _walk(label, recipients_factory):
+    tracemalloc.start()
+    started = time.perf_counter()
+    first = None
+    count = 0
+    for _ in recipients_factory():
+        if first is None:
+            first = time.perf_counter() - started
+        count += 1
+    elapsed = time.perf_counter() - started
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    print(f"{label:<28} {count:>10} {first * 1000:>12.1f} {elapsed:>10.2f} {peak / 1048576:>12.1f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--users", type=int, default=1000000)
+    parser.add_argument("--page-size", type=int, default=1000)
+    args = parser.parse_args()
+
+    workdir = tempfile.TemporaryDirectory(prefix="bench_recipients_")
+    app = Flask(__name__)
+    app.config.update(DATABASE_PATH=os.path.join(workdir.name, "bench.db"))
+    app.teardown_appcontext(close_db)
+
+    with app.app_context():
+        # Silence schema initialisation output
+        with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+            get_db()
+        User.bulk_upsert(_users(args.users), batch_size=10000)
+
+        print(f"{'strategy':<28} {'recipients':>10} {'first ms':>12} {'total s':>10} {'peak MB':>12}")
+        _walk("get_all()", User.get_all)
+        _walk(f"iter_recipients({args.page_size})", lambda: User.iter_recipients(args.page_size))
+
+    workdir.cleanup()
+
+
+if __name__ == "__main__":
+    main()
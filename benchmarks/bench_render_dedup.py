@@ -0,0 +1,66 @@
+#!/usr/bin/env python3
+"""
+Benchmark: render CPU per campaign, one render per recipient vs RenderCache.
+
+Recipients get realistic attribute dicts (a few hundred distinct first
+names plus attributes the template never reads); the template only uses
+first_name and plan, so most recipients share a render.
+
+    python benchmarks/bench_render_dedup.py --recipients 100000 --names 500
+"""
+import argparse
+import os
+import random
+import sys
+import time
+
+# Add the parent directory to Python path to find the app package
+parent_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if parent_dir not in sys.path:
+    sys.path.insert(0, parent_dir)
+
+from app.models.template import Template
+from app.services.template_service import RenderCache, TemplateService
+
+BODY = "Hi {{ first_name }}! You're on our {{ plan | upper }} plan. Reply STOP to opt out."
+
+
+def _recipients(count, names, seed=7):
+    rng = random.Random(seed)
+    first_names = [f"Name{i}" for i in range(names)]
+    for i in range(count):
+        yield {
+            "first_name": rng.choice(first_names),
+            "plan": rng.choice(["basic", "premium", "family"]),
+            "city": rng.choice(["Colombo", "Kandy", "Galle", "Jaffna"]),
+            "customer_id": i,
+        }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--recipients", type=int, default=100000)
+    parser.add_argument("--names", type=int, default=500)
+    args = parser.parse_args()
+
+    template = Template(template_id=1, placeholders=[BODY])
+    recipients = list(_recipients(args.recipients, args.names))
+
+    started = time.perf_counter()
+    for attributes in recipients:
+        TemplateService.render_template(template.placeholders, attributes, template.template_id)
+    per_recipient = time.perf_counter() - started
+
+    renderer = RenderCache(template)
+    started = time.perf_counter()
+    for attributes in recipients:
+        renderer.render(attributes)
+    deduplicated = time.perf_counter() - started
+
+    print(f"variables: {renderer.variables}, distinct renders: {renderer.misses} / {len(recipients)}")
+    print(f"{'render per recipient':<22} {per_recipient:>8.2f}s")
+    print(f"{'render once per group':<22} {deduplicated:>8.2f}s  ({per_recipient / deduplicated:.1f}x)")
+
+
+if __name__ == "__main__":
+    main()
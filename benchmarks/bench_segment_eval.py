@@ -0,0 +1,112 @@
+#!/usr/bin/env python3
+"""
+Benchmark: segment evaluation, Python filtering of every user vs compiled SQL.
+
+The Python path is the old evaluate_segment_members (User.get_all(),
+json.loads per user, filter in Python). The SQL path compiles the same
+definition with compile_segment and lets SQLite filter via json_extract.
+The materialised path reads segment_members, after a one-off rebuild.
+The estimate evaluates a 10k-user rowid sample (?estimate=true).
+Runs against a throwaway SQLite database created from the app's schema.
+
+    python benchmarks/bench_segment_eval.py --users 1000000
+"""
+import argparse
+import contextlib
+import os
+import random
+import sys
+import tempfile
+import time
+
+# Add the parent directory to Python path to find the app package
+parent_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if parent_dir not in sys.path:
+    sys.path.insert(0, parent_dir)
+
+from flask import Flask
+
+from app.database.connection import close_db, get_db
+from app.models.segment import Segment
+from app.models.user import User
+from app.services.segment_service import SegmentService
+from app.utils.segment_filters import compile_segment
+
+DEFINITION = {"filters": [
+    {"path": "attributes.plan", "op": "eq", "value": "premium"},
+    {"path": "attributes.city", "op": "in", "value": ["Kandy", "Galle"]},
+]}
+
+
+def _users(count, seed=7):
+    rng = random.Random(seed)
+    for i in range(count):
+        yield (f"+9477{i:07d}", {
+            "first_name": f"Name{rng.randint(0, 500)}",
+            "plan": rng.choice(["basic", "premium", "family"]),
+            "city": rng.choice(["Colombo", "Kandy", "Galle", "Jaffna"]),
+            "age": rng.randint(18, 80),
+        }, "OPT_IN")
+
+
+def _python_scan():
+    # evaluate_segment_members as it was: load everyone, match in Python
+    matched = []
+    for user in User.get_all():
+        if all(user.attributes.get(f["path"].split(".", 1)[1]) == f["value"] if f["op"] == "eq"
+               else user.attributes.get(f["path"].split(".", 1)[1]) in f["value"]
+               for f in DEFINITION["filters"]):
+            matched.append(user)
+    return len(matched)
+
+
+def _sql_stream():
+    where, params = compile_segment(DEFINITION)
+    return sum(1 for _ in User.iter_where(where, params))
+
+
+def _sql_count():
+    where, params = compile_segment(DEFINITION)
+    return User.count_where(where, params)
+
+
+def _time(label, run):
+    started = time.perf_counter()
+    count = run()
+    elapsed = time.perf_counter() - started
+    print(f"{label:<30} {count:>10} {elapsed * 1000:>12.1f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--users", type=int, default=1000000)
+    args = parser.parse_args()
+
+    workdir = tempfile.TemporaryDirectory(prefix="bench_segment_eval_")
+    app = Flask(__name__)
+    app.config.update(DATABASE_PATH=os.path.join(workdir.name, "bench.db"))
+    app.teardown_appcontext(close_db)
+
+    with app.app_context():
+        # Silence schema initialisation output
+        with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+            get_db()
+        User.bulk_upsert(_users(args.users), batch_size=10000)
+
+        print(f"{'strategy':<30} {'members':>10} {'ms':>12}")
+        _time("python scan (get_all)", _python_scan)
+        _time("compiled SQL, streamed", _sql_stream)
+        _time("compiled SQL, count", _sql_count)
+
+        segment = Segment(segment="bench", definition=DEFINITION)
+        _time("materialised, rebuild", lambda: Segment.member_count(segment.save().segment_id))
+        _time("materialised, streamed", lambda: sum(1 for _ in User.iter_segment(segment.segment_id)))
+        _time("materialised, count", lambda: Segment.member_count(segment.segment_id))
+        _time("sampled estimate (10k)",
+              lambda: SegmentService.estimate_segment_size(segment.segment_id, sample_size=10000)[0]["count"])
+
+    workdir.cleanup()
+
+
+if __name__ == "__main__":
+    main()
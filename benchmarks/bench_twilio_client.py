@@ -0,0 +1,151 @@
+#!/usr/bin/env python3
+"""
+Benchmark: HTTP requests and TCP connections per message sent through Twilio.
+
+Compares the old per-message strategy (new Client + account fetch + send)
+with the shared pooled client from MessagingService. Twilio traffic is
+redirected to a local keep-alive HTTP server that counts requests and
+connections, so no credentials or network access are needed.
+
+    python benchmarks/bench_twilio_client.py --messages 500 --threads 8
+"""
+import argparse
+import contextlib
+import json
+import os
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# Add the parent directory to Python path to find the app package
+parent_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if parent_dir not in sys.path:
+    sys.path.insert(0, parent_dir)
+
+from flask import Flask
+from twilio.http.http_client import TwilioHttpClient
+from twilio.rest import Client
+
+from app.services import providers
+from app.services.messaging_service import MessagingService
+
+SID = "AC" + "0" * 32
+TOKEN = "benchmark-token"
+
+
+class _Counters:
+    lock = threading.Lock()
+    requests = 0
+    connections = 0
+
+    @classmethod
+    def reset(cls):
+        with cls.lock:
+            cls.requests = 0
+            cls.connections = 0
+
+
+class _FakeTwilioHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"  # keep-alive
+
+    def setup(self):
+        super().setup()
+        with _Counters.lock:
+            _Counters.connections += 1
+
+    def _reply(self, status, payload):
+        with _Counters.lock:
+            _Counters.requests += 1
+        body = json.dumps(payload).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        self._reply(200, {"sid": SID, "friendly_name": "bench", "status": "active", "type": "Full"})
+
+    def do_POST(self):
+        length = int(self.headers.get("Content-Length", 0))
+        self.rfile.read(length)
+        self._reply(201, {"sid": "SM" + "1" * 32, "status": "queued", "account_sid": SID})
+
+    def log_message(self, *args):
+        pass
+
+
+def _local_http_client_class(base_url):
+    class LocalTwilioHttpClient(TwilioHttpClient):
+        """Routes Twilio API calls to the local counting server"""
+
+        def __init__(self, *args, **kwargs):
+            super().__init__(*args, **kwargs)
+            # The app mounts its pool on https://; mirror it for the plain-HTTP test server
+            self.session.mount("http://", self.session.get_adapter("https://"))
+
+        def request(self, method, url, *args, **kwargs):
+            url = url.replace("https://api.twilio.com", base_url)
+            return super().request(method, url, *args, **kwargs)
+
+    return LocalTwilioHttpClient
+
+
+def _send_old(http_client_class, to):
+    """The previous behaviour: a fresh client and a credential check per message"""
+    client = Client(SID, TOKEN, http_client=http_client_class(pool_connections=True))
+    client.api.accounts(SID).fetch()
+    client.messages.create(body="hi", from_="whatsapp:+14155238886", to=to)
+
+
+def _run(label, send, messages, threads):
+    _Counters.reset()
+    recipients = [f"whatsapp:+9477{i:07d}" for i in range(messages)]
+    started = time.perf_counter()
+    # Silence the per-message logging of the send path
+    with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+        with ThreadPoolExecutor(max_workers=threads) as pool:
+            list(pool.map(send, recipients))
+    elapsed = time.perf_counter() - started
+    print(f"{label:<22} {messages:>8} {_Counters.requests / messages:>10.2f} "
+          f"{_Counters.connections / messages:>12.3f} {messages / elapsed:>10.1f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--messages", type=int, default=500)
+    parser.add_argument("--threads", type=int, default=8)
+    args = parser.parse_args()
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), _FakeTwilioHandler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    base_url = f"http://127.0.0.1:{server.server_address[1]}"
+    http_client_class = _local_http_client_class(base_url)
+
+    app = Flask(__name__)
+    app.config.update(
+        TWILIO_ACCOUNT_SID=SID,
+        TWILIO_AUTH_TOKEN=TOKEN,
+        TWILIO_WHATSAPP_FROM="whatsapp:+14155238886",
+        VERIFIED_NUMBERS=[],
+        SEND_CONCURRENCY=args.threads,
+    )
+    # Route the app's pooled client to the local server as well
+    providers.TwilioHttpClient = http_client_class
+
+    def send_new(to):
+        with app.app_context():
+            MessagingService.send_whatsapp_message(to, "hi")
+
+    print(f"{'strategy':<22} {'messages':>8} {'req/msg':>10} {'conns/msg':>12} {'msg/s':>10}")
+    _run("per-message client", lambda to: _send_old(http_client_class, to), args.messages, args.threads)
+    _run("shared pooled client", send_new, args.messages, args.threads)
+
+    server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
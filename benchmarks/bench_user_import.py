@@ -0,0 +1,103 @@
+#!/usr/bin/env python3
+"""
+Benchmark: rows/sec importing users, per-row create_or_update vs the streaming importer.
+
+Per-row is the old /users/bulk loop (get_by_phone, then create_or_update:
+four queries and a commit per row). The streaming importer reads the CSV
+incrementally and upserts a batch per transaction. The file is imported
+twice, so the second run measures updates. Runs against a throwaway SQLite
+database created from the app's schema.
+
+    python benchmarks/bench_user_import.py --rows 1000000
+"""
+import argparse
+import contextlib
+import csv
+import json
+import os
+import random
+import sys
+import tempfile
+import time
+
+# Add the parent directory to Python path to find the app package
+parent_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if parent_dir not in sys.path:
+    sys.path.insert(0, parent_dir)
+
+from flask import Flask
+
+from app.database.connection import close_db, get_db
+from app.models.user import User
+from app.services.user_import_service import UserImportService
+
+
+def _write_csv(path, rows, invalid=0.01, seed=7):
+    rng = random.Random(seed)
+    with open(path, "w", newline="") as f:
+        writer = csv.writer(f)
+        writer.writerow(["phone", "attributes", "consent"])
+        for i in range(rows):
+            phone = "not-a-number" if rng.random() < invalid else f"+9477{i:07d}"
+            attributes = {"first_name": f"Name{rng.randint(0, 500)}", "plan": rng.choice(["basic", "premium"])}
+            writer.writerow([phone, json.dumps(attributes), json.dumps({"whatsapp": rng.random() < 0.9})])
+
+
+def _per_row(path, limit):
+    with open(path, "rb") as f:
+        for count, (_, phone, attrs, consent) in enumerate(UserImportService.read_csv(f)):
+            if count >= limit:
+                break
+            try:
+                User.get_by_phone(phone)
+                User.create_or_update(phone, attrs, consent)
+            except ValueError:
+                pass
+    return limit
+
+
+def _streaming(path, batch_size):
+    with open(path, "rb") as f:
+        counts = UserImportService.import_users(UserImportService.read_csv(f), batch_size=batch_size)
+    return sum(counts.values()), counts
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--rows", type=int, default=1000000)
+    parser.add_argument("--batch-size", type=int, default=5000)
+    parser.add_argument("--per-row", type=int, default=5000, help="rows to time through the per-row path")
+    args = parser.parse_args()
+
+    workdir = tempfile.TemporaryDirectory(prefix="bench_user_import_")
+    path = os.path.join(workdir.name, "users.csv")
+    _write_csv(path, args.rows)
+
+    app = Flask(__name__)
+    app.config.update(DATABASE_PATH=os.path.join(workdir.name, "bench.db"))
+    app.teardown_appcontext(close_db)
+
+    with app.app_context():
+        # Silence schema initialisation output
+        with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+            db = get_db()
+
+        print(f"{'strategy':<26} {'rows':>10} {'seconds':>10} {'rows/sec':>12}")
+        started = time.perf_counter()
+        count = _per_row(path, args.per_row)
+        elapsed = time.perf_counter() - started
+        print(f"{'per-row create_or_update':<26} {count:>10} {elapsed:>10.2f} {count / elapsed:>12.0f}")
+        db.execute("DELETE FROM users")
+        db.commit()
+
+        for label in ("streaming (insert)", "streaming (update)"):
+            started = time.perf_counter()
+            count, counts = _streaming(path, args.batch_size)
+            elapsed = time.perf_counter() - started
+            print(f"{label:<26} {count:>10} {elapsed:>10.2f} {count / elapsed:>12.0f}  {counts}")
+
+    workdir.cleanup()
+
+
+if __name__ == "__main__":
+    main()
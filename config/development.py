@@ -49,14 +49,56 @@ class DevelopmentConfig:
             whatsapp_from = f"whatsapp:{whatsapp_from}"
         self.TWILIO_WHATSAPP_FROM = whatsapp_from
         self.TWILIO_VALIDATE_WEBHOOKS = bool(self.config.get("TWILIO_VALIDATE_WEBHOOKS", False))
+        self.STATUS_CALLBACK_URL = self.config.get("STATUS_CALLBACK_URL", "")
+
+        # ---------- Messaging provider ----------
+        # "twilio" (default) or "fake" for offline load/latency testing
+        self.MESSAGING_PROVIDER = str(self.config.get("MESSAGING_PROVIDER", "twilio")).lower()
+        self.FAKE_PROVIDER = self.config.get("FAKE_PROVIDER", {}) or {}
 
         # ---------- Default values ----------
         self.DEFAULT_RATE_LIMIT = int(self.config.get("DEFAULT_RATE_LIMIT", 1))
+        self.SEND_CONCURRENCY = int(self.config.get("SEND_CONCURRENCY", 8))
+        self.OUTBOX_BATCH_SIZE = int(self.config.get("OUTBOX_BATCH_SIZE", 100))
+        self.OUTBOX_LEASE_SECONDS = int(self.config.get("OUTBOX_LEASE_SECONDS", 60))
+        self.RECIPIENT_PAGE_SIZE = int(self.config.get("RECIPIENT_PAGE_SIZE", 1000))
+        self.SEND_MAX_ATTEMPTS = int(self.config.get("SEND_MAX_ATTEMPTS", 5))
+        self.RETRY_BASE_DELAY = float(self.config.get("RETRY_BASE_DELAY", 2))
+        self.RETRY_MAX_DELAY = float(self.config.get("RETRY_MAX_DELAY", 600))
+
+        # ---------- Templates ----------
+        self.TEMPLATE_CACHE_SIZE = int(self.config.get("TEMPLATE_CACHE_SIZE", 256))
+        bytecode_dir = self.config.get("TEMPLATE_BYTECODE_CACHE_DIR", "")
+        if bytecode_dir and not os.path.isabs(bytecode_dir):
+            bytecode_dir = os.path.join(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")), bytecode_dir)
+        self.TEMPLATE_BYTECODE_CACHE_DIR = bytecode_dir
         self.DEFAULT_CREATED_BY = self.config.get("DEFAULT_CREATED_BY", "system")
-        self.DEFAULT_QUIET_START = self.config.get("DEFAULT_QUIET_START", "22:00")
-        self.DEFAULT_QUIET_END = self.config.get("DEFAULT_QUIET_END", "08:00")
+        # Quiet hours apply in each recipient's timezone ("HH:MM" or an hour)
+        quiet_hours = self.config.get("DEFAULT_QUIET_HOURS", {}) or {}
+        self.DEFAULT_QUIET_START = self.config.get("DEFAULT_QUIET_START", quiet_hours.get("START", "22:00"))
+        self.DEFAULT_QUIET_END = self.config.get("DEFAULT_QUIET_END", quiet_hours.get("END", "08:00"))
+
+        # ---------- User imports ----------
+        self.USER_IMPORT_BATCH_SIZE = int(self.config.get("USER_IMPORT_BATCH_SIZE", 5000))
+        self.IMPORT_CONCURRENCY = int(self.config.get("IMPORT_CONCURRENCY", 2))
+        spool_dir = self.config.get("IMPORT_SPOOL_DIR", "db/imports")
+        if spool_dir and not os.path.isabs(spool_dir):
+            spool_dir = os.path.join(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")), spool_dir)
+        self.IMPORT_SPOOL_DIR = spool_dir
+
+        # ---------- Segments ----------
+        self.ATTRIBUTE_INDEX_ENABLED = bool(self.config.get("ATTRIBUTE_INDEX_ENABLED", False))
+        self.ATTRIBUTE_INDEX_MAX_MB = float(self.config.get("ATTRIBUTE_INDEX_MAX_MB", 256))
+        self.ATTRIBUTE_INDEX_MAX_VALUES = int(self.config.get("ATTRIBUTE_INDEX_MAX_VALUES", 1000))
+        self.SEGMENT_ESTIMATE_SAMPLE_SIZE = int(self.config.get("SEGMENT_ESTIMATE_SAMPLE_SIZE", 10000))
         self.VERIFIED_NUMBERS = self.config.get("VERIFIED_NUMBERS", [])
 
+        # ---------- Campaigns ----------
+        self.AUDIENCE_SNAPSHOT_ENABLED = bool(self.config.get("AUDIENCE_SNAPSHOT_ENABLED", False))
+        self.AUDIENCE_SNAPSHOT_REFRESH_SECONDS = float(self.config.get("AUDIENCE_SNAPSHOT_REFRESH_SECONDS", 300))
+        self.CAMPAIGN_LIST_CACHE_SECONDS = float(self.config.get("CAMPAIGN_LIST_CACHE_SECONDS", 5))
+        self.SCHEDULE_RETRY_SECONDS = float(self.config.get("SCHEDULE_RETRY_SECONDS", 300))
+
         # Optional: short masked summary for debug visibility
         def _mask(v):
             if not v:
@@ -34,14 +34,57 @@ class ProductionConfig:
         # Webhook & security
         # ---------------------------
         self.TWILIO_VALIDATE_WEBHOOKS = True  # always True in production
+        self.STATUS_CALLBACK_URL = self.cfg.get("STATUS_CALLBACK_URL", "")
+
+        # ---------------------------
+        # Messaging provider
+        # ---------------------------
+        self.MESSAGING_PROVIDER = str(self.cfg.get("MESSAGING_PROVIDER", "twilio")).lower()
+        self.FAKE_PROVIDER = self.cfg.get("FAKE_PROVIDER", {}) or {}
 
         # ---------------------------
         # Rate limiting & quiet hours
         # ---------------------------
         self.DEFAULT_RATE_LIMIT = int(self.cfg.get("DEFAULT_RATE_LIMIT", 5))
+        self.SEND_CONCURRENCY = int(self.cfg.get("SEND_CONCURRENCY", 8))
+        self.OUTBOX_BATCH_SIZE = int(self.cfg.get("OUTBOX_BATCH_SIZE", 100))
+        self.OUTBOX_LEASE_SECONDS = int(self.cfg.get("OUTBOX_LEASE_SECONDS", 60))
+        self.RECIPIENT_PAGE_SIZE = int(self.cfg.get("RECIPIENT_PAGE_SIZE", 1000))
+        self.SEND_MAX_ATTEMPTS = int(self.cfg.get("SEND_MAX_ATTEMPTS", 5))
+        self.RETRY_BASE_DELAY = float(self.cfg.get("RETRY_BASE_DELAY", 2))
+        self.RETRY_MAX_DELAY = float(self.cfg.get("RETRY_MAX_DELAY", 600))
+
+        # ---------------------------
+        # Templates
+        # ---------------------------
+        self.TEMPLATE_CACHE_SIZE = int(self.cfg.get("TEMPLATE_CACHE_SIZE", 256))
+        self.TEMPLATE_BYTECODE_CACHE_DIR = self.cfg.get("TEMPLATE_BYTECODE_CACHE_DIR", "")
         self.DEFAULT_QUIET_START = int(self.cfg.get("DEFAULT_QUIET_START", 21))
         self.DEFAULT_QUIET_END = int(self.cfg.get("DEFAULT_QUIET_END", 9))
 
+        # ---------------------------
+        # User imports
+        # ---------------------------
+        self.USER_IMPORT_BATCH_SIZE = int(self.cfg.get("USER_IMPORT_BATCH_SIZE", 5000))
+        self.IMPORT_CONCURRENCY = int(self.cfg.get("IMPORT_CONCURRENCY", 2))
+        self.IMPORT_SPOOL_DIR = self.cfg.get("IMPORT_SPOOL_DIR", "db/imports")
+
+        # ---------------------------
+        # Segments
+        # ---------------------------
+        self.ATTRIBUTE_INDEX_ENABLED = bool(self.cfg.get("ATTRIBUTE_INDEX_ENABLED", False))
+        self.ATTRIBUTE_INDEX_MAX_MB = float(self.cfg.get("ATTRIBUTE_INDEX_MAX_MB", 256))
+        self.ATTRIBUTE_INDEX_MAX_VALUES = int(self.cfg.get("ATTRIBUTE_INDEX_MAX_VALUES", 1000))
+        self.SEGMENT_ESTIMATE_SAMPLE_SIZE = int(self.cfg.get("SEGMENT_ESTIMATE_SAMPLE_SIZE", 10000))
+
+        # ---------------------------
+        # Campaigns
+        # ---------------------------
+        self.AUDIENCE_SNAPSHOT_ENABLED = bool(self.cfg.get("AUDIENCE_SNAPSHOT_ENABLED", False))
+        self.AUDIENCE_SNAPSHOT_REFRESH_SECONDS = float(self.cfg.get("AUDIENCE_SNAPSHOT_REFRESH_SECONDS", 300))
+        self.CAMPAIGN_LIST_CACHE_SECONDS = float(self.cfg.get("CAMPAIGN_LIST_CACHE_SECONDS", 5))
+        self.SCHEDULE_RETRY_SECONDS = float(self.cfg.get("SCHEDULE_RETRY_SECONDS", 300))
+
         # ---------------------------
         # Verified numbers & default user
         # ---------------------------
@@ -82,6 +125,7 @@ SECRET KEY LIKE
   "TWILIO_AUTH_TOKEN": "xxxxxxxxxxxxxxxxxxxxx",
   "TWILIO_WHATSAPP_FROM": "whatsapp:+14155238886",
   "DEFAULT_RATE_LIMIT": 10,
+  "SEND_CONCURRENCY": 8,
   "DEFAULT_QUIET_START": 22,
   "DEFAULT_QUIET_END": 8,
   "VERIFIED_NUMBERS": "+94771234567,+94775555555",
@@ -44,7 +44,7 @@ def init_database():
         print("SUCCESS: Database schema initialized successfully!")
         
         # Verify tables were created
-        tables = ['users', 'topics', 'templates', 'segments', 'campaigns', 'messages', 'events_inbound', 'delivery_receipts']
+        tables = ['users', 'topics', 'templates', 'segments', 'segment_members', 'campaigns', 'campaign_audience', 'messages', 'campaign_stats', 'campaigns_version', 'messages_dead_letter', 'events_inbound', 'delivery_receipts', 'import_jobs']
         success_count = 0
         
         for table in tables:
@@ -7,7 +7,9 @@ CREATE TABLE users (
     consent_state ENUM('PENDING','OPT_IN','OPT_OUT') DEFAULT 'PENDING',
     created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
     updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP,
-    is_active BOOLEAN DEFAULT TRUE
+    is_active BOOLEAN DEFAULT TRUE,
+    INDEX idx_users_consent (consent_state),
+    INDEX idx_users_updated (updated_at)
 );
 
 /*
@@ -32,7 +34,9 @@ CREATE TABLE subscriptions (
     unsubscribed_at TIMESTAMP DEFAULT NULL,
     FOREIGN KEY (phone_number) REFERENCES users(phone_number),
     FOREIGN KEY (topic_id) REFERENCES topics(topic_id),
-    UNIQUE (phone_number, topic_id)
+    UNIQUE (phone_number, topic_id),
+    INDEX idx_subscriptions_topic_active (topic_id, unsubscribed_at, phone_number),
+    INDEX idx_subscriptions_topic_subscribed (topic_id, subscribed_at)
 );
 
 /*
@@ -44,7 +48,19 @@ CREATE TABLE segments (
     definition JSON NOT NULL,  -- e.g. {"country":"LK","consent":"OPT_IN","topics":["sports"]}
     created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
     updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP,
-    is_active BOOLEAN DEFAULT TRUE
+    is_active BOOLEAN DEFAULT TRUE,
+    members_built_at DOUBLE NULL
+);
+
+/*
+segment_members: Materialised membership of each active segment
+*/
+CREATE TABLE segment_members (
+    segment_id INT NOT NULL,
+    phone_number VARCHAR(20) NOT NULL,
+    PRIMARY KEY (segment_id, phone_number),
+    INDEX idx_segment_members_phone (phone_number),
+    FOREIGN KEY (segment_id) REFERENCES segments(segment_id) ON DELETE CASCADE
 );
 
 /*
@@ -71,12 +87,32 @@ CREATE TABLE campaigns (
     status ENUM('DRAFT','SCHEDULED','RUNNING','PAUSED','COMPLETED','CANCELLED') DEFAULT 'DRAFT',
     rate_limit INT DEFAULT 10,           -- max msgs per hour
     quiet_hours JSON,                      -- e.g. {"start":"22:00","end":"07:00"}
+    next_run_at DOUBLE NULL,               -- unix seconds of the next scheduled launch
+    segment_id INT NULL,                   -- narrows the topic's subscribers to a segment; NULL = all of them
+    run_number INT DEFAULT 0,              -- launches so far; each launch queues its messages under a new number
+    launch_cursor VARCHAR(20) NULL,        -- last recipient queued by the current run (resume checkpoint)
+    launch_done TINYINT DEFAULT 0,         -- 1 once the current run has queued its whole audience
+    launch_owner VARCHAR(255) NULL,        -- driver queueing the current run; another may take over once
+    launch_heartbeat DOUBLE NULL,          -- ...this (renewed with every page) is older than OUTBOX_LEASE_SECONDS
+    audience_frozen_at DOUBLE NULL,        -- unix seconds the campaign_audience snapshot is current to
+    last_error TEXT NULL,                  -- why the last scheduled run failed to launch; cleared by a launch
     created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
     updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP,
+    INDEX idx_campaigns_next_run (next_run_at),
     FOREIGN KEY (topic_id) REFERENCES topics(topic_id),
     FOREIGN KEY (template_id) REFERENCES templates(template_id)
 );
 
+/*
+campaign_audience: Frozen audience of a scheduled campaign, refreshed until launch
+*/
+CREATE TABLE campaign_audience (
+    campaign_id INT NOT NULL,
+    phone_number VARCHAR(20) NOT NULL,
+    PRIMARY KEY (campaign_id, phone_number),
+    FOREIGN KEY (campaign_id) REFERENCES campaigns(campaign_id) ON DELETE CASCADE
+);
+
 /*
 messages: Materialized per recipient — lifecycle state machine
 */
@@ -89,13 +125,81 @@ CREATE TABLE messages (
     state ENUM('QUEUED','SENDING','SENT','DELIVERED','READ','FAILED','UNDLVD') DEFAULT 'QUEUED',
     provider_message_sid VARCHAR(64),      -- Twilio MessageSid
     error_code VARCHAR(10) NULL,
+    lease_owner VARCHAR(64) NULL,          -- outbox worker holding the row while SENDING
+    lease_expires_at DOUBLE NULL,          -- unix seconds; expired leases return to QUEUED
+    attempts INT DEFAULT 0,
+    next_attempt_at DOUBLE DEFAULT 0,      -- unix seconds; retries and quiet-hours deferrals wait until then
+    recipient_timezone VARCHAR(64) NULL,   -- IANA zone used for quiet hours
+    run_number INT NULL,                   -- campaigns.run_number of the launch that queued it
     created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
     updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP,
+    UNIQUE KEY idx_messages_recipient (campaign_id, run_number, phone_number),
     FOREIGN KEY (phone_number) REFERENCES users(phone_number),
     FOREIGN KEY (campaign_id) REFERENCES campaigns(campaign_id),
     FOREIGN KEY (template_id) REFERENCES templates(template_id)
 );
 
+/*
+campaign_stats: Message count per campaign and state, updated in the same transaction
+as every message write: inserts per batch by the Message model, state changes and
+deletes by the triggers below
+*/
+CREATE TABLE campaign_stats (
+    campaign_id INT NOT NULL,
+    state VARCHAR(10) NOT NULL,
+    count BIGINT NOT NULL DEFAULT 0,
+    PRIMARY KEY (campaign_id, state),
+    FOREIGN KEY (campaign_id) REFERENCES campaigns(campaign_id) ON DELETE CASCADE
+);
+
+CREATE TRIGGER trg_messages_stats_update AFTER UPDATE ON messages FOR EACH ROW
+    INSERT INTO campaign_stats (campaign_id, state, count)
+    SELECT OLD.campaign_id, OLD.state, -1 FROM DUAL WHERE NOT (OLD.state <=> NEW.state AND OLD.campaign_id <=> NEW.campaign_id)
+    UNION ALL
+    SELECT NEW.campaign_id, NEW.state, 1 FROM DUAL WHERE NOT (OLD.state <=> NEW.state AND OLD.campaign_id <=> NEW.campaign_id)
+    ON DUPLICATE KEY UPDATE count = count + VALUES(count);
+
+CREATE TRIGGER trg_messages_stats_delete AFTER DELETE ON messages FOR EACH ROW
+    UPDATE campaign_stats SET count = count - 1 WHERE campaign_id = OLD.campaign_id AND state = OLD.state;
+
+/*
+campaigns_version: One counter, bumped by every write to campaigns or campaign_stats;
+cached campaign listings are served only while it is unchanged
+*/
+CREATE TABLE campaigns_version (
+    id TINYINT PRIMARY KEY,
+    version BIGINT NOT NULL DEFAULT 0
+);
+
+INSERT INTO campaigns_version (id, version) VALUES (1, 0);
+
+CREATE TRIGGER trg_campaigns_version_insert AFTER INSERT ON campaigns FOR EACH ROW
+    UPDATE campaigns_version SET version = version + 1 WHERE id = 1;
+CREATE TRIGGER trg_campaigns_version_update AFTER UPDATE ON campaigns FOR EACH ROW
+    UPDATE campaigns_version SET version = version + 1 WHERE id = 1;
+CREATE TRIGGER trg_campaigns_version_delete AFTER DELETE ON campaigns FOR EACH ROW
+    UPDATE campaigns_version SET version = version + 1 WHERE id = 1;
+CREATE TRIGGER trg_campaign_stats_version_insert AFTER INSERT ON campaign_stats FOR EACH ROW
+    UPDATE campaigns_version SET version = version + 1 WHERE id = 1;
+CREATE TRIGGER trg_campaign_stats_version_update AFTER UPDATE ON campaign_stats FOR EACH ROW
+    UPDATE campaigns_version SET version = version + 1 WHERE id = 1;
+CREATE TRIGGER trg_campaign_stats_version_delete AFTER DELETE ON campaign_stats FOR EACH ROW
+    UPDATE campaigns_version SET version = version + 1 WHERE id = 1;
+
+/*
+messages_dead_letter: Messages that used up their send attempts
+*/
+CREATE TABLE messages_dead_letter (
+    dead_letter_id BIGINT AUTO_INCREMENT PRIMARY KEY,
+    message_id BIGINT UNIQUE NOT NULL,
+    campaign_id INT NOT NULL,
+    phone_number VARCHAR(20) NOT NULL,
+    attempts INT NOT NULL,
+    error_code VARCHAR(255) NULL,
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    FOREIGN KEY (message_id) REFERENCES messages(message_id)
+);
+
 /*
 events_inbound: Store raw + normalized inbound messages
 */
@@ -121,4 +225,23 @@ CREATE TABLE delivery_receipts (
     error_code VARCHAR(10) NULL,
     timestamp TIMESTAMP,
     created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-);
\ No newline at end of file
+);
+/*
+import_jobs: Background /users/bulk imports (async=true) and their progress
+*/
+CREATE TABLE import_jobs (
+    job_id CHAR(32) PRIMARY KEY,
+    status ENUM('QUEUED','RUNNING','COMPLETED','FAILED') DEFAULT 'QUEUED',
+    filename VARCHAR(255),
+    spool_path VARCHAR(1024),
+    rejects_path VARCHAR(1024),
+    rows_processed BIGINT DEFAULT 0,
+    created_count BIGINT DEFAULT 0,
+    updated_count BIGINT DEFAULT 0,
+    rejected_count BIGINT DEFAULT 0,
+    error TEXT,
+    owner VARCHAR(255) NULL,               -- host:pid of the process running it; jobs of a dead one fail at startup
+    started_at DOUBLE NULL,
+    finished_at DOUBLE NULL,
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+);
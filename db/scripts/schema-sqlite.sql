@@ -22,8 +22,10 @@ BEGIN
     UPDATE users SET updated_at = CURRENT_TIMESTAMP WHERE phone_number = OLD.phone_number;
 END;
 
--- CREATE INDEX IF NOT EXISTS idx_users_consent ON users(consent_state);
+CREATE INDEX IF NOT EXISTS idx_users_consent ON users(consent_state);
 CREATE INDEX IF NOT EXISTS idx_users_active ON users(is_active);
+-- Users written since a point in time, for incremental audience snapshot refreshes
+CREATE INDEX IF NOT EXISTS idx_users_updated ON users(updated_at);
 
 /*
 topics: A dictionary table for subscription topics
@@ -36,7 +38,7 @@ CREATE TABLE IF NOT EXISTS topics (
     is_active BOOLEAN DEFAULT 1
 );
 
-INSERT INTO topics (topic) VALUES ('onboarding');
+INSERT OR IGNORE INTO topics (topic) VALUES ('onboarding');
 
 CREATE TRIGGER IF NOT EXISTS trg_topics_updated
 AFTER UPDATE ON topics
@@ -62,7 +64,11 @@ CREATE TABLE IF NOT EXISTS subscriptions (
 );
 
 CREATE INDEX IF NOT EXISTS idx_subscriptions_user ON subscriptions(phone_number);
-CREATE INDEX IF NOT EXISTS idx_subscriptions_topic ON subscriptions(topic_id);
+-- Drives audience resolution: a topic's active subscribers, in phone_number order
+CREATE INDEX IF NOT EXISTS idx_subscriptions_topic_active ON subscriptions(topic_id, unsubscribed_at, phone_number);
+DROP INDEX IF EXISTS idx_subscriptions_topic;
+-- A topic's recent subscribes (recent unsubscribes are a range on idx_subscriptions_topic_active)
+CREATE INDEX IF NOT EXISTS idx_subscriptions_topic_subscribed ON subscriptions(topic_id, subscribed_at);
 
 /*
 segments: Targeting logic stored as JSON or DSL rules
@@ -73,7 +79,8 @@ CREATE TABLE IF NOT EXISTS segments (
     definition TEXT NOT NULL,  -- JSON as TEXT
     created_at DATETIME DEFAULT CURRENT_TIMESTAMP,
     updated_at DATETIME DEFAULT CURRENT_TIMESTAMP,
-    is_active BOOLEAN DEFAULT 1
+    is_active BOOLEAN DEFAULT 1,
+    members_built_at REAL      -- epoch seconds of the last full segment_members rebuild; NULL = not built
 );
 
 CREATE TRIGGER IF NOT EXISTS trg_segments_updated
@@ -83,6 +90,19 @@ BEGIN
     UPDATE segments SET updated_at = CURRENT_TIMESTAMP WHERE segment_id = OLD.segment_id;
 END;
 
+/*
+segment_members: Materialised membership of each active segment.
+Rebuilt when a definition changes; kept current on user writes.
+*/
+CREATE TABLE IF NOT EXISTS segment_members (
+    segment_id INTEGER NOT NULL,
+    phone_number TEXT NOT NULL,
+    PRIMARY KEY (segment_id, phone_number),
+    FOREIGN KEY (segment_id) REFERENCES segments(segment_id) ON DELETE CASCADE
+) WITHOUT ROWID;
+
+CREATE INDEX IF NOT EXISTS idx_segment_members_phone ON segment_members(phone_number);
+
 /*
 templates: Reusable WhatsApp message templates with placeholders
 */
@@ -115,6 +135,15 @@ CREATE TABLE IF NOT EXISTS campaigns (
     status TEXT CHECK(status IN ('DRAFT','SCHEDULED','RUNNING','PAUSED','COMPLETED','CANCELLED')) DEFAULT 'DRAFT',
     rate_limit INTEGER DEFAULT 10,
     quiet_hours TEXT,        -- JSON as TEXT
+    next_run_at REAL,        -- unix seconds of the next scheduled launch; NULL = none
+    segment_id INTEGER,      -- narrows the topic's subscribers to a segment; NULL = all of them
+    run_number INTEGER DEFAULT 0, -- launches so far; each launch queues its messages under a new number
+    launch_cursor TEXT,      -- last recipient queued by the current run (resume checkpoint)
+    launch_done INTEGER DEFAULT 0, -- 1 once the current run has queued its whole audience
+    launch_owner TEXT,       -- driver queueing the current run; another may take over once
+    launch_heartbeat REAL,   -- ...this (renewed with every page) is a lease older than OUTBOX_LEASE_SECONDS
+    audience_frozen_at REAL, -- unix seconds the campaign_audience snapshot is current to; NULL = resolved live at launch
+    last_error TEXT,         -- why the last scheduled run failed to launch; cleared by a launch
     created_at DATETIME DEFAULT CURRENT_TIMESTAMP,
     updated_at DATETIME DEFAULT CURRENT_TIMESTAMP,
     FOREIGN KEY (topic_id) REFERENCES topics(topic_id),
@@ -129,9 +158,29 @@ BEGIN
 END;
 
 CREATE INDEX IF NOT EXISTS idx_campaigns_status ON campaigns(status);
+CREATE INDEX IF NOT EXISTS idx_campaigns_next_run ON campaigns(next_run_at);
 
 /*
-messages: Materialized per recipient — lifecycle state machine
+campaign_audience: Frozen audience of a scheduled campaign, taken when it is
+scheduled and refreshed incrementally until launch, which then streams it.
+*/
+CREATE TABLE IF NOT EXISTS campaign_audience (
+    campaign_id INTEGER NOT NULL,
+    phone_number TEXT NOT NULL,
+    PRIMARY KEY (campaign_id, phone_number),
+    FOREIGN KEY (campaign_id) REFERENCES campaigns(campaign_id) ON DELETE CASCADE
+) WITHOUT ROWID;
+
+/*
+messages: Materialized per recipient — lifecycle state machine.
+Also the send outbox: rows are written QUEUED, claimed by a worker which sets
+state SENDING plus a lease (owner + expiry, unix seconds), and acked to SENT or
+FAILED. Expired leases are returned to QUEUED. Retryable failures go back to
+QUEUED with a later next_attempt_at (unix seconds; 0 = due now). Messages that
+fall in the recipient's quiet hours are written with next_attempt_at set to
+the end of the window, so idx_messages_due doubles as the deferral queue.
+A campaign run queues at most one message per recipient (idx_messages_recipient),
+which is what makes relaunching or resuming a launch safe.
 */
 CREATE TABLE IF NOT EXISTS messages (
     message_id INTEGER PRIMARY KEY AUTOINCREMENT,
@@ -142,7 +191,14 @@ CREATE TABLE IF NOT EXISTS messages (
     state TEXT CHECK(state IN ('QUEUED','SENDING','SENT','DELIVERED','READ','FAILED','UNDLVD')) DEFAULT 'QUEUED',
     provider_message_sid TEXT NOT NULL,
     error_code TEXT,
+    lease_owner TEXT,
+    lease_expires_at REAL,
+    attempts INTEGER DEFAULT 0,
+    next_attempt_at REAL DEFAULT 0,
+    recipient_timezone TEXT,
+    run_number INTEGER,      -- campaigns.run_number of the launch that queued it
     created_at DATETIME DEFAULT CURRENT_TIMESTAMP,
+    updated_at DATETIME DEFAULT CURRENT_TIMESTAMP,
     FOREIGN KEY (phone_number) REFERENCES users(phone_number),
     FOREIGN KEY (campaign_id) REFERENCES campaigns(campaign_id),
     FOREIGN KEY (template_id) REFERENCES templates(template_id)
@@ -155,10 +211,118 @@ BEGIN
     UPDATE messages SET updated_at = CURRENT_TIMESTAMP WHERE message_id = OLD.message_id;
 END;
 
+CREATE INDEX IF NOT EXISTS idx_messages_outbox ON messages(state, lease_expires_at);
+-- Due-time indexes: the next ready message (overall or per campaign) is one index seek
+CREATE INDEX IF NOT EXISTS idx_messages_due ON messages(state, next_attempt_at);
+CREATE INDEX IF NOT EXISTS idx_messages_campaign_due ON messages(campaign_id, state, next_attempt_at);
+DROP INDEX IF EXISTS idx_messages_campaign_state;
+CREATE UNIQUE INDEX IF NOT EXISTS idx_messages_recipient ON messages(campaign_id, run_number, phone_number);
 -- CREATE INDEX IF NOT EXISTS idx_messages_user ON messages(phone_number);
 -- CREATE INDEX IF NOT EXISTS idx_messages_state ON messages(state);
 -- CREATE INDEX IF NOT EXISTS idx_messages_provider_sid ON messages(provider_message_sid);
 
+/*
+campaign_stats: Message count per campaign and state, for status reads that
+don't scan messages. Every message write updates it in the same transaction:
+inserts are added up per batch by the Message model (a trigger per inserted
+row would slow launches down), state changes and deletes by the triggers below.
+Campaign.rebuild_stats recounts it from messages.
+*/
+CREATE TABLE IF NOT EXISTS campaign_stats (
+    campaign_id INTEGER NOT NULL,
+    state TEXT NOT NULL,
+    count INTEGER NOT NULL DEFAULT 0,
+    PRIMARY KEY (campaign_id, state),
+    FOREIGN KEY (campaign_id) REFERENCES campaigns(campaign_id) ON DELETE CASCADE
+) WITHOUT ROWID;
+
+CREATE TRIGGER IF NOT EXISTS trg_messages_stats_update
+AFTER UPDATE OF state, campaign_id ON messages
+FOR EACH ROW
+WHEN OLD.state IS NOT NEW.state OR OLD.campaign_id IS NOT NEW.campaign_id
+BEGIN
+    UPDATE campaign_stats SET count = count - 1 WHERE campaign_id = OLD.campaign_id AND state = OLD.state;
+    INSERT INTO campaign_stats (campaign_id, state, count) VALUES (NEW.campaign_id, NEW.state, 1)
+    ON CONFLICT (campaign_id, state) DO UPDATE SET count = count + 1;
+END;
+
+CREATE TRIGGER IF NOT EXISTS trg_messages_stats_delete
+AFTER DELETE ON messages
+FOR EACH ROW
+BEGIN
+    UPDATE campaign_stats SET count = count - 1 WHERE campaign_id = OLD.campaign_id AND state = OLD.state;
+END;
+
+/*
+campaigns_version: One counter, bumped by every write to campaigns or
+campaign_stats. Cached campaign listings are served only while it is unchanged.
+*/
+CREATE TABLE IF NOT EXISTS campaigns_version (
+    id INTEGER PRIMARY KEY CHECK (id = 1),
+    version INTEGER NOT NULL DEFAULT 0
+);
+
+INSERT OR IGNORE INTO campaigns_version (id, version) VALUES (1, 0);
+
+CREATE TRIGGER IF NOT EXISTS trg_campaigns_version_insert
+AFTER INSERT ON campaigns
+FOR EACH ROW
+BEGIN
+    UPDATE campaigns_version SET version = version + 1 WHERE id = 1;
+END;
+
+CREATE TRIGGER IF NOT EXISTS trg_campaigns_version_update
+AFTER UPDATE ON campaigns
+FOR EACH ROW
+BEGIN
+    UPDATE campaigns_version SET version = version + 1 WHERE id = 1;
+END;
+
+CREATE TRIGGER IF NOT EXISTS trg_campaigns_version_delete
+AFTER DELETE ON campaigns
+FOR EACH ROW
+BEGIN
+    UPDATE campaigns_version SET version = version + 1 WHERE id = 1;
+END;
+
+CREATE TRIGGER IF NOT EXISTS trg_campaign_stats_version_insert
+AFTER INSERT ON campaign_stats
+FOR EACH ROW
+BEGIN
+    UPDATE campaigns_version SET version = version + 1 WHERE id = 1;
+END;
+
+CREATE TRIGGER IF NOT EXISTS trg_campaign_stats_version_update
+AFTER UPDATE ON campaign_stats
+FOR EACH ROW
+BEGIN
+    UPDATE campaigns_version SET version = version + 1 WHERE id = 1;
+END;
+
+CREATE TRIGGER IF NOT EXISTS trg_campaign_stats_version_delete
+AFTER DELETE ON campaign_stats
+FOR EACH ROW
+BEGIN
+    UPDATE campaigns_version SET version = version + 1 WHERE id = 1;
+END;
+
+/*
+messages_dead_letter: Messages that used up their send attempts.
+Re-driving moves them back to QUEUED and removes them from here.
+*/
+CREATE TABLE IF NOT EXISTS messages_dead_letter (
+    dead_letter_id INTEGER PRIMARY KEY AUTOINCREMENT,
+    message_id INTEGER UNIQUE NOT NULL,
+    campaign_id INTEGER NOT NULL,
+    phone_number TEXT NOT NULL,
+    attempts INTEGER NOT NULL,
+    error_code TEXT,
+    created_at DATETIME DEFAULT CURRENT_TIMESTAMP,
+    FOREIGN KEY (message_id) REFERENCES messages(message_id)
+);
+
+CREATE INDEX IF NOT EXISTS idx_dead_letter_campaign ON messages_dead_letter(campaign_id);
+
 /*
 events_inbound: Store raw + normalized inbound messages (what users send back)
 */
@@ -191,3 +355,24 @@ CREATE TABLE IF NOT EXISTS delivery_receipts (
 
 CREATE INDEX IF NOT EXISTS idx_receipts_msgsid ON delivery_receipts(message_sid);
 CREATE INDEX IF NOT EXISTS idx_receipts_status ON delivery_receipts(message_status);
+
+/*
+import_jobs: Background /users/bulk imports (async=true) and their progress.
+The upload is spooled to spool_path; rejected rows are written to rejects_path.
+*/
+CREATE TABLE IF NOT EXISTS import_jobs (
+    job_id TEXT PRIMARY KEY,
+    status TEXT CHECK(status IN ('QUEUED','RUNNING','COMPLETED','FAILED')) DEFAULT 'QUEUED',
+    filename TEXT,
+    spool_path TEXT,
+    rejects_path TEXT,
+    rows_processed INTEGER DEFAULT 0,
+    created_count INTEGER DEFAULT 0,
+    updated_count INTEGER DEFAULT 0,
+    rejected_count INTEGER DEFAULT 0,
+    error TEXT,
+    owner TEXT,         -- host:pid of the process running it; jobs of a dead one fail at startup
+    started_at REAL,    -- epoch seconds
+    finished_at REAL,   -- epoch seconds
+    created_at DATETIME DEFAULT CURRENT_TIMESTAMP
+);
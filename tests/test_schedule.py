@@ -0,0 +1,45 @@
+from datetime import datetime, timezone
+
+from app.utils.quiet_hours import get_zone
+from app.utils.schedule import next_run_time
+
+NEW_YORK = get_zone('America/New_York')
+
+
+def _at(year, month, day, hour, minute, fold=0):
+    return datetime(year, month, day, hour, minute, tzinfo=NEW_YORK, fold=fold).timestamp()
+
+
+def _schedule(cron):
+    return {'type': 'scheduled', 'cron': cron, 'timezone': 'America/New_York'}
+
+
+def test_repeated_hour_moves_forward():
+    # 01:30 EST, the second 01:30 on the night the clocks go back
+    after = _at(2026, 11, 1, 1, 30, fold=1)
+    assert next_run_time(_schedule('*/5 * * * *'), after) == after + 300
+
+
+def test_first_pass_of_repeated_hour():
+    after = _at(2026, 11, 1, 1, 30)
+    assert next_run_time(_schedule('*/5 * * * *'), after) == after + 300
+
+
+def test_wall_clock_times_match_once():
+    # Like a daily run, 01:00-02:00 is run through once, not again after the clocks go back
+    schedule = _schedule('*/5 * * * *')
+    assert next_run_time(schedule, _at(2026, 11, 1, 1, 55)) == _at(2026, 11, 1, 2, 0)
+
+
+def test_daily_run_in_repeated_hour_fires_once():
+    schedule = _schedule('30 1 * * *')
+    first = next_run_time(schedule, _at(2026, 10, 31, 12, 0))
+    assert first == _at(2026, 11, 1, 1, 30)
+    assert next_run_time(schedule, first) == _at(2026, 11, 2, 1, 30)
+
+
+def test_skipped_time_runs_after_the_gap():
+    # 02:30 doesn't exist on the night the clocks go forward
+    after = _at(2026, 3, 8, 1, 0)
+    run = next_run_time(_schedule('30 2 * * *'), after)
+    assert datetime.fromtimestamp(run, timezone.utc) == datetime(2026, 3, 8, 7, 30, tzinfo=timezone.utc)